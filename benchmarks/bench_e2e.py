@@ -0,0 +1,220 @@
+"""
+run lambda_handler end to end against a local HTTP server, an in-process DynamoDB stand-in and a fake SES
+every page size runs in a fresh interpreter so the first invocation is a real cold start
+usage:
+    python benchmarks/bench_e2e.py [--rows 10,1000,10000,100000] [--warm-runs 5]
+    python benchmarks/bench_e2e.py --aws-latency-ms 10 --http-latency-ms 100, with STAGE_WORKERS=4 to compare the
+        overlapped stages with real round trips
+    python benchmarks/bench_e2e.py --compare benchmarks/results/old.json benchmarks/results/new.json
+"""
+import argparse
+from contextlib import redirect_stdout
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+from pathlib import Path
+import platform
+import resource
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+from urllib.request import urlopen
+
+from common import make_files_page
+
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+ROOT_DIR = Path(__file__).resolve().parents[1]
+
+
+class FilesPageServer(ThreadingHTTPServer):
+    """serves /page?rows=N with an ETag, /bump adds one new file to every page"""
+    daemon_threads = True
+
+    def __init__(self, latency_seconds=0.0):
+        super().__init__(('127.0.0.1', 0), FilesPageHandler)
+        self.latency_seconds = latency_seconds
+        self.version = 0
+        self.pages = {}
+        self.lock = threading.Lock()
+
+    def page(self, rows):
+        with self.lock:
+            key = (rows, self.version)
+            if key not in self.pages:
+                self.pages = {key: make_files_page(rows + self.version).encode('utf-8')}
+            return self.pages[key], f'"{rows}-{self.version}"'
+
+
+class FilesPageHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == '/bump':
+            with self.server.lock:
+                self.server.version += 1
+            self._reply(200, b'ok')
+            return
+        body, etag = self.server.page(int(parse_qs(url.query).get('rows', ['10'])[0]))
+        if self.server.latency_seconds:
+            time.sleep(self.server.latency_seconds)
+        if self.headers.get('If-None-Match') == etag:
+            self._reply(304, b'', etag)
+        else:
+            self._reply(200, body, etag)
+
+    def _reply(self, status, body, etag=None):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/html; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        if etag:
+            self.send_header('ETag', etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run_worker(rows, port, warm_runs):
+    """one cold invocation, then warm invocations with an unchanged and a changed page, printed as JSON"""
+    import fakes
+
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        start = time.perf_counter()
+        import main
+        import_seconds = time.perf_counter() - start
+
+        dynamodb, ses = fakes.FakeDynamoDBResource(), fakes.FakeSES()
+        main.lazy_resource = lambda service_name: dynamodb
+        main.lazy_client = lambda service_name: ses
+
+        stages = {}
+
+        def invoke(stage):
+            calls_before = fakes.CALLS.copy()
+            start = time.perf_counter()
+            main.lambda_handler(None, None)
+            seconds = time.perf_counter() - start
+            stage_result = stages.setdefault(stage, {'runs': [], 'aws_calls': {}})
+            stage_result['runs'].append(seconds)
+            for operation, count in (fakes.CALLS - calls_before).items():
+                stage_result['aws_calls'][operation] = stage_result['aws_calls'].get(operation, 0) + count
+
+        invoke('cold')
+        for _ in range(warm_runs):
+            invoke('warm_unchanged')
+        for _ in range(warm_runs):
+            urlopen(f'http://127.0.0.1:{port}/bump').read()
+            invoke('warm_changed')
+
+    result = {
+        'rows': rows,
+        'import_seconds': import_seconds,
+        'cold_start_seconds': import_seconds + stages['cold']['runs'][0],
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        'stages': {},
+    }
+    for stage, stage_result in stages.items():
+        runs = sorted(stage_result['runs'])
+        result['stages'][stage] = {
+            'median_seconds': runs[len(runs) // 2],
+            'max_seconds': runs[-1],
+            'aws_calls_per_run': {operation: count / len(runs)
+                                  for operation, count in sorted(stage_result['aws_calls'].items())},
+        }
+    print(json.dumps(result))
+
+
+def run_benchmarks(row_sizes, warm_runs, aws_latency_ms=0.0, http_latency_ms=0.0):
+    server = FilesPageServer(http_latency_ms / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+
+    results = []
+    for rows in row_sizes:
+        env = {
+            **os.environ,
+            'AWS_LAMBDA_FUNCTION_NAME': 'bench',  # run like Lambda, without loading .env
+            'URL': f'http://127.0.0.1:{port}/page?rows={rows}',
+            'TABLE_NAME': 'bench_table',
+            'SENDER_EMAIL': 'sender@example.com',
+            'NEW_FILE_RECIPIENT_EMAILS': 'a@example.com,b@example.com',
+            'LOG_RECIPIENT_EMAILS': 'c@example.com',
+            'FAKE_AWS_LATENCY_MS': str(aws_latency_ms),
+        }
+        output = subprocess.run(
+            [sys.executable, __file__, '--worker', '--rows', str(rows), '--port', str(port),
+             '--warm-runs', str(warm_runs)],
+            env=env, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        results.append(result)
+        print_result(result)
+    server.shutdown()
+    return results
+
+
+def print_result(result):
+    print(f"{result['rows']} rows: import {result['import_seconds'] * 1000:.0f} ms, "
+          f"cold start {result['cold_start_seconds'] * 1000:.0f} ms, peak RSS {result['peak_rss_mb']:.0f} MB")
+    for stage, stage_result in result['stages'].items():
+        calls = ', '.join(f"{operation} {count:g}" for operation, count in stage_result['aws_calls_per_run'].items())
+        print(f"    {stage:15} median {stage_result['median_seconds'] * 1000:8.1f} ms | {calls}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def compare(old_path, new_path):
+    old = {result['rows']: result for result in json.loads(Path(old_path).read_text())['results']}
+    new = {result['rows']: result for result in json.loads(Path(new_path).read_text())['results']}
+    for rows in sorted(old.keys() & new.keys()):
+        print(f"{rows} rows:")
+        for metric in ('cold_start_seconds', 'peak_rss_mb'):
+            print(f"    {metric:28} {old[rows][metric]:10.3f} -> {new[rows][metric]:10.3f} "
+                  f"({new[rows][metric] / old[rows][metric]:.2f}x)")
+        for stage in old[rows]['stages'].keys() & new[rows]['stages'].keys():
+            before = old[rows]['stages'][stage]['median_seconds']
+            after = new[rows]['stages'][stage]['median_seconds']
+            print(f"    {stage + ' median_seconds':28} {before:10.3f} -> {after:10.3f} ({after / before:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', default='10,1000,10000')
+    parser.add_argument('--warm-runs', type=int, default=5)
+    parser.add_argument('--worker', action='store_true')
+    parser.add_argument('--port', type=int)
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'))
+    parser.add_argument('--aws-latency-ms', type=float, default=0.0)
+    parser.add_argument('--http-latency-ms', type=float, default=0.0)
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+    elif args.worker:
+        run_worker(int(args.rows), args.port, args.warm_runs)
+    else:
+        commit = git_commit()
+        results = run_benchmarks([int(rows) for rows in args.rows.split(',')], args.warm_runs,
+                                 args.aws_latency_ms, args.http_latency_ms)
+        RESULTS_DIR.mkdir(exist_ok=True)
+        path = RESULTS_DIR / f"{commit}.json"
+        path.write_text(json.dumps({
+            'commit': commit,
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'results': results,
+        }, indent=2))
+        print(f"results saved to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+compare the previous per row date extraction with the batch filename parser
+usage: python benchmarks/bench_filename_meta.py [filenames]
+"""
+from contextlib import redirect_stdout
+from datetime import datetime
+import logging
+import os
+import sys
+
+from common import measure
+from scraper.filename_meta import parse_filenames
+from util import get_timestamp, setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def extract_date_per_row(filename):
+    """the date extraction as it was done for every row before the batch parser"""
+    try:
+        date_str = filename.split('_')[-1].rsplit('.', 1)[0]
+        date_parts = date_str.split('.')
+        if len(date_parts) == 3:
+            year, month, day = date_parts
+            month = month.zfill(2)
+            day = day.zfill(2)
+            date_str = f"{year}-{month}-{day}"
+            datetime.strptime(date_str, '%Y-%m-%d')
+            return f"{year}.{month}.{day}"
+        else:
+            raise ValueError("Invalid date format")
+    except (ValueError, IndexError):
+        logger.warning(f"{get_timestamp()} - Could not extract valid date from filename: {filename}")
+        return datetime.now().strftime('%Y.%m.%d')
+
+
+def make_filenames(count, invalid_every=100):
+    """synthetic filenames, every invalid_every-th one has an impossible date"""
+    return [
+        f'XiaomiEUModule{i % 50}_2023.2.29.apk' if i % invalid_every == 0
+        else f'XiaomiEUModule{i % 50}-r{i}_20{10 + i % 15}.{1 + i % 12}.{1 + i % 28}.apk'
+        for i in range(count)
+    ]
+
+
+def main(count=100_000):
+    filenames = make_filenames(count)
+    # with the same log handlers as Lambda, so the per row warnings cost what they cost there
+    with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        setup_logging()
+        per_row_seconds, per_row_peak, per_row = measure(lambda: [extract_date_per_row(f) for f in filenames])
+        batch_seconds, batch_peak, metas = measure(parse_filenames, filenames)
+    assert per_row == [meta.date for meta in metas], "batch parser dates differ from the per row path"
+
+    print(f"{count} filenames, 1 in 100 invalid")
+    print(f"{'per row (before)':18} {per_row_seconds * 1000:8.1f} ms, peak {per_row_peak / 1024 / 1024:6.1f} MB")
+    print(f"{'batch':18} {batch_seconds * 1000:8.1f} ms, peak {batch_peak / 1024 / 1024:6.1f} MB, "
+          f"{per_row_seconds / batch_seconds:5.1f}x faster")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
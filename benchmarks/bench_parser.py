@@ -0,0 +1,31 @@
+"""
+compare every installed parser backend and the chunked streaming parser on a synthetic files_list page
+usage: python benchmarks/bench_parser.py [rows]
+"""
+import sys
+
+from common import make_files_page, measure
+from scraper.parsers import PARSERS, available_parsers, parse_rows_html_parser, parse_rows_streaming
+from scraper.scraper import STREAM_CHUNK_SIZE
+
+
+def main(rows=10_000):
+    html = make_files_page(rows)
+    chunks = [html[i:i + STREAM_CHUNK_SIZE] for i in range(0, len(html), STREAM_CHUNK_SIZE)]
+    print(f"page: {rows} rows, {len(html) / 1024 / 1024:.1f} MB")
+
+    baseline_seconds, baseline_peak, expected = measure(parse_rows_html_parser, html)
+    print(f"{'html.parser (baseline)':26} {baseline_seconds * 1000:8.1f} ms, peak {baseline_peak / 1024 / 1024:6.1f} MB")
+
+    installed = available_parsers()
+    candidates = [(name, backend, html) for name, backend, _ in PARSERS if name in installed and name != 'html.parser']
+    candidates.append(('stream (64 KB chunks)', parse_rows_streaming, chunks))
+    for name, backend, page in candidates:
+        seconds, peak, result = measure(backend, page)
+        assert result == expected, f"{name} output differs from BeautifulSoup"
+        print(f"{name:26} {seconds * 1000:8.1f} ms, peak {peak / 1024 / 1024:6.1f} MB, "
+              f"{baseline_seconds / seconds:5.1f}x faster")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,55 @@
+"""
+compare the previous string concatenation with the precompiled templates for a large new file email
+usage: python benchmarks/bench_render.py [files]
+"""
+import sys
+
+from common import measure
+from notification.templates import render_new_files
+from util import get_timestamp
+
+
+def render_concatenation(new_files):
+    """the new file email body as it was built before the templates"""
+    body_html = """
+        <html>
+        <head></head>
+        <body>
+            <h2>new files detected</h2>
+            <ul>
+        """
+    for file in new_files:
+        body_html += f"""
+                <li>
+                    <p>filename: {file['filename']}</p>
+                    <p>download link: <a href="{file['url']}">{file['url']}</a></p>
+                    <p>update date: {file['date']}</p>
+                </li>
+            """
+    body_html += f"""
+            </ul>
+            <p>generated date: {get_timestamp()}</p>
+        </body>
+        </html>
+        """
+    return body_html
+
+
+def main(count=10_000):
+    new_files = [{'filename': f'XiaomiEUModule_{i}_2024.01.01.apk',
+                  'url': f'https://example.com/projects/xiaomi/files/{i}/download',
+                  'date': '2024.01.01'} for i in range(count)]
+    print(f"{count} new files")
+
+    seconds, peak, _ = measure(render_concatenation, new_files)
+    print(f"{'concatenation (html)':28} {seconds * 1000:8.1f} ms, peak {peak / 1024 / 1024:6.1f} MB")
+    template_seconds, peak, _ = measure(render_new_files, new_files, get_timestamp())
+    print(f"{'templates (html + text)':28} {template_seconds * 1000:8.1f} ms, peak {peak / 1024 / 1024:6.1f} MB, "
+          f"{template_seconds / seconds:5.1f}x the concatenation time")
+    digest_seconds, peak, _ = measure(render_new_files, new_files, get_timestamp(), 100)
+    print(f"{'templates, 100 file digest':28} {digest_seconds * 1000:8.1f} ms, peak {peak / 1024 / 1024:6.1f} MB, "
+          f"{digest_seconds / seconds:5.2f}x the concatenation time")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
@@ -0,0 +1,49 @@
+"""
+compare the stored size and the encode / decode time of JSON and compact snapshots
+usage: python benchmarks/bench_snapshot.py [files]
+"""
+import json
+import sys
+
+from common import measure
+from data.snapshot_codec import decode_files, encode_files
+
+DYNAMODB_ITEM_LIMIT = 400 * 1024
+
+
+def make_files(count):
+    """synthetic snapshot with the url layout of the real project page, a few folders share all files"""
+    files = []
+    for i in range(count):
+        filename = f'XiaomiEUModule{i % 50}-r{i}_20{10 + i % 15}.{1 + i % 12}.{1 + i % 28}.apk'
+        files.append({
+            'filename': filename,
+            'url': f'https://sourceforge.net/projects/xiaomi-eu-multilang-miui-roms/files/xiaomi.eu/folder{i % 4}/'
+                   f'{filename}/download',
+            'date': f'20{10 + i % 15}.{1 + i % 12:02d}.{1 + i % 28:02d}',
+        })
+    return files
+
+
+def main(count=10_000):
+    files = make_files(count)
+    json_encode_seconds, _, json_value = measure(json.dumps, files)
+    json_decode_seconds, json_peak, _ = measure(decode_files, json_value)
+    compact_encode_seconds, _, compact_value = measure(encode_files, files)
+    compact_decode_seconds, compact_peak, decoded = measure(decode_files, compact_value)
+    assert decoded == files, "compact snapshot does not round trip"
+
+    json_size = len(json_value.encode('utf-8'))
+    print(f"{count} files, DynamoDB item limit {DYNAMODB_ITEM_LIMIT / 1024:.0f} KB")
+    for name, size, encode_seconds, decode_seconds, peak in (
+            ('json (before)', json_size, json_encode_seconds, json_decode_seconds, json_peak),
+            ('compact', len(compact_value), compact_encode_seconds, compact_decode_seconds, compact_peak)):
+        print(f"{name:14} {size / 1024:8.1f} KB, encode {encode_seconds * 1000:6.1f} ms, "
+              f"decode {decode_seconds * 1000:6.1f} ms, decode peak {peak / 1024 / 1024:5.1f} MB, "
+              f"{size / DYNAMODB_ITEM_LIMIT:6.1%} of an item")
+    print(f"compact is {json_size / len(compact_value):.1f}x smaller, "
+          f"fits about {DYNAMODB_ITEM_LIMIT // (len(compact_value) / count):.0f} files in one item")
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 10_000)
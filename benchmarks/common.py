@@ -0,0 +1,40 @@
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+# benchmarks import the application modules the same way Lambda does, from src/
+SRC_DIR = Path(__file__).resolve().parents[1] / 'src'
+if str(SRC_DIR) not in sys.path:
+    sys.path.insert(0, str(SRC_DIR))
+
+
+def make_files_page(rows):
+    """synthetic files_list page with the same layout as the real project page"""
+    parts = ['<html><body><table id="files_list"><thead><tr><th>Name</th></tr></thead><tbody>']
+    for i in range(rows):
+        filename = f'XiaomiEUModule{i % 50}-r{i}_20{10 + i % 15}.{1 + i % 12}.{1 + i % 28}.apk'
+        parts.append(
+            f'<tr title="{filename}" class="file"><th scope="row" headers="files_name_h">'
+            f'<a href="https://example.com/projects/xiaomi/files/{i}/{filename}/download" class="name">'
+            f'<span class="name">{filename}</span></a></th>'
+            f'<td headers="files_date_h"><abbr title="2024-01-01 00:00:00 UTC">2024-01-01</abbr></td>'
+            f'<td headers="files_size_h">1.2 MB</td></tr>'
+        )
+    parts.append('</tbody></table></body></html>')
+    return ''.join(parts)
+
+
+def measure(func, *args, repeat=3):
+    """return (best seconds, peak traced bytes, result) of func(*args)"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    tracemalloc.start()
+    func(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak, result
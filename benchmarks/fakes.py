@@ -0,0 +1,219 @@
+"""
+in-process stand-ins for the DynamoDB resource and the SES client, with the subset of the boto3 API this project uses
+every call is counted in CALLS as 'service.operation' and takes FAKE_AWS_LATENCY_MS, a stand-in for the round trip
+"""
+from collections import Counter
+from contextlib import contextmanager
+import os
+import re
+import threading
+import time
+
+CALLS = Counter()
+_lock = threading.Lock()
+QUERY_PAGE_ITEMS = 1000  # stands in for the 1 MB query page limit
+LATENCY_SECONDS = float(os.getenv('FAKE_AWS_LATENCY_MS', '0')) / 1000
+
+
+def _count(operation):
+    with _lock:
+        CALLS[operation] += 1
+    if LATENCY_SECONDS:
+        time.sleep(LATENCY_SECONDS)
+
+
+class ResourceNotFoundException(Exception):
+    pass
+
+
+class _Exceptions:
+    ResourceNotFoundException = ResourceNotFoundException
+
+
+_CONDITION_RE = re.compile(
+    r'^record_type = (?P<pk>:\w+)'
+    r'(?: AND (?:scan_date (?P<op><=|>=|<|>|=) (?P<value>:\w+)'
+    r'|scan_date BETWEEN (?P<low>:\w+) AND (?P<high>:\w+)'
+    r'|begins_with\(scan_date, (?P<prefix>:\w+)\)))?$'
+)
+_SET_RE = re.compile(r'(\w+) = (?:if_not_exists\(\w+, (:\w+)\)|(:\w+))')
+
+
+class FakeTable:
+    def __init__(self, name, client):
+        self.name = name
+        self._client = client
+
+    @property
+    def _items(self):
+        return self._client.tables[self.name]
+
+    def put_item(self, Item):
+        _count('dynamodb.PutItem')
+        with _lock:
+            self._items.setdefault(Item['record_type'], {})[Item['scan_date']] = dict(Item)
+        return {}
+
+    def get_item(self, Key):
+        _count('dynamodb.GetItem')
+        item = self._items.get(Key['record_type'], {}).get(Key['scan_date'])
+        return {'Item': dict(item)} if item else {}
+
+    def delete_item(self, Key):
+        _count('dynamodb.DeleteItem')
+        with _lock:
+            self._items.get(Key['record_type'], {}).pop(Key['scan_date'], None)
+        return {}
+
+    def update_item(self, Key, UpdateExpression, ExpressionAttributeValues, **kwargs):
+        _count('dynamodb.UpdateItem')
+        assert UpdateExpression.startswith('SET '), UpdateExpression
+        with _lock:
+            item = self._items.setdefault(Key['record_type'], {}).setdefault(Key['scan_date'], dict(Key))
+            for name, default, value in _SET_RE.findall(UpdateExpression[4:]):
+                if default:
+                    item.setdefault(name, ExpressionAttributeValues[default])
+                else:
+                    item[name] = ExpressionAttributeValues[value]
+        return {}
+
+    def query(self, KeyConditionExpression, ExpressionAttributeValues, Limit=None, ScanIndexForward=True,
+              ProjectionExpression=None, ExclusiveStartKey=None, **kwargs):
+        _count('dynamodb.Query')
+        match = _CONDITION_RE.match(KeyConditionExpression)
+        assert match, KeyConditionExpression
+        # cleanup may delete items of the same partition from another thread
+        with _lock:
+            return self._query(match, ExpressionAttributeValues, Limit, ScanIndexForward, ProjectionExpression,
+                               ExclusiveStartKey)
+
+    def _query(self, match, ExpressionAttributeValues, Limit, ScanIndexForward, ProjectionExpression,
+               ExclusiveStartKey):
+        values = ExpressionAttributeValues
+        partition = self._items.get(values[match.group('pk')], {})
+        keys = sorted(partition, reverse=not ScanIndexForward)
+        if match.group('op'):
+            value = values[match.group('value')]
+            compare = {'<': str.__lt__, '<=': str.__le__, '>': str.__gt__, '>=': str.__ge__, '=': str.__eq__}
+            keys = [key for key in keys if compare[match.group('op')](key, value)]
+        elif match.group('low'):
+            keys = [key for key in keys if values[match.group('low')] <= key <= values[match.group('high')]]
+        elif match.group('prefix'):
+            keys = [key for key in keys if key.startswith(values[match.group('prefix')])]
+        if ExclusiveStartKey:
+            start = ExclusiveStartKey['scan_date']
+            keys = [key for key in keys if (key > start if ScanIndexForward else key < start)]
+
+        page_size = min(Limit or QUERY_PAGE_ITEMS, QUERY_PAGE_ITEMS)
+        page = keys[:page_size]
+        attributes = [name.strip() for name in ProjectionExpression.split(',')] if ProjectionExpression else None
+        items = [
+            {name: partition[key][name] for name in attributes if name in partition[key]} if attributes
+            else dict(partition[key])
+            for key in page
+        ]
+        response = {'Items': items, 'Count': len(items)}
+        if len(keys) > page_size:
+            response['LastEvaluatedKey'] = {'record_type': values[match.group('pk')], 'scan_date': page[-1]}
+        return response
+
+    @contextmanager
+    def batch_writer(self, overwrite_by_pkeys=None):
+        batch = _FakeBatchWriter(self)
+        yield batch
+        batch.flush()
+
+
+class _FakeBatchWriter:
+    def __init__(self, table):
+        self._table = table
+        self._requests = []
+
+    def put_item(self, Item):
+        self._requests.append({'PutRequest': {'Item': Item}})
+        if len(self._requests) == 25:
+            self.flush()
+
+    def delete_item(self, Key):
+        self._requests.append({'DeleteRequest': {'Key': Key}})
+        if len(self._requests) == 25:
+            self.flush()
+
+    def flush(self):
+        if self._requests:
+            self._table._client.batch_write_item(RequestItems={self._table.name: self._requests})
+            self._requests = []
+
+
+class FakeDynamoDBClient:
+    exceptions = _Exceptions
+
+    def __init__(self):
+        self.tables = {}
+        self.ttl = {}
+
+    def describe_table(self, TableName):
+        _count('dynamodb.DescribeTable')
+        if TableName not in self.tables:
+            raise ResourceNotFoundException(TableName)
+        return {'Table': {'TableName': TableName, 'TableStatus': 'ACTIVE'}}
+
+    def describe_time_to_live(self, TableName):
+        _count('dynamodb.DescribeTimeToLive')
+        return {'TimeToLiveDescription': {'TimeToLiveStatus': 'ENABLED' if TableName in self.ttl else 'DISABLED'}}
+
+    def update_time_to_live(self, TableName, TimeToLiveSpecification):
+        _count('dynamodb.UpdateTimeToLive')
+        self.ttl[TableName] = TimeToLiveSpecification['AttributeName']
+        return {'TimeToLiveSpecification': TimeToLiveSpecification}
+
+    def batch_write_item(self, RequestItems):
+        _count('dynamodb.BatchWriteItem')
+        with _lock:
+            for table_name, requests in RequestItems.items():
+                items = self.tables[table_name]
+                for request in requests:
+                    if 'PutRequest' in request:
+                        item = request['PutRequest']['Item']
+                        items.setdefault(item['record_type'], {})[item['scan_date']] = dict(item)
+                    else:
+                        key = request['DeleteRequest']['Key']
+                        items.get(key['record_type'], {}).pop(key['scan_date'], None)
+        return {'UnprocessedItems': {}}
+
+
+class _Meta:
+    def __init__(self, client):
+        self.client = client
+
+
+class FakeDynamoDBResource:
+    def __init__(self):
+        self.meta = _Meta(FakeDynamoDBClient())
+
+    def create_table(self, TableName, **kwargs):
+        _count('dynamodb.CreateTable')
+        self.meta.client.tables.setdefault(TableName, {})
+        return self.Table(TableName)
+
+    def Table(self, name):
+        return FakeTable(name, self.meta.client)
+
+
+class FakeSES:
+    def __init__(self, max_send_rate=14.0):
+        self.max_send_rate = max_send_rate
+        self.sent = []
+
+    def get_identity_verification_attributes(self, Identities):
+        _count('ses.GetIdentityVerificationAttributes')
+        return {'VerificationAttributes': {identity: {'VerificationStatus': 'Success'} for identity in Identities}}
+
+    def get_send_quota(self):
+        _count('ses.GetSendQuota')
+        return {'Max24HourSend': 50000.0, 'MaxSendRate': self.max_send_rate, 'SentLast24Hours': 0.0}
+
+    def send_email(self, Source, Destination, Message, **kwargs):
+        _count('ses.SendEmail')
+        self.sent.append((Source, Destination, Message))
+        return {'MessageId': f'fake-{len(self.sent)}'}
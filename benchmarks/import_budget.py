@@ -0,0 +1,63 @@
+"""
+cold import profile of the Lambda entry point, fails when it goes over budget
+every run is a fresh interpreter with python -X importtime, the best of the runs is compared to the budget
+usage: python benchmarks/import_budget.py [--budget-ms 150] [--runs 5] [--top 10]
+"""
+import argparse
+import subprocess
+import sys
+
+from common import SRC_DIR
+
+# only the code paths that use these may import them, importing main must not
+HEAVY_MODULES = ('boto3', 'botocore', 'requests', 'urllib3', 'bs4', 'lxml', 'selectolax', 'dotenv')
+DEFAULT_BUDGET_MS = 150
+
+
+def profile_import(module):
+    """(total microseconds, {module: (self us, cumulative us)}, heavy modules loaded) for one cold import"""
+    check = f"import sys, {module}; print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', check], cwd=SRC_DIR,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    heavy = [name for name in result.stdout.strip().split(',') if name]
+    return modules[module][1], modules, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--module', default='main')
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    best = None
+    for _ in range(args.runs):
+        profile = profile_import(args.module)
+        if best is None or profile[0] < best[0]:
+            best = profile
+    total_us, modules, heavy = best
+
+    print(f"import {args.module}: {total_us / 1000:.1f} ms (budget {args.budget_ms:.0f} ms, best of {args.runs})")
+    print("slowest modules by self time:")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: -item[1][0])[:args.top]:
+        print(f"    {self_us / 1000:7.1f} ms self {cumulative_us / 1000:7.1f} ms cumulative  {name}")
+
+    failed = False
+    if heavy:
+        print(f"FAIL: importing {args.module} loads {', '.join(heavy)}")
+        failed = True
+    if total_us / 1000 > args.budget_ms:
+        print("FAIL: import time over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+from data import ReleaseTimeline
+from main import create_app
+from service import backfill_timeline
+from util import Config, setup_logging
+
+
+def run_backfill(config=None):
+    """build the release timeline of every watched page from its stored snapshots, return {url: snapshots read}"""
+    service = create_app(config or Config())
+    timeline = service.timeline or ReleaseTimeline(service.db_handler)
+    return {scraper.url: backfill_timeline(service.db_handler, timeline, scraper.source)
+            for scraper in service.scraper.scrapers}
+
+
+def lambda_handler(event, context):
+    # one off job, deployed with the same package as a separate handler
+    setup_logging()
+    return {
+        'statusCode': 200,
+        'body': run_backfill()
+    }
+
+
+if __name__ == "__main__":
+    setup_logging()
+    run_backfill()
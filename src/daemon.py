@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import random
+import signal
+from main import create_app
+from service import AdaptiveSchedule, learn_hot_hours
+from util import Config, get_timestamp, reset_spans, setup_logging
+
+logger = logging.getLogger(__name__)
+
+HOUSEKEEPING_INTERVAL = 24 * 60 * 60  # log email, cleanup and saving the run log, once a day instead of every run
+
+
+class PollingDaemon:
+    """
+    keeps one UpdateService and its clients alive and checks every page on its own adaptive schedule
+    fetches run concurrently, the database and email work of the checks runs one at a time
+    """
+
+    def __init__(self, service, min_interval=300, max_interval=10800, backoff=1.5, jitter=0.1, hot_hours=3):
+        self.service = service
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.hot_hours = hot_hours
+        self.schedules = {}
+        self._stop_event = None
+        self._lock = None
+
+    async def run(self):
+        self._stop_event = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._install_signal_handlers()
+        logger.info(f"{get_timestamp()} - daemon started, watching {len(self.service.scraper.scrapers)} pages")
+
+        tasks = [asyncio.create_task(self._poll(scraper)) for scraper in self.service.scraper.scrapers]
+        tasks.append(asyncio.create_task(self._housekeeping()))
+        await asyncio.gather(*tasks)
+
+        await self._locked(self.service.save_run_log)
+        logger.info(f"{get_timestamp()} - daemon stopped")
+
+    def stop(self):
+        """finish the checks in progress, save the run log and return from run"""
+        if self._stop_event is not None and not self._stop_event.is_set():
+            logger.info(f"{get_timestamp()} - daemon stopping")
+            self._stop_event.set()
+
+    def _install_signal_handlers(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except NotImplementedError:
+                # Windows event loops have no add_signal_handler
+                signal.signal(sig, lambda *_: loop.call_soon_threadsafe(self.stop))
+
+    async def _poll(self, scraper):
+        schedule = AdaptiveSchedule(self.min_interval, self.max_interval, self.backoff, self.jitter,
+                                    await self._learn_hot_hours(scraper))
+        self.schedules[scraper.url] = schedule
+        # spread the first checks so the pages are not all fetched at the same moment
+        delay = random.uniform(0, self.jitter * self.min_interval)
+        while await self._sleep(delay):
+            schedule.record(await self._check(scraper))
+            delay = schedule.next_delay()
+            logger.info(f"{get_timestamp()} - next check of {scraper.url} in {delay:.0f} seconds")
+
+    async def _check(self, scraper):
+        """fetch the page, then check it for new files, return True if it had new files"""
+        try:
+            validators = await self._locked(self.service.db_handler.get_http_validators)
+            files = await asyncio.to_thread(scraper.get_file_list, validators.get(scraper.url))
+            if files is None:
+                logger.info(f"{get_timestamp()} - {scraper.url} not modified, skip checking")
+                # failed emails are retried even when nothing changed
+                await self._locked(self.service.drain_outbox)
+                return False
+            new_files = await self._locked(self.service.check_new_files_and_send_email, scraper, files)
+            await self._locked(self.service.drain_outbox)
+            return bool(new_files)
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - daemon check of {scraper.url} failed: {str(e)}")
+            return False
+
+    async def _learn_hot_hours(self, scraper):
+        scan_dates = await self._locked(self.service.db_handler.get_scan_dates, scraper.source)
+        hot_hours = learn_hot_hours(scan_dates, self.hot_hours)
+        logger.info(f"{get_timestamp()} - hot hours of {scraper.url}: {sorted(hot_hours)}")
+        return hot_hours
+
+    async def _housekeeping(self):
+        while await self._sleep(HOUSEKEEPING_INTERVAL):
+            try:
+                await self._locked(self._daily_housekeeping)
+                for scraper in self.service.scraper.scrapers:
+                    if scraper.url in self.schedules:
+                        self.schedules[scraper.url].hot_hours = await self._learn_hot_hours(scraper)
+            except Exception as e:
+                logger.error(f"{get_timestamp()} - daemon housekeeping failed: {str(e)}")
+
+    def _daily_housekeeping(self):
+        self.service.send_log_email()
+        self.service.deleteOldDbData()
+        self.service.save_run_log()
+        # every saved run log covers one day
+        setup_logging()
+        reset_spans()
+
+    async def _sleep(self, delay):
+        """wait delay seconds, return False instead if the daemon is stopped in the meantime"""
+        try:
+            await asyncio.wait_for(self._stop_event.wait(), timeout=delay)
+            return False
+        except asyncio.TimeoutError:
+            return True
+
+    async def _locked(self, func, *args):
+        async with self._lock:
+            return await asyncio.to_thread(func, *args)
+
+
+def run_daemon(config=None):
+    setup_logging()
+    reset_spans()
+    config = config or Config()
+    daemon = PollingDaemon(create_app(config), min_interval=config.DAEMON_MIN_INTERVAL,
+                           max_interval=config.DAEMON_MAX_INTERVAL, backoff=config.DAEMON_BACKOFF,
+                           jitter=config.DAEMON_JITTER, hot_hours=config.DAEMON_HOT_HOURS)
+    asyncio.run(daemon.run())
+
+
+if __name__ == "__main__":
+    run_daemon()
@@ -1,3 +1,18 @@
-from .dynamodb_handler import DynamoDBHandler
+from .dynamodb_handler import (DynamoDBHandler, STORAGE_MODE_INDEX, STORAGE_MODE_SNAPSHOT, index_record_type,
+                               scan_record_type)
+from .log_store import DynamoDBLogStore, LocalLogStore, RUN_LOG_RECORD_TYPE
+from .snapshot_codec import SNAPSHOT_FORMAT_COMPACT, SNAPSHOT_FORMAT_JSON, decode_files, encode_files
+from .outbox import (DynamoDBOutbox, OutboxEvent, OUTBOX_RECORD_TYPE, OUTBOX_SENT_RECORD_TYPE, SQLiteOutbox,
+                     event_key)
+from .timeline import (EVENT_ADDED, EVENT_REMOVED, ReleaseTimeline, TimelineEvent, timeline_file_record_type,
+                       timeline_module_record_type, timeline_record_type)
+from .subscription_store import (DynamoDBSubscriptionStore, LocalSubscriptionStore, Subscription,
+                                 SUBSCRIPTION_RECORD_TYPE)
 
-__all__ = ['DynamoDBHandler']
+__all__ = ['DynamoDBHandler', 'STORAGE_MODE_INDEX', 'STORAGE_MODE_SNAPSHOT', 'index_record_type', 'scan_record_type',
+           'DynamoDBLogStore', 'LocalLogStore', 'RUN_LOG_RECORD_TYPE',
+           'SNAPSHOT_FORMAT_COMPACT', 'SNAPSHOT_FORMAT_JSON', 'decode_files', 'encode_files',
+           'DynamoDBOutbox', 'OutboxEvent', 'OUTBOX_RECORD_TYPE', 'OUTBOX_SENT_RECORD_TYPE', 'SQLiteOutbox', 'event_key',
+           'EVENT_ADDED', 'EVENT_REMOVED', 'ReleaseTimeline', 'TimelineEvent', 'timeline_file_record_type',
+           'timeline_module_record_type', 'timeline_record_type',
+           'DynamoDBSubscriptionStore', 'LocalSubscriptionStore', 'Subscription', 'SUBSCRIPTION_RECORD_TYPE']
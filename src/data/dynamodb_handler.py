@@ -1,18 +1,64 @@
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from functools import cached_property
 import json
 import logging
-from util import get_timestamp
+import random
+import time
+from util import get_timestamp, traced
+from .snapshot_codec import SNAPSHOT_FORMAT_COMPACT, decode_files, encode_files
 
 logger = logging.getLogger(__name__)
 
 
+TTL_ATTRIBUTE = 'expires_at'
+BATCH_WRITE_LIMIT = 25
+BATCH_MAX_ATTEMPTS = 5
+BATCH_BACKOFF_BASE = 0.1  # seconds
+BATCH_BACKOFF_MAX = 5  # seconds
+
+STORAGE_MODE_SNAPSHOT = 'snapshot'  # one item with the whole file list per run
+STORAGE_MODE_INDEX = 'index'  # one item per known filename, only new files are written
+
+
+def scan_record_type(source=None):
+    """Record type of a page's scan results, the default page keeps the legacy SCAN_RESULT"""
+    return 'SCAN_RESULT' if not source else f'SCAN_RESULT#{source}'
+
+
+def index_record_type(source=None):
+    """Record type of a page's known filename index, the filename is stored in the sort key"""
+    return 'FILE_INDEX' if not source else f'FILE_INDEX#{source}'
+
+
 class DynamoDBHandler:
-    def __init__(self, dynamodb, table_name):
+    def __init__(self, dynamodb, table_name, storage_mode=STORAGE_MODE_SNAPSHOT, retention_days=30, cleanup_day=1,
+                 delete_workers=4, use_ttl=False, snapshot_format=SNAPSHOT_FORMAT_COMPACT):
         # because of credential chain, there is no need to pass aws_credentials
         # read env then ~/.aws then Lambda environment
         self.dynamodb = dynamodb
-        self._create_table_if_not_exists(dynamodb, table_name)
-        self.table = self.dynamodb.Table(table_name)
+        self.storage_mode = storage_mode
+        # records older than retention_days are removed on cleanup_day of the month, 0 means every run
+        self.retention_days = retention_days
+        self.cleanup_day = cleanup_day
+        self.delete_workers = max(1, delete_workers)
+        # let DynamoDB expire old snapshots through the expires_at attribute, deletes cost no write capacity
+        self.use_ttl = use_ttl
+        # compact snapshots are smaller and cheaper to write, json keeps them readable by older versions
+        self.snapshot_format = snapshot_format
+        self.table_name = table_name
+
+    @cached_property
+    def table(self):
+        """Check the table on first use, so a cached handler only pays for it once per container"""
+        self._create_table_if_not_exists(self.dynamodb, self.table_name)
+        if self.use_ttl:
+            self._enable_ttl(self.dynamodb, self.table_name)
+        return self.dynamodb.Table(self.table_name)
+
+    def ensure_table(self):
+        """Check the table now instead of on first use, e.g. before several threads share the handler"""
+        return self.table
 
     def _create_table_if_not_exists(self, dynamodb, table_name):
         """Create DynamoDB table if it doesn't exist"""
@@ -40,17 +86,47 @@ class DynamoDBHandler:
             )
             logger.info(f"{get_timestamp()} - Table {table_name} created successfully")
 
-    def save_scraper_result(self, files):
-        """Save latest files result to DynamoDB"""
+    def _enable_ttl(self, dynamodb, table_name):
+        """Turn on TTL for the expires_at attribute if it is not on yet"""
         try:
-            scan_date = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
-            self.table.put_item(
-                Item={
-                    'record_type': 'SCAN_RESULT',
-                    'scan_date': scan_date,
-                    'files': json.dumps(files)
-                }
+            response = dynamodb.meta.client.describe_time_to_live(TableName=table_name)
+            if response['TimeToLiveDescription'].get('TimeToLiveStatus') in ('ENABLED', 'ENABLING'):
+                return
+            dynamodb.meta.client.update_time_to_live(
+                TableName=table_name,
+                TimeToLiveSpecification={'Enabled': True, 'AttributeName': TTL_ATTRIBUTE}
             )
+            logger.info(f"{get_timestamp()} - TTL enabled on table {table_name}")
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error enabling TTL on table {table_name}: {str(e)}")
+
+    def _expire_after_retention(self, key):
+        """Start the retention window of a snapshot once a newer one replaces it"""
+        expires_at = int(time.time() + self.retention_days * 24 * 60 * 60)
+        self.table.update_item(Key=key, UpdateExpression=f'SET {TTL_ATTRIBUTE} = :ea',
+                               ExpressionAttributeValues={':ea': expires_at})
+
+    @traced('db_write')
+    def save_scraper_result(self, files, source=None, digest=None, scanned_at=None):
+        """Save latest files result to DynamoDB, scanned_at defaults to now"""
+        try:
+            scan_date = (scanned_at or datetime.now()).strftime('%Y-%m-%d-%H-%M-%S')
+            item = {
+                'record_type': scan_record_type(source),
+                'scan_date': scan_date,
+                'files': self._encode_files(files)
+            }
+            if digest:
+                item['digest'] = digest
+            previous = self._latest_scan_key(scan_record_type(source)) if self.use_ttl else None
+            self.table.put_item(Item=item)
+            if previous:
+                # the latest snapshot never expires, it is still needed for the next diff
+                try:
+                    self._expire_after_retention(previous)
+                except Exception as e:
+                    # the new snapshot is saved, the previous one is removed by the cleanup instead
+                    logger.error(f"{get_timestamp()} - Error setting expiry of previous snapshot: {str(e)}")
             logger.info(f"{get_timestamp()} - save latest records to db table {self.table.name} successfully")
             logger.info(f"{get_timestamp()} - file content: {files}")
             return True
@@ -60,53 +136,258 @@ class DynamoDBHandler:
             logger.error(f"{get_timestamp()} - Error message: {str(e)}")
             return False
 
-    def get_last_scraper_result(self):
+    def _encode_files(self, files):
+        """the files attribute of a snapshot, old JSON snapshots stay readable next to compact ones"""
+        if self.snapshot_format == SNAPSHOT_FORMAT_COMPACT:
+            encoded = encode_files(files)
+            if encoded is not None:
+                return encoded
+        return json.dumps(files)
+
+    @traced('db_read')
+    def get_last_scraper_result(self, source=None):
         """Get the most recent result"""
         try:
             response = self.table.query(
                 KeyConditionExpression='record_type = :rt',
                 ExpressionAttributeValues={
-                    ':rt': 'SCAN_RESULT'
+                    ':rt': scan_record_type(source)
                 },
                 Limit=1,
                 ScanIndexForward=False
             )
             items = response.get('Items', [])
             if items:
-                return json.loads(items[0]['files'])
+                return decode_files(items[0]['files'])
             return []
         except Exception as e:
             logger.error(f"{get_timestamp()} - Error getting last scan result: {str(e)}")
             return []
 
-    def deleteOldDbData(self):
-        """At first day of a month, remove records older than 30 days using batch delete"""
-        if datetime.now().day != 1:
-            return
-        thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
+    def iter_scraper_results(self, source=None, page_size=5):
+        """yield (scan datetime, files) of every stored snapshot oldest first, one query page in memory at a time"""
+        query_kwargs = {
+            'KeyConditionExpression': 'record_type = :rt',
+            'ExpressionAttributeValues': {':rt': scan_record_type(source)},
+            'Limit': page_size,
+        }
+        while True:
+            response = self.table.query(**query_kwargs)
+            for item in response.get('Items', []):
+                yield datetime.strptime(item['scan_date'], '%Y-%m-%d-%H-%M-%S'), decode_files(item['files'])
+            if 'LastEvaluatedKey' not in response:
+                return
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
-        response = self.table.query(KeyConditionExpression='record_type = :rt AND scan_date < :sd',
-                                    ExpressionAttributeValues={':rt': 'SCAN_RESULT', ':sd': thirty_days_ago})
+    @traced('db_read')
+    def get_scan_state(self, source=None):
+        """Get digest and heartbeat of a page's last scan, the page's scan record type is the sort key"""
+        try:
+            response = self.table.get_item(Key={'record_type': 'SCAN_STATE', 'scan_date': scan_record_type(source)})
+            return response.get('Item', {})
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error getting scan state: {str(e)}")
+            return {}
 
-        items = response.get('Items', [])
-        # limit batch operations to 25 items
-        batch_size = 25
-        for i in range(0, len(items), batch_size):
-            batch_items = items[i:i + batch_size]
-            request_items = {
-                self.table.name: [
-                    {
-                        'DeleteRequest': {
-                            'Key': {
-                                'record_type': item['record_type'],
-                                'scan_date': item['scan_date']
-                            }
+    @traced('db_write')
+    def save_scan_state(self, digest, source=None):
+        """Save the digest of a changed file list"""
+        try:
+            now = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+            self.table.put_item(
+                Item={
+                    'record_type': 'SCAN_STATE',
+                    'scan_date': scan_record_type(source),
+                    'digest': digest,
+                    'last_changed': now,
+                    'last_checked': now
+                }
+            )
+            return True
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error saving scan state: {str(e)}")
+            return False
+
+    @traced('db_write')
+    def touch_scan_state(self, source=None):
+        """Only update the last checked heartbeat when the file list did not change"""
+        try:
+            self.table.update_item(
+                Key={'record_type': 'SCAN_STATE', 'scan_date': scan_record_type(source)},
+                UpdateExpression='SET last_checked = :now',
+                ExpressionAttributeValues={':now': datetime.now().strftime('%Y-%m-%d-%H-%M-%S')}
+            )
+            return True
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error updating scan state: {str(e)}")
+            return False
+
+    @traced('db_read')
+    def get_scan_dates(self, source=None):
+        """When every stored snapshot was taken, snapshots are only written when the file list changed"""
+        try:
+            scan_dates = []
+            query_kwargs = {
+                'KeyConditionExpression': 'record_type = :rt',
+                'ExpressionAttributeValues': {':rt': scan_record_type(source)},
+                'ProjectionExpression': 'scan_date',
+            }
+            while True:
+                response = self.table.query(**query_kwargs)
+                scan_dates.extend(datetime.strptime(item['scan_date'], '%Y-%m-%d-%H-%M-%S')
+                                  for item in response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    return scan_dates
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error getting scan dates: {str(e)}")
+            return []
+
+    @traced('db_read')
+    def get_known_filenames(self, source=None):
+        """Get every filename in the index, only the sort key is read, None if the query failed"""
+        try:
+            filenames = set()
+            query_kwargs = {
+                'KeyConditionExpression': 'record_type = :rt',
+                'ExpressionAttributeValues': {':rt': index_record_type(source)},
+                'ProjectionExpression': 'scan_date',
+            }
+            while True:
+                response = self.table.query(**query_kwargs)
+                filenames.update(item['scan_date'] for item in response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    return filenames
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error getting known filenames: {str(e)}")
+            # not an empty set, an empty index is seeded from the last snapshot
+            return None
+
+    @traced('db_write')
+    def save_to_file_index(self, files, source=None):
+        """Add files to the index, one item per filename"""
+        try:
+            first_seen = datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+            with self.table.batch_writer(overwrite_by_pkeys=['record_type', 'scan_date']) as batch:
+                for file in files:
+                    batch.put_item(
+                        Item={
+                            'record_type': index_record_type(source),
+                            'scan_date': file['filename'],
+                            'url': file['url'],
+                            'date': file['date'],
+                            'first_seen': first_seen
                         }
-                    }
-                    for item in batch_items
-                ]
+                    )
+            logger.info(f"{get_timestamp()} - save {len(files)} files to index in db table {self.table.name} successfully")
+            return True
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error saving files to index: {str(e)}")
+            logger.error(f"{get_timestamp()} - file content: {files}")
+            return False
+
+    @traced('db_read')
+    def get_http_validators(self):
+        """Get the saved ETag / Last-Modified of every page in one query, format: {url: {'etag': .., 'last_modified': ..}}"""
+        try:
+            response = self.table.query(
+                KeyConditionExpression='record_type = :rt',
+                ExpressionAttributeValues={
+                    ':rt': 'HTTP_VALIDATORS'
+                }
+            )
+            return {
+                item['scan_date']: {key: item[key] for key in ('etag', 'last_modified') if item.get(key)}
+                for item in response.get('Items', [])
             }
-            # Execute batch delete
-            self.dynamodb.meta.client.batch_write_item(RequestItems=request_items)
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error getting http validators: {str(e)}")
+            return {}
+
+    @traced('db_write')
+    def save_http_validators(self, url, validators):
+        """Save the ETag / Last-Modified of a page, the url is stored in the sort key"""
+        try:
+            if not validators:
+                self.table.delete_item(Key={'record_type': 'HTTP_VALIDATORS', 'scan_date': url})
+                return True
+            self.table.put_item(
+                Item={
+                    'record_type': 'HTTP_VALIDATORS',
+                    'scan_date': url,
+                    **validators
+                }
+            )
+            return True
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error saving http validators of {url}: {str(e)}")
+            return False
+
+    @traced('db_cleanup')
+    def deleteOldDbData(self, sources=None, record_types=()):
+        """
+        On the cleanup day remove records older than the retention window, return {'deleted': n, 'seconds': t}
+        sources are the pages whose snapshots are cleaned, record_types are other records to clean such as RUN_LOG
+        with TTL enabled DynamoDB expires the records itself, only records written before TTL was on are deleted here
+        """
+        if self.cleanup_day and datetime.now().day != self.cleanup_day:
+            return {'deleted': 0, 'seconds': 0.0}
+
+        start = time.perf_counter()
+        cutoff = (datetime.now() - timedelta(days=self.retention_days)).strftime('%Y-%m-%d')
+        keys = []
+        for record_type in [scan_record_type(source) for source in sources or [None]] + list(record_types):
+            keys.extend(self._query_keys_before(record_type, cutoff))
+
+        # limit batch operations to 25 items
+        batches = [keys[i:i + BATCH_WRITE_LIMIT] for i in range(0, len(keys), BATCH_WRITE_LIMIT)]
+        deleted = 0
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(self.delete_workers, len(batches))) as executor:
+                deleted = sum(executor.map(self._batch_delete, batches))
+
+        seconds = time.perf_counter() - start
+        logger.info(f"{get_timestamp()} - Deleted {deleted} of {len(keys)} old records in {seconds:.2f} seconds")
+        return {'deleted': deleted, 'seconds': seconds}
+
+    def _latest_scan_key(self, record_type):
+        response = self.table.query(KeyConditionExpression='record_type = :rt',
+                                    ExpressionAttributeValues={':rt': record_type},
+                                    ProjectionExpression='record_type, scan_date',
+                                    Limit=1, ScanIndexForward=False)
+        items = response.get('Items', [])
+        return items[0] if items else None
+
+    def _query_keys_before(self, record_type, cutoff):
+        """Keys of the records older than cutoff, only the keys are read and every page is followed"""
+        # snapshots are only written when the list changes, always keep the latest one
+        latest = self._latest_scan_key(record_type)
+        query_kwargs = {
+            'KeyConditionExpression': 'record_type = :rt AND scan_date < :sd',
+            'ExpressionAttributeValues': {':rt': record_type, ':sd': cutoff},
+            'ProjectionExpression': 'record_type, scan_date',
+        }
+        if self.use_ttl:
+            # records written before TTL was turned on have no expiry, DynamoDB never removes them
+            query_kwargs['FilterExpression'] = f'attribute_not_exists({TTL_ATTRIBUTE})'
+        keys = []
+        while True:
+            response = self.table.query(**query_kwargs)
+            keys.extend(item for item in response.get('Items', []) if item != latest)
+            if 'LastEvaluatedKey' not in response:
+                return keys
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
 
-        logger.info(f"{get_timestamp()} - Deleted {len(items)} old records")
+    def _batch_delete(self, keys):
+        """Delete up to 25 keys, retry unprocessed items with exponential backoff, return the deleted count"""
+        delete_requests = [{'DeleteRequest': {'Key': key}} for key in keys]
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            response = self.dynamodb.meta.client.batch_write_item(RequestItems={self.table.name: delete_requests})
+            delete_requests = response.get('UnprocessedItems', {}).get(self.table.name, [])
+            if not delete_requests:
+                return len(keys)
+            if attempt < BATCH_MAX_ATTEMPTS - 1:
+                time.sleep(min(BATCH_BACKOFF_MAX, BATCH_BACKOFF_BASE * 2 ** attempt) * random.uniform(0.5, 1))
+        logger.error(f"{get_timestamp()} - {len(delete_requests)} old records were not deleted after {BATCH_MAX_ATTEMPTS} attempts")
+        return len(keys) - len(delete_requests)
@@ -0,0 +1,80 @@
+from datetime import datetime
+import gzip
+import logging
+import os
+import time
+from util import get_timestamp, traced
+
+logger = logging.getLogger(__name__)
+
+RUN_LOG_RECORD_TYPE = 'RUN_LOG'
+RUN_LOG_DATE_FORMAT = '%Y-%m-%d-%H-%M-%S-%f'
+
+
+class DynamoDBLogStore:
+    """Append only store of gzip compressed run logs, one item per run in the scraper table"""
+
+    def __init__(self, db_handler, page_size=25):
+        self.db_handler = db_handler
+        # items read per query page, bounds the memory used while streaming
+        self.page_size = page_size
+
+    @traced('db_write')
+    def append(self, log_content):
+        try:
+            item = {
+                'record_type': RUN_LOG_RECORD_TYPE,
+                'scan_date': datetime.now().strftime(RUN_LOG_DATE_FORMAT),
+                'chunk': gzip.compress(log_content.encode('utf-8'))
+            }
+            if self.db_handler.use_ttl:
+                item['expires_at'] = int(time.time() + self.db_handler.retention_days * 24 * 60 * 60)
+            self.db_handler.table.put_item(Item=item)
+            return True
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error saving run log: {str(e)}")
+            return False
+
+    def iter_chunks(self, since):
+        """yield the run logs saved since the given datetime one at a time, oldest first"""
+        query_kwargs = {
+            'KeyConditionExpression': 'record_type = :rt AND scan_date >= :sd',
+            'ExpressionAttributeValues': {':rt': RUN_LOG_RECORD_TYPE, ':sd': since.strftime(RUN_LOG_DATE_FORMAT)},
+            'Limit': self.page_size,
+        }
+        while True:
+            response = self.db_handler.table.query(**query_kwargs)
+            for item in response.get('Items', []):
+                # boto3 returns Binary attributes wrapped, the raw bytes are in value
+                yield gzip.decompress(getattr(item['chunk'], 'value', item['chunk'])).decode('utf-8')
+            if 'LastEvaluatedKey' not in response:
+                return
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+class LocalLogStore:
+    """Local stand-in of the run log store, one gzip file per run in a directory"""
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def append(self, log_content):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{datetime.now().strftime(RUN_LOG_DATE_FORMAT)}.log.gz")
+            with gzip.open(path, 'wt', encoding='utf-8') as file:
+                file.write(log_content)
+            return True
+        except OSError as e:
+            logger.error(f"{get_timestamp()} - Error saving run log: {str(e)}")
+            return False
+
+    def iter_chunks(self, since):
+        """yield the run logs saved since the given datetime one at a time, oldest first"""
+        if not os.path.isdir(self.directory):
+            return
+        since_name = since.strftime(RUN_LOG_DATE_FORMAT)
+        for name in sorted(os.listdir(self.directory)):
+            if name.endswith('.log.gz') and name >= since_name:
+                with gzip.open(os.path.join(self.directory, name), 'rt', encoding='utf-8') as file:
+                    yield file.read()
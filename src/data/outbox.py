@@ -0,0 +1,215 @@
+from collections import namedtuple
+from contextlib import contextmanager
+from datetime import datetime
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from util import get_timestamp, traced
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_RECORD_TYPE = 'OUTBOX'  # pending events, the sort key is the idempotency key
+OUTBOX_SENT_RECORD_TYPE = 'OUTBOX_SENT'  # delivered keys, the sort key is '<sent date>#<key>' so retention applies
+OUTBOX_DATE_FORMAT = '%Y-%m-%d-%H-%M-%S'
+
+# delivered: the recipients the file was already sent to, a retry only goes to the others
+OutboxEvent = namedtuple('OutboxEvent', ['key', 'source', 'file', 'attempts', 'delivered'], defaults=[frozenset()])
+
+
+def event_key(source, file):
+    """idempotency key of a new file event, the same file of the same page is only ever delivered once"""
+    data = '\x1f'.join((source or '', file['filename'], file.get('url') or ''))
+    return hashlib.blake2b(data.encode('utf-8'), digest_size=16).hexdigest()
+
+
+class DynamoDBOutbox:
+    """Durable queue of new file events in the scraper table, written before the snapshot that makes them seen"""
+
+    # table records cleaned by the retention window
+    record_types = (OUTBOX_SENT_RECORD_TYPE,)
+
+    def __init__(self, db_handler):
+        self.db_handler = db_handler
+
+    @traced('db_write')
+    def enqueue(self, files, source=None):
+        """queue one event per file, files already queued or delivered are skipped, return True if all are queued"""
+        try:
+            # the keys are read once and the new events batch written, instead of one conditional put per file
+            known = self._keys(OUTBOX_RECORD_TYPE)
+            known.update(key.rsplit('#', 1)[-1] for key in self._keys(OUTBOX_SENT_RECORD_TYPE))
+            enqueued_at = datetime.now().strftime(OUTBOX_DATE_FORMAT)
+            with self.db_handler.table.batch_writer() as batch:
+                for file in files:
+                    key = event_key(source, file)
+                    if key in known:
+                        continue
+                    known.add(key)
+                    batch.put_item(Item={
+                        'record_type': OUTBOX_RECORD_TYPE,
+                        'scan_date': key,
+                        'source': source or '',
+                        'file': json.dumps(file),
+                        'enqueued_at': enqueued_at,
+                        'attempts': 0,
+                        'next_attempt_at': 0,
+                    })
+            return True
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error queueing {len(files)} new file events: {str(e)}")
+            return False
+
+    @traced('db_read')
+    def pending(self, limit=None):
+        """events due for delivery, oldest first"""
+        try:
+            now = time.time()
+            events = []
+            query_kwargs = {
+                'KeyConditionExpression': 'record_type = :rt',
+                'ExpressionAttributeValues': {':rt': OUTBOX_RECORD_TYPE},
+            }
+            while True:
+                response = self.db_handler.table.query(**query_kwargs)
+                events.extend(item for item in response.get('Items', []) if item['next_attempt_at'] <= now)
+                if 'LastEvaluatedKey' not in response:
+                    break
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+            events.sort(key=lambda item: item['enqueued_at'])
+            return [OutboxEvent(item['scan_date'], item['source'] or None, json.loads(item['file']),
+                                int(item['attempts']), frozenset(json.loads(item.get('delivered', '[]'))))
+                    for item in events[:limit]]
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error reading the outbox: {str(e)}")
+            return []
+
+    @traced('db_write')
+    def mark_delivered(self, events):
+        try:
+            sent_at = datetime.now().strftime(OUTBOX_DATE_FORMAT)
+            with self.db_handler.table.batch_writer() as batch:
+                for event in events:
+                    marker = {'record_type': OUTBOX_SENT_RECORD_TYPE, 'scan_date': f"{sent_at}#{event.key}"}
+                    if self.db_handler.use_ttl:
+                        marker['expires_at'] = int(time.time() + self.db_handler.retention_days * 24 * 60 * 60)
+                    batch.put_item(Item=marker)
+                    batch.delete_item(Key={'record_type': OUTBOX_RECORD_TYPE, 'scan_date': event.key})
+            return True
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error marking {len(events)} outbox events delivered: {str(e)}")
+            return False
+
+    @traced('db_write')
+    def mark_failed(self, events, next_attempt_at):
+        try:
+            for event in events:
+                self.db_handler.table.update_item(
+                    Key={'record_type': OUTBOX_RECORD_TYPE, 'scan_date': event.key},
+                    UpdateExpression='SET attempts = :a, next_attempt_at = :n, delivered = :d',
+                    ExpressionAttributeValues={':a': event.attempts + 1, ':n': int(next_attempt_at(event)),
+                                               ':d': json.dumps(sorted(event.delivered))}
+                )
+            return True
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error rescheduling {len(events)} outbox events: {str(e)}")
+            return False
+
+    def _keys(self, record_type):
+        keys = set()
+        query_kwargs = {
+            'KeyConditionExpression': 'record_type = :rt',
+            'ExpressionAttributeValues': {':rt': record_type},
+            'ProjectionExpression': 'scan_date',
+        }
+        while True:
+            response = self.db_handler.table.query(**query_kwargs)
+            keys.update(item['scan_date'] for item in response.get('Items', []))
+            if 'LastEvaluatedKey' not in response:
+                return keys
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+class SQLiteOutbox:
+    """Local stand-in of the outbox, a SQLite database that keeps delivered keys for retention_days"""
+
+    record_types = ()
+
+    def __init__(self, path, retention_days=30):
+        self.path = path
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        with self._connect() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS outbox (key TEXT PRIMARY KEY, source TEXT, file TEXT, '
+                'enqueued_at REAL, attempts INTEGER, next_attempt_at REAL, delivered_at REAL, delivered TEXT)'
+            )
+            columns = [row[1] for row in connection.execute('PRAGMA table_info(outbox)')]
+            if 'delivered' not in columns:
+                # databases created before the recipients of a file were tracked
+                connection.execute('ALTER TABLE outbox ADD COLUMN delivered TEXT')
+
+    @contextmanager
+    def _connect(self):
+        connection = sqlite3.connect(self.path)
+        try:
+            with connection:  # commits, or rolls back on error
+                yield connection
+        finally:
+            connection.close()
+
+    def enqueue(self, files, source=None):
+        try:
+            now = time.time()
+            with self._lock, self._connect() as connection:
+                connection.executemany(
+                    'INSERT OR IGNORE INTO outbox (key, source, file, enqueued_at, attempts, next_attempt_at) '
+                    'VALUES (?, ?, ?, ?, 0, 0)',
+                    [(event_key(source, file), source or '', json.dumps(file), now) for file in files]
+                )
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"{get_timestamp()} - Error queueing {len(files)} new file events: {str(e)}")
+            return False
+
+    def pending(self, limit=None):
+        try:
+            with self._lock, self._connect() as connection:
+                rows = connection.execute(
+                    'SELECT key, source, file, attempts, delivered FROM outbox WHERE delivered_at IS NULL '
+                    'AND next_attempt_at <= ? ORDER BY enqueued_at, rowid LIMIT ?', (time.time(), limit or -1)
+                ).fetchall()
+            return [OutboxEvent(key, source or None, json.loads(file), attempts,
+                                frozenset(json.loads(delivered or '[]')))
+                    for key, source, file, attempts, delivered in rows]
+        except sqlite3.Error as e:
+            logger.error(f"{get_timestamp()} - Error reading the outbox: {str(e)}")
+            return []
+
+    def mark_delivered(self, events):
+        try:
+            now = time.time()
+            with self._lock, self._connect() as connection:
+                connection.executemany('UPDATE outbox SET delivered_at = ? WHERE key = ?',
+                                       [(now, event.key) for event in events])
+                connection.execute('DELETE FROM outbox WHERE delivered_at < ?',
+                                   (now - self.retention_days * 24 * 60 * 60,))
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"{get_timestamp()} - Error marking {len(events)} outbox events delivered: {str(e)}")
+            return False
+
+    def mark_failed(self, events, next_attempt_at):
+        try:
+            with self._lock, self._connect() as connection:
+                connection.executemany(
+                    'UPDATE outbox SET attempts = ?, next_attempt_at = ?, delivered = ? WHERE key = ?',
+                    [(event.attempts + 1, next_attempt_at(event), json.dumps(sorted(event.delivered)), event.key)
+                     for event in events]
+                )
+            return True
+        except sqlite3.Error as e:
+            logger.error(f"{get_timestamp()} - Error rescheduling {len(events)} outbox events: {str(e)}")
+            return False
@@ -0,0 +1,80 @@
+import json
+import re
+import zlib
+
+SNAPSHOT_FORMAT_JSON = 'json'  # the file list as a JSON string, readable by every version
+SNAPSHOT_FORMAT_COMPACT = 'compact'  # columnar, compressed, stored as a Binary attribute
+
+COMPACT_ZLIB_V1 = 1  # first byte of a compact snapshot, bump it when the layout changes
+FILE_KEYS = frozenset(('filename', 'url', 'date'))
+PACKED_DATE_PATTERN = re.compile(r'^([0-9]{4})\.([0-9]{2})\.([0-9]{2})$')
+FILENAME_MARKER = '\x00'  # stands for the filename inside a url template
+
+
+def _pack_date(date):
+    """'2024.01.31' -> 20240131, None if the date has another format"""
+    match = PACKED_DATE_PATTERN.match(date) if isinstance(date, str) else None
+    if not match:
+        return None
+    year, month, day = match.groups()
+    return int(year) * 10000 + int(month) * 100 + int(day)
+
+
+def _unpack_date(packed):
+    return f"{packed // 10000:04d}.{packed // 100 % 100:02d}.{packed % 100:02d}"
+
+
+def encode_files(files):
+    """
+    compact snapshot of a file list: a version byte, then zlib compressed columns
+    urls are dictionary encoded as templates with the filename cut out, most pages share a handful of them
+    returns None if a file has other keys than filename, url and date, those are stored as JSON instead
+    """
+    templates = {}
+    packed_dates = {}
+    filenames, template_ids, dates, other_dates = [], [], [], {}
+    for i, file in enumerate(files):
+        if file.keys() != FILE_KEYS:
+            return None
+        filename, url = file['filename'], file['url']
+        template = url.replace(filename, FILENAME_MARKER, 1) if filename else url
+        template_ids.append(templates.setdefault(template, len(templates)))
+        filenames.append(filename)
+        date = file['date']
+        packed = packed_dates[date] if date in packed_dates else packed_dates.setdefault(date, _pack_date(date))
+        if packed is None:
+            other_dates[i] = date
+            packed = 0
+        dates.append(packed)
+    columns = {
+        'filenames': filenames,
+        'templates': list(templates),
+        'template_ids': template_ids,
+        'dates': dates,
+        'other_dates': other_dates,
+    }
+    payload = json.dumps(columns, separators=(',', ':')).encode('utf-8')
+    return bytes((COMPACT_ZLIB_V1,)) + zlib.compress(payload)
+
+
+def decode_files(value):
+    """file list of a stored snapshot, value is either the legacy JSON string or a compact Binary attribute"""
+    if isinstance(value, str):
+        return json.loads(value)
+    # boto3 wraps binary attributes in Binary
+    data = bytes(getattr(value, 'value', value))
+    if not data or data[0] != COMPACT_ZLIB_V1:
+        raise ValueError(f"unknown snapshot format {data[:1]!r}")
+    columns = json.loads(zlib.decompress(data[1:]))
+    templates = columns['templates']
+    # a page lists few distinct dates, unpack each once
+    dates = {packed: _unpack_date(packed) for packed in set(columns['dates'])}
+    files = [
+        {'filename': filename, 'url': templates[template_id].replace(FILENAME_MARKER, filename, 1),
+         'date': dates[packed]}
+        for filename, template_id, packed in zip(columns['filenames'], columns['template_ids'], columns['dates'])
+    ]
+    # JSON object keys are strings
+    for i, date in columns['other_dates'].items():
+        files[int(i)]['date'] = date
+    return files
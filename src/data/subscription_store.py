@@ -0,0 +1,103 @@
+from collections import namedtuple
+import json
+import logging
+import os
+from util import get_timestamp, traced
+
+logger = logging.getLogger(__name__)
+
+SUBSCRIPTION_RECORD_TYPE = 'SUBSCRIPTION'
+
+# rules format: [{'module': 'XiaomiEUModule'}, {'prefix': 'xiaomi.eu_multi_', 'exclude': ['beta']}]
+# a file matches a rule by its module name or filename prefix, an empty prefix matches every file
+Subscription = namedtuple('Subscription', ['email', 'rules'])
+
+
+class DynamoDBSubscriptionStore:
+    """Subscribers and their filter rules, one item per subscriber in the scraper table keyed by email"""
+
+    def __init__(self, db_handler):
+        self.db_handler = db_handler
+
+    @traced('db_read')
+    def list_subscriptions(self):
+        try:
+            subscriptions = []
+            query_kwargs = {
+                'KeyConditionExpression': 'record_type = :rt',
+                'ExpressionAttributeValues': {':rt': SUBSCRIPTION_RECORD_TYPE},
+            }
+            while True:
+                response = self.db_handler.table.query(**query_kwargs)
+                subscriptions.extend(Subscription(item['scan_date'], json.loads(item['rules']))
+                                     for item in response.get('Items', []))
+                if 'LastEvaluatedKey' not in response:
+                    return subscriptions
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error getting subscriptions: {str(e)}")
+            return []
+
+    @traced('db_write')
+    def save_subscription(self, email, rules):
+        try:
+            self.db_handler.table.put_item(Item={
+                'record_type': SUBSCRIPTION_RECORD_TYPE,
+                'scan_date': email,
+                'rules': json.dumps(rules)
+            })
+            return True
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error saving subscription of {email}: {str(e)}")
+            return False
+
+    @traced('db_write')
+    def delete_subscription(self, email):
+        try:
+            self.db_handler.table.delete_item(Key={'record_type': SUBSCRIPTION_RECORD_TYPE, 'scan_date': email})
+            return True
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error deleting subscription of {email}: {str(e)}")
+            return False
+
+
+class LocalSubscriptionStore:
+    """Local stand-in of the subscription store, a JSON file of {email: rules}"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def list_subscriptions(self):
+        return [Subscription(email, rules) for email, rules in self._load().items()]
+
+    def save_subscription(self, email, rules):
+        subscriptions = self._load()
+        subscriptions[email] = rules
+        return self._write(subscriptions)
+
+    def delete_subscription(self, email):
+        subscriptions = self._load()
+        subscriptions.pop(email, None)
+        return self._write(subscriptions)
+
+    def _load(self):
+        try:
+            with open(self.path, encoding='utf-8') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.error(f"{get_timestamp()} - Error reading subscriptions from {self.path}: {str(e)}")
+            return {}
+
+    def _write(self, subscriptions):
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as file:
+                json.dump(subscriptions, file, indent=2)
+            return True
+        except OSError as e:
+            logger.error(f"{get_timestamp()} - Error saving subscriptions to {self.path}: {str(e)}")
+            return False
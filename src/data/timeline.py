@@ -0,0 +1,150 @@
+from collections import namedtuple
+from datetime import datetime
+import logging
+from util import get_timestamp, traced
+
+logger = logging.getLogger(__name__)
+
+TIMELINE_DATE_FORMAT = '%Y-%m-%d-%H-%M-%S'
+EVENT_ADDED = 'added'
+EVENT_REMOVED = 'removed'
+
+TimelineEvent = namedtuple('TimelineEvent', ['date', 'event', 'filename', 'url', 'module'])
+
+
+def timeline_record_type(source=None):
+    """every added / removed event of a page, the sort key is '<date>#<event>#<filename>'"""
+    return 'TIMELINE' if not source else f'TIMELINE#{source}'
+
+
+def timeline_module_record_type(module, source=None):
+    """the same events partitioned by module"""
+    return f'TIMELINE_MODULE#{module}' if not source else f'TIMELINE_MODULE#{source}#{module}'
+
+
+def timeline_file_record_type(source=None):
+    """one item per filename with first_seen, last_seen and whether it is still listed"""
+    return 'TIMELINE_FILE' if not source else f'TIMELINE_FILE#{source}'
+
+
+class ReleaseTimeline:
+    """
+    first seen / last seen index of every file, written on each run from the diff so history
+    questions are answered with key range queries instead of loading snapshots
+    """
+
+    def __init__(self, db_handler):
+        self.db_handler = db_handler
+
+    @traced('db_write')
+    def record(self, added, removed, source=None, when=None, first_add_is_earliest=False, first_record=False):
+        """
+        write the events of one run, added and removed are file dicts with filename, url and module
+        when is the scan date of the run's snapshot, so the backfill writes the same event keys again
+        first_add_is_earliest moves first_seen back to when if it is earlier, used by the backfill which goes
+        oldest first and may only see the snapshots still inside the retention window
+        first_record: the page has no file items yet, they are put in the batch instead of one update per file
+        """
+        try:
+            date = (when or datetime.now()).strftime(TIMELINE_DATE_FORMAT)
+            with self.db_handler.table.batch_writer() as batch:
+                for event, files in ((EVENT_ADDED, added), (EVENT_REMOVED, removed)):
+                    for file in files:
+                        item = {
+                            'scan_date': f"{date}#{event}#{file['filename']}",
+                            'event': event,
+                            'filename': file['filename'],
+                            'url': file.get('url') or '',
+                            'module': file.get('module') or '',
+                        }
+                        batch.put_item(Item={'record_type': timeline_record_type(source), **item})
+                        if item['module']:
+                            batch.put_item(Item={
+                                'record_type': timeline_module_record_type(item['module'], source), **item})
+                if first_record:
+                    for file in added:
+                        batch.put_item(Item={'record_type': timeline_file_record_type(source),
+                                             'scan_date': file['filename'], 'first_seen': date,
+                                             'url': file.get('url') or '', 'module': file.get('module') or '',
+                                             'listed': True})
+            for file in ([] if first_record else added):
+                values = {':d': date, ':u': file.get('url') or '', ':m': file.get('module') or '', ':l': True}
+                if first_add_is_earliest:
+                    self._lower_first_seen(file, source, values)
+                else:
+                    self._update_file(file, source, 'SET first_seen = if_not_exists(first_seen, :d), '
+                                                    'url = :u, module = :m, listed = :l', values)
+            for file in removed:
+                self._update_file(file, source, 'SET last_seen = :d, listed = :l', {':d': date, ':l': False})
+            return True
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error saving release timeline: {str(e)}")
+            return False
+
+    def _update_file(self, file, source, update_expression, values, **kwargs):
+        self.db_handler.table.update_item(
+            Key={'record_type': timeline_file_record_type(source), 'scan_date': file['filename']},
+            UpdateExpression=update_expression,
+            ExpressionAttributeValues=values,
+            **kwargs
+        )
+
+    def _lower_first_seen(self, file, source, values):
+        """write the file item only if it has no first_seen or a later one, an earlier first_seen is kept"""
+        try:
+            self._update_file(file, source, 'SET first_seen = :d, url = :u, module = :m, listed = :l', values,
+                              ConditionExpression='attribute_not_exists(first_seen) OR first_seen > :d')
+        except self.db_handler.dynamodb.meta.client.exceptions.ConditionalCheckFailedException:
+            pass
+
+    @traced('db_read')
+    def get_file(self, filename, source=None):
+        """{'first_seen': datetime, 'last_seen': datetime or None, 'listed': bool, 'url', 'module'} or None"""
+        try:
+            item = self.db_handler.table.get_item(
+                Key={'record_type': timeline_file_record_type(source), 'scan_date': filename}).get('Item')
+            if not item:
+                return None
+            return {
+                'filename': filename,
+                'first_seen': datetime.strptime(item['first_seen'], TIMELINE_DATE_FORMAT),
+                'last_seen': datetime.strptime(item['last_seen'], TIMELINE_DATE_FORMAT)
+                if item.get('last_seen') else None,
+                'listed': bool(item.get('listed')),
+                'url': item.get('url', ''),
+                'module': item.get('module', ''),
+            }
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error getting timeline of {filename}: {str(e)}")
+            return None
+
+    @traced('db_read')
+    def events_between(self, start, end, source=None, module=None, event=None):
+        """TimelineEvents from start to end inclusive, oldest first, optionally of one module or event type"""
+        try:
+            record_type = timeline_module_record_type(module, source) if module else timeline_record_type(source)
+            query_kwargs = {
+                'KeyConditionExpression': 'record_type = :rt AND scan_date BETWEEN :start AND :end',
+                'ExpressionAttributeValues': {
+                    ':rt': record_type,
+                    ':start': start.strftime(TIMELINE_DATE_FORMAT),
+                    ':end': f"{end.strftime(TIMELINE_DATE_FORMAT)}~",  # '~' sorts after the '#' suffixes
+                },
+            }
+            events = []
+            while True:
+                response = self.db_handler.table.query(**query_kwargs)
+                for item in response.get('Items', []):
+                    if event is None or item['event'] == event:
+                        events.append(TimelineEvent(
+                            datetime.strptime(item['scan_date'].split('#', 1)[0], TIMELINE_DATE_FORMAT),
+                            item['event'], item['filename'], item['url'], item['module']))
+                if 'LastEvaluatedKey' not in response:
+                    return events
+                query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - Error querying release timeline: {str(e)}")
+            return []
+
+    def released_between(self, start, end, source=None, module=None):
+        return self.events_between(start, end, source, module, EVENT_ADDED)
@@ -1,26 +1,98 @@
-import boto3
-from scraper import XiaomiEUScraper
-from data import DynamoDBHandler
-from notification import EmailSender
-from util import Config, setup_logging
-from service import UpdateService
+import time
+from scraper import XiaomiEUScraper, MultiSourceScraper, get_session
+from data import (DynamoDBHandler, DynamoDBLogStore, DynamoDBOutbox, DynamoDBSubscriptionStore, LocalLogStore,
+                  LocalSubscriptionStore, ReleaseTimeline, SQLiteOutbox)
+from notification import EmailDispatcher, EmailSender
+from util import Config, configure_tracing, lazy_client, lazy_resource, reset_spans, setup_logging
+from service import Stage, UpdateService, run_stages
 
 
-def create_app():
-    config = Config()
-    scraper = XiaomiEUScraper(config.URL)
-    db_handler = DynamoDBHandler(boto3.resource('dynamodb'),config.TABLE_NAME)
-    email_sender = EmailSender(boto3.client('ses'), config.sender_recipient_addresses)
+def create_app(config=None):
+    config = config or Config()
+    configure_tracing(config.TRACING_ENABLED, config.METRICS_NAMESPACE)
+    get_session(pool_size=max(config.MAX_CONCURRENT_FETCHES, 1), max_retries=config.HTTP_MAX_RETRIES)
+    scraper_options = {
+        'streaming': config.STREAM_PARSE,
+        'parsers': config.PARSER_BACKENDS,
+        'timeout': config.http_timeout,
+    }
+    if len(config.URLS) > 1:
+        scraper = MultiSourceScraper(config.URLS, config.MAX_CONCURRENT_FETCHES, **scraper_options)
+    else:
+        scraper = XiaomiEUScraper(config.URLS[0] if config.URLS else config.URL, **scraper_options)
+    db_handler = DynamoDBHandler(lazy_resource('dynamodb'), config.TABLE_NAME, config.STORAGE_MODE,
+                                 retention_days=config.RETENTION_DAYS, cleanup_day=config.CLEANUP_DAY,
+                                 delete_workers=config.DELETE_WORKERS, use_ttl=config.USE_TTL,
+                                 snapshot_format=config.SNAPSHOT_FORMAT)
+    ses = lazy_client('ses')
+    email_sender = EmailSender(ses, config.sender_recipient_addresses,
+                               verification_ttl=config.SES_VERIFICATION_TTL,
+                               dispatcher=EmailDispatcher(ses, max_workers=config.SES_MAX_WORKERS),
+                               max_files_in_email=config.EMAIL_MAX_FILES or None)
+
+    if config.LOG_STORE == 'dynamodb':
+        log_store = DynamoDBLogStore(db_handler)
+    elif config.LOG_STORE == 'local':
+        log_store = LocalLogStore(config.LOG_STORE_DIR)
+    else:
+        log_store = None
+
+    if config.SUBSCRIPTION_STORE == 'dynamodb':
+        subscription_store = DynamoDBSubscriptionStore(db_handler)
+    elif config.SUBSCRIPTION_STORE == 'local':
+        subscription_store = LocalSubscriptionStore(config.SUBSCRIPTION_FILE)
+    else:
+        subscription_store = None
+
+    if config.OUTBOX == 'dynamodb':
+        outbox = DynamoDBOutbox(db_handler)
+    elif config.OUTBOX == 'sqlite':
+        outbox = SQLiteOutbox(config.OUTBOX_DB, retention_days=config.RETENTION_DAYS)
+    else:
+        outbox = None
+    outbox_options = {
+        'batch_size': config.OUTBOX_BATCH_SIZE,
+        'retry_base': config.OUTBOX_RETRY_BASE,
+        'retry_max': config.OUTBOX_RETRY_MAX,
+    }
+
+    return UpdateService(scraper, db_handler, email_sender, log_store,
+                         notify_newest_per_module=config.NOTIFY_NEWEST_PER_MODULE or None,
+                         subscription_store=subscription_store, outbox=outbox, outbox_options=outbox_options,
+                         timeline=ReleaseTimeline(db_handler) if config.TIMELINE_ENABLED else None,
+                         stage_workers=config.STAGE_WORKERS)
+
+
+# kept at module scope so warm invocations reuse the clients, the table check and the SES verification
+_app = None
+_app_created_at = 0.0
+_app_cache_ttl = 0
+
 
-    return UpdateService(scraper, db_handler, email_sender)
+def get_app():
+    global _app, _app_created_at, _app_cache_ttl
+    if _app is None or (_app_cache_ttl and time.monotonic() - _app_created_at > _app_cache_ttl):
+        config = Config()
+        _app = create_app(config)
+        _app_created_at = time.monotonic()
+        _app_cache_ttl = config.APP_CACHE_TTL
+    return _app
 
 
 def lambda_handler(event, context):
     setup_logging()
-    service = create_app()
-    service.check_new_files_and_send_email()
-    service.send_log_email()
-    service.deleteOldDbData()
+    reset_spans()
+    service = get_app()
+    # check the table once, before the stages that read and clean it run at the same time
+    service.db_handler.ensure_table()
+    run_stages([
+        Stage('check', service.check_all_sources_and_send_email),
+        Stage('drain_outbox', lambda _: service.drain_outbox(), ('check',)),
+        # the log email carries this run's log, so it waits for the checks
+        Stage('log_email', lambda _: service.send_log_email(), ('drain_outbox',)),
+        Stage('cleanup', service.deleteOldDbData),
+    ], service.stage_workers)
+    service.save_run_log()
 
     return {
         'statusCode': 200,
@@ -1,3 +1,4 @@
-from .email_sender import EmailSender
+from .dispatcher import EmailDispatcher, TokenBucket
+from .email_sender import EmailSender, clear_verification_cache, verification_cache_stats
 
-__all__ = ['EmailSender']
+__all__ = ['EmailDispatcher', 'TokenBucket', 'EmailSender', 'clear_verification_cache', 'verification_cache_stats']
@@ -0,0 +1,94 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import logging
+import threading
+import time
+from util import get_timestamp, traced
+
+logger = logging.getLogger(__name__)
+
+SES_MAX_RECIPIENTS = 50  # SES limit of recipients per message
+DEFAULT_SEND_RATE = 1  # messages per second, SES sandbox rate
+
+DispatchResult = namedtuple('DispatchResult', ['recipients', 'success'])
+
+
+class TokenBucket:
+    """Thread safe token bucket, acquire blocks until enough tokens are available"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        # a request larger than the bucket waits for a full bucket and leaves it in debt
+        needed = min(tokens, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+                self._updated_at = now
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                wait = (needed - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class EmailDispatcher:
+    """Split recipients into SES sized chunks and send them concurrently within the account's send rate"""
+
+    def __init__(self, ses, max_workers=4, max_recipients=SES_MAX_RECIPIENTS, send_rate=None):
+        self.ses = ses
+        self.max_workers = max(1, max_workers)
+        self.max_recipients = max_recipients
+        self._send_rate = send_rate
+        self._bucket = None
+        self._lock = threading.Lock()
+
+    @property
+    def bucket(self):
+        with self._lock:
+            if self._bucket is None:
+                self._bucket = TokenBucket(self._send_rate or self._get_max_send_rate())
+            return self._bucket
+
+    def dispatch(self, recipients, send_message):
+        """
+        send_message(recipients) sends one message and returns True on success
+        return format: [DispatchResult(recipients, success)] in chunk order
+        """
+        return self.dispatch_many([(recipients, send_message)])
+
+    def dispatch_many(self, messages):
+        """
+        send different messages concurrently, messages format: [(recipients, send_message)]
+        return format: [DispatchResult(recipients, success)] in message and chunk order
+        """
+        chunks = [(recipients[i:i + self.max_recipients], send_message)
+                  for recipients, send_message in messages
+                  for i in range(0, len(recipients), self.max_recipients)]
+        if len(chunks) <= 1:
+            return [self._send_chunk(chunk, send_message) for chunk, send_message in chunks]
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(chunks))) as executor:
+            return list(executor.map(lambda args: self._send_chunk(*args), chunks))
+
+    def _send_chunk(self, chunk, send_message):
+        # SES counts every recipient against the send rate
+        self.bucket.acquire(len(chunk))
+        try:
+            return DispatchResult(chunk, bool(send_message(chunk)))
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - email send to {len(chunk)} recipients failed: {str(e)}")
+            return DispatchResult(chunk, False)
+
+    @traced('ses_quota')
+    def _get_max_send_rate(self):
+        try:
+            return float(self.ses.get_send_quota()['MaxSendRate']) or DEFAULT_SEND_RATE
+        except Exception as e:
+            logger.warning(f"{get_timestamp()} - could not get SES send quota, using {DEFAULT_SEND_RATE}/s: {str(e)}")
+            return DEFAULT_SEND_RATE
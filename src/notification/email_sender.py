@@ -1,105 +1,160 @@
-from botocore.exceptions import ClientError
 from datetime import datetime
-import logging.handlers
-from util import emails_string_to_list, get_timestamp, get_log_content
+import logging
+import threading
+import time
+from util import emails_string_to_list, get_timestamp, get_last_log_message, get_log_content, traced
+from .dispatcher import DispatchResult, EmailDispatcher
+from .templates import render_log, render_new_files
 
 logger = logging.getLogger(__name__)
 
+SES_IDENTITIES_PER_CALL = 100
+
+# identity -> (verified, checked at), shared by every sender in a warm container
+_verification_cache = {}
+_verification_stats = {'hits': 0, 'misses': 0}
+_verification_lock = threading.Lock()
+
 
 class EmailSender:
-    def __init__(self, ses, sender_recipient_addresses):
+    def __init__(self, ses, sender_recipient_addresses, verification_ttl=3600, dispatcher=None,
+                 max_files_in_email=None):
         # because of credential chain, there is no need to pass aws_credentials
         # read env then ~/.aws then Lambda environment
         self.ses = ses
         self.sender_email = sender_recipient_addresses['sender_email']
         self.new_file_recipient_emails = emails_string_to_list(sender_recipient_addresses['new_file_recipient_emails'])
         self.log_recipient_emails = emails_string_to_list(sender_recipient_addresses['log_recipient_emails'])
-
-        self.is_sender_email_verified = self._check_email_verified(self.sender_email, 'sender')
-        self.is_new_file_recipient_emails_verified = self._check_emails_verified(self.new_file_recipient_emails,
-                                                                                 'new file recipient')
-        self.is_log_recipient_emails_verified = self._check_emails_verified(self.log_recipient_emails, 'log recipient')
+        self.verification_ttl = verification_ttl
+        # longer new file lists are truncated to a digest in the email
+        self.max_files_in_email = max_files_in_email
+        self.dispatcher = dispatcher or EmailDispatcher(ses)
+        # per message results of the last send
+        self.last_dispatch_results = []
+
+    # verification is checked on first send, then answered from the TTL cache
+    @property
+    def is_sender_email_verified(self):
+        return self._check_email_verified(self.sender_email, 'sender')
+
+    @property
+    def is_new_file_recipient_emails_verified(self):
+        return self._check_emails_verified(self.new_file_recipient_emails, 'new file recipient')
+
+    @property
+    def is_log_recipient_emails_verified(self):
+        return self._check_emails_verified(self.log_recipient_emails, 'log recipient')
 
     def send_new_file_email(self, new_files):
         """send new file notification email"""
+        # imported here so importing this module does not load botocore
+        from botocore.exceptions import BotoCoreError, ClientError
         subject = "new files detected"
 
-        # build email content
-        body_html = """
-        <html>
-        <head></head>
-        <body>
-            <h2>new files detected</h2>
-            <ul>
-        """
-
-        for file in new_files:
-            body_html += f"""
-                <li>
-                    <p>filename: {file['filename']}</p>
-                    <p>download link: <a href="{file['url']}">{file['url']}</a></p>
-                    <p>update date: {file['date']}</p>
-                </li>
-            """
-
-        body_html += f"""
-            </ul>
-            <p>generated date: {get_timestamp()}</p>
-        </body>
-        </html>
-        """
+        body_html, body_text = render_new_files(new_files, get_timestamp(), self.max_files_in_email)
 
         try:
             type = 'new files'
             if self.is_sender_email_verified and self.is_new_file_recipient_emails_verified:
-                value = self._ses_send_email(self.new_file_recipient_emails, subject, body_html, type)
-                import time
-                time.sleep(2)
-                return value
+                return self._dispatch(self.new_file_recipient_emails, subject, body_html, type, body_text)
             else:
                 logger.error(f"{get_timestamp()} - {type} email send failed: sender or recipient verify failed")
                 return False
-        except ClientError as e:
+        except (BotoCoreError, ClientError) as e:
             logger.error(f"{get_timestamp()} - {type} email send failed: {str(e)}")
             return False
 
-    def send_log_email(self):
-        """send program run log email"""
-
+    def send_new_file_emails(self, messages, type='new files'):
+        """
+        send every (recipients, files) message, messages format: [(recipients, files)]
+        recipients SES answered are not verified are logged and skipped, that is a setup problem and not a failed send
+        recipients whose verification could not be looked up, or every recipient if the sender is not verified,
+        count as failed so their files are sent again
+        return format: [DispatchResult(recipients, success)] of the sent chunks and the failed recipients
+        """
+        subject = "new files detected"
+        statuses = self._verify_identities([recipient for recipients, _ in messages for recipient in recipients])
+        if not statuses.get(self.sender_email):
+            logger.error(f"{get_timestamp()} - {type} email send failed: sender verify failed")
+            failed = [DispatchResult(list(recipients), False) for recipients, _ in messages if recipients]
+            self.last_dispatch_results = failed
+            return failed
+
+        generated = get_timestamp()
+        to_send = []
+        failed = []
+        for recipients, files in messages:
+            verified, unknown = [], []
+            for recipient in recipients:
+                status = statuses.get(recipient)
+                if status:
+                    verified.append(recipient)
+                elif status is None:
+                    logger.error(f"{get_timestamp()} - {type} email {recipient} could not be verified, send later")
+                    unknown.append(recipient)
+                else:
+                    logger.error(f"{get_timestamp()} - {type} email {recipient} is not verified in SES, skipped")
+            if unknown:
+                failed.append(DispatchResult(unknown, False))
+            if not verified:
+                continue
+            body_html, body_text = render_new_files(files, generated, self.max_files_in_email)
+            to_send.append((verified, lambda chunk, body_html=body_html, body_text=body_text:
+                            self._ses_send_email(chunk, subject, body_html, type, body_text=body_text)))
+
+        results = self.dispatcher.dispatch_many(to_send) + failed
+        self.last_dispatch_results = results
+        return results
+
+    def send_subscriber_digests(self, files_by_subscriber):
+        """send every subscriber one email with the new files matching their filters, same results as above"""
+        return self.send_new_file_emails([([subscriber], files) for subscriber, files in files_by_subscriber.items()],
+                                         type='subscription')
+
+    def is_log_email_day(self):
         # Check if today is Saturday (where weekday() returns 5 for Saturday), only send email on Saturdays
-        if datetime.now().weekday() != 5:
-            logger.info(f"{get_timestamp()} - Not Saturday, skipping log email")
-            return True;
+        return datetime.now().weekday() == 5
+
+    def send_log_email(self, log_content=None, title="Crawler from AWS Lambda run log"):
+        """send program run log email, log_content defaults to this run's log, the caller checks is_log_email_day"""
+        from botocore.exceptions import BotoCoreError, ClientError
 
-        # Get logs from global buffer
-        log_content = get_log_content()
-        last_line = log_content.strip().split('\n')[-1]
-        new_file_message = last_line.split('-')[-1].strip()
+        # Get logs from the log buffer, only rendered now that the email is sent
+        new_file_message = get_last_log_message().split('-')[-1].strip()
+        if log_content is None:
+            log_content = get_log_content()
 
         subject = "Crawler run log (AWS Lambda) - " + new_file_message
-        body_html = f"""
-        <html>
-        <head></head>
-        <body>
-            <h2>Crawler from AWS Lambda run log</h2>
-            <pre style="background-color: #f5f5f5; padding: 15px; border-radius: 5px;">{log_content}</pre>
-            <p>generated date: {get_timestamp()}</p>
-        </body>
-        </html>
-        """
+        body_html, body_text = render_log(title, log_content, get_timestamp())
 
         try:
             type = 'logs'
             if self.is_sender_email_verified and self.is_log_recipient_emails_verified:
-                return self._ses_send_email(self.log_recipient_emails, subject, body_html, type)
+                return self._dispatch(self.log_recipient_emails, subject, body_html, type, body_text)
             else:
                 logger.error(f"{get_timestamp()} - {type} email send failed: sender or recipient verify failed")
                 return False
-        except ClientError as e:
+        except (BotoCoreError, ClientError) as e:
             logger.error(f"{get_timestamp()} - {type} email send failed: {str(e)}")
             return False
 
-    def _ses_send_email(self, recipients, subject, body_html, type):
+    def _dispatch(self, recipients, subject, body_html, type, body_text=None):
+        """send to every recipient in SES sized chunks, True only if every chunk was sent"""
+        results = self.dispatcher.dispatch(
+            recipients, lambda chunk: self._ses_send_email(chunk, subject, body_html, type, body_text=body_text))
+        self.last_dispatch_results = results
+        return all(result.success for result in results)
+
+    @traced('ses_send')
+    def _ses_send_email(self, recipients, subject, body_html, type, body_text=None):
+        from botocore.exceptions import BotoCoreError, ClientError
+        body = {
+            'Html': {
+                'Data': body_html
+            }
+        }
+        if body_text is not None:
+            body['Text'] = {'Data': body_text}
         try:
             response = self.ses.send_email(
                 Source=self.sender_email,
@@ -110,34 +165,75 @@ class EmailSender:
                     'Subject': {
                         'Data': subject
                     },
-                    'Body': {
-                        'Html': {
-                            'Data': body_html
-                        }
-                    }
+                    'Body': body
                 }
             )
             logger.info(f"{get_timestamp()} - {type} email send success: {response['MessageId']}")
             return True
-        except ClientError as e:
+        except (BotoCoreError, ClientError) as e:
             logger.error(f"{get_timestamp()} - {type} email send failed: {str(e)}")
             return False
 
     def _check_emails_verified(self, emails, role):
+        statuses = self._verify_identities()
+        verified = True
         for email in emails:
-            if not self._check_email_verified(email, role):
-                return False
-        return True
+            if not statuses.get(email):
+                logger.error(f"{get_timestamp()} - {role} email {email} is not verified in SES")
+                verified = False
+        return verified
 
     def _check_email_verified(self, email, role):
         """check if sender or recipient is verified in SES"""
-        try:
-            response = self.ses.get_identity_verification_attributes(Identities=[email])
-            if email not in response['VerificationAttributes'] or \
-                    response['VerificationAttributes'][email]['VerificationStatus'] != 'Success':
-                logger.error(f"{get_timestamp()} - {role} email {email} is not verified in SES")
-                return False
-            return True
-        except ClientError as e:
-            logger.error(f"{get_timestamp()} - Failed to verify {role} email {email}: {str(e)}")
-            return False
+        return self._check_emails_verified([email], role)
+
+    @traced('ses_verify')
+    def _verify_identities(self, extra_identities=()):
+        """
+        verification status of the sender and every recipient, deduplicated and checked in batches of 100
+        results are cached for verification_ttl seconds across senders in the same container
+        identities of a batch whose lookup failed are None and not cached
+        """
+        from botocore.exceptions import BotoCoreError, ClientError
+        identities = [email for email in dict.fromkeys([self.sender_email, *self.new_file_recipient_emails,
+                                                        *self.log_recipient_emails, *extra_identities]) if email]
+        now = time.monotonic()
+        statuses = {}
+        missing = []
+        with _verification_lock:
+            for identity in identities:
+                cached = _verification_cache.get(identity)
+                if cached is not None and now - cached[1] < self.verification_ttl:
+                    _verification_stats['hits'] += 1
+                    statuses[identity] = cached[0]
+                else:
+                    _verification_stats['misses'] += 1
+                    missing.append(identity)
+
+        for i in range(0, len(missing), SES_IDENTITIES_PER_CALL):
+            batch = missing[i:i + SES_IDENTITIES_PER_CALL]
+            try:
+                response = self.ses.get_identity_verification_attributes(Identities=batch)
+            except (BotoCoreError, ClientError) as e:
+                logger.error(f"{get_timestamp()} - Failed to verify emails {batch}: {str(e)}")
+                statuses.update(dict.fromkeys(batch))
+                continue
+            attributes = response['VerificationAttributes']
+            with _verification_lock:
+                for identity in batch:
+                    verified = attributes.get(identity, {}).get('VerificationStatus') == 'Success'
+                    statuses[identity] = verified
+                    _verification_cache[identity] = (verified, now)
+        return statuses
+
+
+def verification_cache_stats():
+    """hit and miss counts of the SES verification cache"""
+    with _verification_lock:
+        return dict(_verification_stats)
+
+
+def clear_verification_cache():
+    with _verification_lock:
+        _verification_cache.clear()
+        _verification_stats.update(hits=0, misses=0)
@@ -0,0 +1,81 @@
+from html import escape
+
+# templates are built once at import as bound str.format methods, the bodies are built with list joins
+
+NEW_FILES_HTML = """<html>
+<head></head>
+<body>
+    <h2>new files detected</h2>
+    <ul>
+{items}
+    </ul>
+{more}    <p>generated date: {generated}</p>
+</body>
+</html>
+""".format
+NEW_FILE_ITEM_HTML = """        <li>
+            <p>filename: {filename}</p>
+            <p>download link: <a href="{url}">{url}</a></p>
+            <p>update date: {date}</p>
+        </li>""".format
+MORE_FILES_HTML = """    <p>... and {count} more files</p>
+""".format
+
+NEW_FILES_TEXT = """new files detected
+
+{items}
+{more}
+generated date: {generated}
+""".format
+NEW_FILE_ITEM_TEXT = """- filename: {filename}
+  download link: {url}
+  update date: {date}""".format
+MORE_FILES_TEXT = """... and {count} more files
+""".format
+
+LOG_HTML = """<html>
+<head></head>
+<body>
+    <h2>{title}</h2>
+    <pre style="background-color: #f5f5f5; padding: 15px; border-radius: 5px;">{log}</pre>
+    <p>generated date: {generated}</p>
+</body>
+</html>
+""".format
+LOG_TEXT = """{title}
+
+{log}
+
+generated date: {generated}
+""".format
+
+
+def render_new_files(new_files, generated, max_files=None):
+    """
+    render the new file email, only the first max_files are listed when the list is longer
+    return format: (html, text)
+    """
+    shown = new_files[:max_files] if max_files else new_files
+    hidden = len(new_files) - len(shown)
+
+    html_items = '\n'.join([
+        NEW_FILE_ITEM_HTML(filename=escape(file['filename']), url=escape(file['url']),
+                           date=escape(file['date']))
+        for file in shown
+    ])
+    text_items = '\n'.join([
+        NEW_FILE_ITEM_TEXT(filename=file['filename'], url=file['url'], date=file['date'])
+        for file in shown
+    ])
+    body_html = NEW_FILES_HTML(items=html_items, generated=escape(generated),
+                               more=MORE_FILES_HTML(count=hidden) if hidden else '')
+    body_text = NEW_FILES_TEXT(items=text_items, generated=generated,
+                               more=MORE_FILES_TEXT(count=hidden) if hidden else '')
+    return body_html, body_text
+
+
+def render_log(title, log_content, generated):
+    """render the run log email, return format: (html, text)"""
+    body_html = LOG_HTML(title=escape(title), log=escape(log_content), generated=escape(generated))
+    body_text = LOG_TEXT(title=title, log=log_content, generated=generated)
+    return body_html, body_text
@@ -1,3 +1,6 @@
 from .scraper import XiaomiEUScraper
+from .multi_source import MultiSourceScraper
+from .session import get_session
+from .filename_meta import FileMeta, parse_filenames
 
-__all__ = ['XiaomiEUScraper']
+__all__ = ['XiaomiEUScraper', 'MultiSourceScraper', 'get_session', 'FileMeta', 'parse_filenames']
@@ -0,0 +1,61 @@
+from collections import namedtuple
+from datetime import datetime
+import logging
+import re
+from util import get_timestamp
+
+logger = logging.getLogger(__name__)
+
+# XiaomiEUModule_2024.10.24.apk -> module XiaomiEUModule, 2024.10.24, the module is everything before the last _
+FILENAME_PATTERN = re.compile(
+    r'^(?:(?P<module>.*)_)?(?P<year>[0-9]{4})\.(?P<month>[0-9]{1,2})\.(?P<day>[0-9]{1,2})\.[^._]*$'
+)
+DAYS_IN_MONTH = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+MAX_LOGGED_FILENAMES = 5
+
+# version is (year, month, day) and sorts in release order, None if the filename has no valid date
+FileMeta = namedtuple('FileMeta', ['module', 'version', 'date'])
+
+
+def is_valid_date(year, month, day):
+    """the same dates datetime accepts, without building one"""
+    if year < 1 or not 1 <= month <= 12 or day < 1:
+        return False
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        return day <= 29
+    return day <= DAYS_IN_MONTH[month]
+
+
+def parse_filenames(filenames):
+    """
+    module, version and date of every filename, in the same order
+    a filename without a valid date gets today as date and itself as module, with one warning for the batch
+    """
+    match = FILENAME_PATTERN.match
+    # a page has far fewer distinct dates than files, every date is validated and formatted once
+    dates = {}
+    result = []
+    invalid = []
+    fallback_date = None
+    for filename in filenames:
+        found = match(filename)
+        if found:
+            module, year, month, day = found.groups()
+            key = (year, month, day)
+            if key not in dates:
+                version = (int(year), int(month), int(day))
+                dates[key] = (version, f"{year}.{month.zfill(2)}.{day.zfill(2)}") if is_valid_date(*version) else None
+            parsed = dates[key]
+            if parsed is not None:
+                result.append(FileMeta(module or '', *parsed))
+                continue
+        if fallback_date is None:
+            fallback_date = datetime.now().strftime('%Y.%m.%d')
+        invalid.append(filename)
+        result.append(FileMeta(filename, None, fallback_date))
+
+    if invalid:
+        logger.warning(f"{get_timestamp()} - Could not extract valid date from {len(invalid)} filenames, "
+                       f"using today: {', '.join(invalid[:MAX_LOGGED_FILENAMES])}"
+                       f"{' ...' if len(invalid) > MAX_LOGGED_FILENAMES else ''}")
+    return result
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from util import get_timestamp
+from .scraper import XiaomiEUScraper
+
+logger = logging.getLogger(__name__)
+
+
+class MultiSourceScraper:
+    """Fetch several pages at once, each page is scraped by its own XiaomiEUScraper"""
+
+    def __init__(self, urls, max_workers=8, **scraper_options):
+        # the first page keeps the legacy records so existing history is not lost
+        self.scrapers = [XiaomiEUScraper(url, source=None if i == 0 else url, **scraper_options)
+                         for i, url in enumerate(urls)]
+        self.max_workers = max(1, max_workers)
+
+    @property
+    def url(self):
+        return ', '.join(scraper.url for scraper in self.scrapers)
+
+    def fetch_all(self, validators=None):
+        """
+        fetch every page concurrently, at most max_workers at a time
+        validators: {url: {'etag': ..., 'last_modified': ...}} saved from the last fetch
+        return format: [(scraper, files)] in the same order as the urls, files is None if not modified
+        """
+        validators = validators or {}
+        if len(self.scrapers) == 1:
+            return self.scrapers[0].fetch_all(validators)
+
+        workers = min(self.max_workers, len(self.scrapers))
+        logger.info(f"{get_timestamp()} - fetching {len(self.scrapers)} pages with {workers} workers")
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(lambda scraper: scraper.get_file_list(validators.get(scraper.url)),
+                                        self.scrapers))
+        return list(zip(self.scrapers, results))
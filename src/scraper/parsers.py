@@ -0,0 +1,163 @@
+from html import unescape
+import importlib.util
+import logging
+import re
+from util import get_timestamp
+from .stream_parser import FilesListParser, iter_file_rows
+
+logger = logging.getLogger(__name__)
+
+# every backend takes the page html and returns [(filename, url)], or None if the files table is not found
+
+
+def parse_rows_html_parser(html):
+    """parse the files_list table with BeautifulSoup and the pure python html.parser"""
+    from bs4 import BeautifulSoup
+
+    soup = BeautifulSoup(html, 'html.parser')
+    files_table = soup.find('table', id='files_list')
+    if not files_table:
+        return None
+
+    tbody = files_table.find_next('tbody')
+    rows = []
+    for row in tbody.find_all('tr'):
+        content_of_interest = row.find_all('th')
+        if content_of_interest:
+            filename = content_of_interest[0].find('span', class_='name').text.strip()
+            file_url = content_of_interest[0].find('a')['href']
+            rows.append((filename, file_url))
+    return rows
+
+
+def parse_rows_streaming(chunks):
+    """parse the files_list table from text chunks without building a tree"""
+    parser = FilesListParser()
+    rows = list(iter_file_rows(chunks, parser))
+    return rows if parser.found_table else None
+
+
+def parse_rows_stream(html):
+    return parse_rows_streaming([html])
+
+
+def parse_rows_lxml(html):
+    """parse the files_list table with lxml"""
+    import lxml.html
+
+    root = lxml.html.fromstring(html)
+    tables = root.xpath('//table[@id="files_list"]')
+    if not tables:
+        return None
+
+    tbody = tables[0].xpath('following::tbody[1] | descendant::tbody[1]')[0]
+    rows = []
+    for row in tbody.iter('tr'):
+        content_of_interest = row.xpath('.//th')
+        if content_of_interest:
+            name = content_of_interest[0].xpath('.//span[contains(concat(" ", normalize-space(@class), " "), " name ")]')
+            link = content_of_interest[0].xpath('.//a')
+            rows.append((name[0].text_content().strip(), link[0].attrib['href']))
+    return rows
+
+
+def parse_rows_selectolax(html):
+    """parse the files_list table with selectolax"""
+    from selectolax.lexbor import LexborHTMLParser
+
+    files_table = LexborHTMLParser(html).css_first('table#files_list')
+    if files_table is None:
+        return None
+
+    tbody = files_table.css_first('tbody')
+    rows = []
+    for row in tbody.css('tr'):
+        content_of_interest = row.css('th')
+        if content_of_interest:
+            filename = content_of_interest[0].css_first('span.name').text().strip()
+            file_url = content_of_interest[0].css_first('a').attributes['href']
+            if file_url is None:
+                raise KeyError('href')
+            rows.append((filename, file_url))
+    return rows
+
+
+# precompiled extractor for the known table#files_list > tbody > tr > th layout
+_TABLE_RE = re.compile(r'<table\b[^>]*\bid\s*=\s*["\']?files_list\b', re.IGNORECASE)
+_TBODY_RE = re.compile(r'<tbody\b[^>]*>(.*?)</tbody\s*>', re.IGNORECASE | re.DOTALL)
+_ROW_RE = re.compile(r'<tr\b[^>]*>(.*?)(?=<tr\b|</tr\s*>|$)', re.IGNORECASE | re.DOTALL)
+_TH_RE = re.compile(r'<th\b[^>]*>(.*?)(?:</th\s*>|$)', re.IGNORECASE | re.DOTALL)
+_NAME_RE = re.compile(r'<span\b[^>]*\bclass\s*=\s*["\'](?:[^"\']*\s)?name(?:\s[^"\']*)?["\'][^>]*>(.*?)</span\s*>',
+                      re.IGNORECASE | re.DOTALL)
+_HREF_RE = re.compile(r'<a\b[^>]*?\bhref\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+
+def parse_rows_regex(html):
+    """parse the files_list table with precompiled regular expressions, no tree and no parser"""
+    table = _TABLE_RE.search(html)
+    if not table:
+        return None
+
+    tbody = _TBODY_RE.search(html, table.end())
+    if not tbody:
+        return []
+    rows = []
+    for row in _ROW_RE.finditer(tbody.group(1)):
+        th = _TH_RE.search(row.group(1))
+        if th:
+            name = _NAME_RE.search(th.group(1))
+            link = _HREF_RE.search(th.group(1))
+            if not name or not link:
+                raise ValueError("files_list row without a name span or download link")
+            filename = unescape(_TAG_RE.sub('', name.group(1))).strip()
+            rows.append((filename, unescape(next(url for url in link.groups() if url is not None))))
+    return rows
+
+
+# real HTML parsers fastest first, then regex, each entry is (name, backend, module that must be installed)
+PARSERS = [
+    ('selectolax', parse_rows_selectolax, 'selectolax'),
+    ('lxml', parse_rows_lxml, 'lxml'),
+    ('stream', parse_rows_stream, None),
+    ('html.parser', parse_rows_html_parser, 'bs4'),
+    ('regex', parse_rows_regex, None),
+]
+# only used when named in PARSER_BACKENDS, wrong rows from a changed page layout would not fall back
+OPT_IN_PARSERS = ('regex',)
+
+
+def available_parsers():
+    """names of the installed backends, fastest first"""
+    return [name for name, _, module in PARSERS if module is None or importlib.util.find_spec(module) is not None]
+
+
+def default_parsers():
+    """the installed backends tried when PARSER_BACKENDS is not set"""
+    return [name for name in available_parsers() if name not in OPT_IN_PARSERS]
+
+
+def parse_rows(html, parsers=None):
+    """
+    parse the files_list table with the first backend that returns rows
+    parsers: backend names to try in order, default is every installed backend except the opt-in ones
+    return format: [(filename, url)], None if the table is not found
+    """
+    backends = {name: backend for name, backend, _ in PARSERS}
+    table_found = False
+    parsed = False
+    error = None
+    for name in parsers or default_parsers():
+        try:
+            rows = backends[name](html)
+        except Exception as e:
+            logger.warning(f"{get_timestamp()} - {name} parser failed, trying next parser: {str(e)}")
+            error = e
+            continue
+        if rows:
+            return rows
+        parsed = True
+        table_found = table_found or rows is not None
+    if not parsed and error is not None:
+        raise error
+    return [] if table_found else None
@@ -1,65 +1,115 @@
-import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
-from util import get_timestamp
+from util import get_timestamp, span
 import logging
+import time
+from .filename_meta import parse_filenames
+from .parsers import parse_rows, parse_rows_streaming
+from .session import get_session
 
 logger = logging.getLogger(__name__)
 
+STREAM_CHUNK_SIZE = 64 * 1024
+DEFAULT_TIMEOUT = (3.05, 10)  # (connect, read) seconds
+
+
+def extract_date(filename):
+    """Extract date from filename and validate it, fall back to today"""
+    return parse_filenames([filename])[0].date
+
+
 class XiaomiEUScraper:
-    def __init__(self, url):
+    def __init__(self, url, source=None, streaming=False, parsers=None, timeout=DEFAULT_TIMEOUT):
         self.url = url
-    
-    def get_file_list(self):
+        self.timeout = timeout
+        # parse the response chunk by chunk instead of building the whole page and tree in memory
+        self.streaming = streaming
+        # parser backends to try in order, None tries every installed backend fastest first
+        self.parsers = parsers
+        # key used to store this page's results, None keeps the legacy single page records
+        self.source = source
+        # ETag / Last-Modified of the last successful fetch, saved by the service once the result is stored
+        self.validators = {}
+        # retry count and seconds spent in each phase of the last fetch
+        self.metrics = {}
+
+    @property
+    def scrapers(self):
+        return [self]
+
+    def fetch_all(self, validators=None):
+        """same interface as MultiSourceScraper, return format: [(scraper, files)]"""
+        return [(self, self.get_file_list((validators or {}).get(self.url)))]
+
+    def get_file_list(self, validators=None):
         """
-        browser to get file list
+        browser to get file list, validators are the ETag / Last-Modified saved from the last fetch
         return format: [{'filename': 'xxx.apk', 'url': 'xxx', 'date': 'yyyy-mm-dd'}]
+        return None if the page is not modified since the last fetch
         """
+        self.metrics = {}
         try:
-            response = requests.get(self.url)
+            start = time.perf_counter()
+            with span('fetch', url=self.url):
+                response = get_session().get(self.url, headers=self._conditional_headers(validators),
+                                             stream=self.streaming, timeout=self.timeout)
+            fetched = time.perf_counter()
+            self._record_fetch_metrics(response, fetched - start)
+            if self.streaming and response.encoding is None:
+                response.encoding = 'utf-8'
+            if response.status_code == 304:
+                logger.info(f"{get_timestamp()} - page not modified since last fetch: {self.url}")
+                return None
             response.raise_for_status()
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            files_table = soup.find('table', id='files_list')
-            if not files_table:
+            self.validators = {
+                key: value for key, value in (('etag', response.headers.get('ETag')),
+                                              ('last_modified', response.headers.get('Last-Modified'))) if value
+            }
+
+            with span('parse', url=self.url):
+                if self.streaming:
+                    rows = parse_rows_streaming(response.iter_content(STREAM_CHUNK_SIZE, decode_unicode=True))
+                else:
+                    rows = parse_rows(response.text, self.parsers)
+            # with streaming the body is downloaded while parsing
+            self.metrics['parse_seconds'] = time.perf_counter() - fetched
+            logger.info(f"{get_timestamp()} - fetch metrics of {self.url}: {self._format_metrics()}")
+            if rows is None:
                 logger.error(f"{get_timestamp()} - could not find files table, please check URL {self.url}")
                 return []
-            
-            tbody = files_table.find_next('tbody')
-            files = []
-            for row in tbody.find_all('tr'):
-                content_of_interest = row.find_all('th')
-                if content_of_interest:
-                    filename = content_of_interest[0].find('span', class_='name').text.strip()
-                    file_url = content_of_interest[0].find('a')['href']
-                    # Extract date from filename and validate it
-                    try:
-                        date_str = filename.split('_')[-1].rsplit('.', 1)[0]  # XiaomiEUModule_2024.10.24.apk -> 2024.10.24
-                        date_parts = date_str.split('.')
-                        if len(date_parts) == 3:
-                            year, month, day = date_parts
-                            # Pad month and day with leading zeros if needed
-                            month = month.zfill(2)
-                            day = day.zfill(2)
-                            date_str = f"{year}-{month}-{day}"
-                            # Validate date by parsing it
-                            datetime.strptime(date_str, '%Y-%m-%d')
-                            date = f"{year}.{month}.{day}"  # Convert back to original format
-                        else:
-                            raise ValueError("Invalid date format")
-                    except (ValueError, IndexError):
-                        logger.warning(f"{get_timestamp()} - Could not extract valid date from filename: {filename}")
-                        date = datetime.now().strftime('%Y.%m.%d')
-                    
-                    files.append({
-                        'filename': filename,
-                        'url': file_url,
-                        'date': date
-                    })
-            
-            return files
+
+            # dates of the whole page in one pass, with one warning for all bad filenames
+            metas = parse_filenames([filename for filename, _ in rows])
+            return [
+                {
+                    'filename': filename,
+                    'url': file_url,
+                    'date': meta.date
+                }
+                for (filename, file_url), meta in zip(rows, metas)
+            ]
             
         except Exception as e:
             logger.error(f"{get_timestamp()} - error when getting file list: {str(e)}")
             logger.error(f"{get_timestamp()} - please check URL {self.url}")
             return []
+
+    def _record_fetch_metrics(self, response, fetch_seconds):
+        retries = getattr(response.raw, 'retries', None)
+        self.metrics['retries'] = len(retries.history) if retries is not None else 0
+        # time until the response headers of the last attempt arrived
+        self.metrics['wait_seconds'] = response.elapsed.total_seconds()
+        # includes retries and backoff, and the body download unless streaming
+        self.metrics['fetch_seconds'] = fetch_seconds
+
+    def _format_metrics(self):
+        return ', '.join(f"{key}={value:.3f}" if isinstance(value, float) else f"{key}={value}"
+                         for key, value in self.metrics.items())
+
+    @staticmethod
+    def _conditional_headers(validators):
+        headers = {}
+        if validators:
+            if validators.get('etag'):
+                headers['If-None-Match'] = validators['etag']
+            if validators.get('last_modified'):
+                headers['If-Modified-Since'] = validators['last_modified']
+        return headers
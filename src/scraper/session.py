@@ -0,0 +1,69 @@
+import importlib.util
+import threading
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+DEFAULT_SESSION_OPTIONS = {
+    'pool_size': 10,
+    'max_retries': 3,
+    'backoff_factor': 0.5,
+    'backoff_max': 10,
+}
+
+# module level so the pooled keep-alive connections survive warm Lambda invocations
+_session = None
+_session_options = None
+_lock = threading.Lock()
+
+
+def get_session(**options):
+    """
+    shared requests session with a sized connection pool and retry with capped exponential backoff
+    options override DEFAULT_SESSION_OPTIONS, the session is only rebuilt when they change
+    """
+    global _session, _session_options
+    options = {**(_session_options or DEFAULT_SESSION_OPTIONS), **options}
+    if _session is not None and options == _session_options:
+        return _session
+    with _lock:
+        if _session is None or options != _session_options:
+            if _session is not None:
+                _session.close()
+            _session = _build_session(**options)
+            _session_options = options
+        return _session
+
+
+def _build_session(pool_size, max_retries, backoff_factor, backoff_max):
+    # imported here so importing the package does not pay for requests until the first session is built
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+
+    retry_options = {
+        'total': max_retries,
+        'backoff_factor': backoff_factor,
+        'status_forcelist': RETRY_STATUS_CODES,
+        'allowed_methods': frozenset({'GET', 'HEAD'}),
+        'respect_retry_after_header': True,
+        'raise_on_status': False,
+    }
+    try:
+        retry = Retry(backoff_max=backoff_max, **retry_options)
+    except TypeError:
+        # urllib3 < 2 has no backoff_max argument, the cap is a class attribute there
+        retry = Retry(**retry_options)
+        retry.BACKOFF_MAX = backoff_max
+
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    session.headers['Accept-Encoding'] = _accept_encoding()
+    return session
+
+
+def _accept_encoding():
+    # urllib3 only decodes brotli when one of the brotli packages is installed
+    if importlib.util.find_spec('brotli') or importlib.util.find_spec('brotlicffi'):
+        return 'gzip, deflate, br'
+    return 'gzip, deflate'
@@ -0,0 +1,103 @@
+from html.parser import HTMLParser
+
+
+class FilesListParser(HTMLParser):
+    """
+    incremental parser for the files_list table, no tree is built
+    finished rows are collected in self.rows as (filename, url) and should be drained by the caller after each feed
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.rows = []
+        self.found_table = False
+        self._in_tbody = False
+        self._done = False
+        self._row = None
+        self._th_count = 0
+        self._in_first_th = False
+        self._name_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if self._done:
+            return
+        if not self.found_table:
+            if tag == 'table' and dict(attrs).get('id') == 'files_list':
+                self.found_table = True
+            return
+        if not self._in_tbody:
+            # same as BeautifulSoup find_next('tbody'), the first tbody after the table
+            self._in_tbody = tag == 'tbody'
+            return
+
+        if tag == 'tr':
+            self._finish_row()
+            self._row = {'has_th': False, 'name': None, 'url': None, 'has_link': False}
+            self._th_count = 0
+        elif self._row is None:
+            return
+        elif tag == 'th':
+            self._th_count += 1
+            self._row['has_th'] = True
+            self._in_first_th = self._th_count == 1
+        elif self._in_first_th:
+            if tag == 'span':
+                if self._name_depth:
+                    self._name_depth += 1
+                elif self._row['name'] is None and 'name' in (dict(attrs).get('class') or '').split():
+                    self._row['name'] = []
+                    self._name_depth = 1
+            elif tag == 'a' and not self._row['has_link']:
+                self._row['has_link'] = True
+                self._row['url'] = dict(attrs).get('href')
+
+    def handle_endtag(self, tag):
+        if self._done or not self._in_tbody:
+            return
+        if tag == 'tbody':
+            self._finish_row()
+            self._done = True
+        elif tag == 'tr':
+            self._finish_row()
+        elif tag == 'th':
+            self._in_first_th = False
+            self._name_depth = 0
+        elif tag == 'span' and self._name_depth:
+            self._name_depth -= 1
+
+    def handle_data(self, data):
+        if self._name_depth:
+            self._row['name'].append(data)
+
+    def close(self):
+        super().close()
+        self._finish_row()
+
+    def _finish_row(self):
+        row, self._row = self._row, None
+        self._in_first_th = False
+        self._name_depth = 0
+        if row is None or not row['has_th']:
+            return
+        # same failures as the BeautifulSoup path, a broken row fails the whole page
+        if row['name'] is None:
+            raise ValueError("files_list row without a name span")
+        if row['url'] is None:
+            raise ValueError("files_list row without a download link")
+        self.rows.append((''.join(row['name']).strip(), row['url']))
+
+
+def iter_file_rows(chunks, parser=None):
+    """
+    feed text chunks to the parser and yield (filename, url) as soon as each row is finished
+    pass a parser to check parser.found_table after the iteration
+    """
+    parser = parser or FilesListParser()
+    for chunk in chunks:
+        parser.feed(chunk)
+        if parser.rows:
+            yield from parser.rows
+            parser.rows.clear()
+    parser.close()
+    yield from parser.rows
+    parser.rows.clear()
@@ -1,3 +1,8 @@
 from .update_service import UpdateService
+from .diff import FileDiff, diff_files, newest_per_module
+from .subscriptions import SubscriptionIndex
+from .timeline import backfill_timeline, with_modules
+from .schedule import AdaptiveSchedule, learn_hot_hours
+from .stages import Stage, run_stages
 
-__all__ = ['UpdateService']
+__all__ = ['UpdateService', 'FileDiff', 'diff_files', 'newest_per_module', 'SubscriptionIndex', 'backfill_timeline', 'with_modules', 'AdaptiveSchedule', 'learn_hot_hours', 'Stage', 'run_stages']
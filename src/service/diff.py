@@ -0,0 +1,100 @@
+from collections import namedtuple
+import heapq
+from scraper import parse_filenames
+
+# added: new (module, version) files, removed: files no longer listed, changed_url: same file with a new link,
+# superseded: the previous newest file of every module that now has a newer version
+FileDiff = namedtuple('FileDiff', ['added', 'removed', 'changed_url', 'superseded'])
+
+
+def _sort_key(meta):
+    # newest first, files without a version in the name last
+    return meta.version or ()
+
+
+def _keyed_files(files):
+    """
+    {(module, version, extension): [(file, meta)]}, so a re-upload with another date spelling is the same file
+    files without a parsable date are keyed by their filename
+    """
+    keyed = {}
+    for file, meta in zip(files, parse_filenames([file['filename'] for file in files])):
+        if meta.version is None:
+            key = (file['filename'], None, None)
+        else:
+            key = (meta.module, meta.version, file['filename'].rsplit('.', 1)[-1])
+        keyed.setdefault(key, []).append((file, meta))
+    return keyed
+
+
+def _pair_files(current, previous):
+    """
+    [(current pair or None, previous pair or None)] for the files sharing a key
+    the same filename is the same file, the rest are paired in list order, left over files stay unpaired
+    """
+    previous_by_name = {file['filename']: (file, meta) for file, meta in previous}
+    unmatched_current = []
+    pairs = []
+    for file, meta in current:
+        old = previous_by_name.pop(file['filename'], None)
+        if old is None:
+            unmatched_current.append((file, meta))
+        else:
+            pairs.append(((file, meta), old))
+    unmatched_previous = [pair for pair in previous if pair[0]['filename'] in previous_by_name]
+    for i in range(max(len(unmatched_current), len(unmatched_previous))):
+        pairs.append((unmatched_current[i] if i < len(unmatched_current) else None,
+                      unmatched_previous[i] if i < len(unmatched_previous) else None))
+    return pairs
+
+
+def diff_files(current_files, previous_files):
+    """
+    compare two file lists on the module and version parsed from the filenames, every list is newest first
+    previous files without a url, like the known filenames of the index, never count as changed_url
+    """
+    current = _keyed_files(current_files)
+    previous = _keyed_files(previous_files)
+
+    added, removed, changed_url = [], [], []
+    current_newest = {}
+    # current keys first, in list order, then the keys only the previous list has
+    for key in {**current, **previous}:
+        for new, old in _pair_files(current.get(key, ()), previous.get(key, ())):
+            if new is None:
+                removed.append(old)
+            elif old is None:
+                added.append(new)
+            elif old[0].get('url') is not None and old[0]['url'] != new[0].get('url'):
+                changed_url.append(new)
+    for pairs in current.values():
+        for file, meta in pairs:
+            if meta.version is not None and meta.version > current_newest.get(meta.module, ()):
+                current_newest[meta.module] = meta.version
+
+    previous_newest = {}
+    for pairs in previous.values():
+        for file, meta in pairs:
+            if meta.version is not None:
+                newest = previous_newest.get(meta.module)
+                if newest is None or meta.version > newest[1].version:
+                    previous_newest[meta.module] = (file, meta)
+    superseded = [(file, meta) for module, (file, meta) in previous_newest.items()
+                  if current_newest.get(module, ()) > meta.version]
+
+    return FileDiff(*(_newest_first(pairs) for pairs in (added, removed, changed_url, superseded)))
+
+
+def _newest_first(pairs):
+    return [file for file, meta in sorted(pairs, key=lambda pair: _sort_key(pair[1]), reverse=True)]
+
+
+def newest_per_module(files, count):
+    """only the count newest files of every module, newest first"""
+    modules = {}
+    for file, meta in zip(files, parse_filenames([file['filename'] for file in files])):
+        modules.setdefault(meta.module, []).append((file, meta))
+    kept = []
+    for pairs in modules.values():
+        kept.extend(heapq.nlargest(count, pairs, key=lambda pair: _sort_key(pair[1])))
+    return _newest_first(kept)
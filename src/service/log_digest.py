@@ -0,0 +1,48 @@
+from collections import Counter
+from collections import namedtuple
+import re
+
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+# asctime - name - levelname - message, the message usually starts with its own get_timestamp()
+_LINE_RE = re.compile(r'^\d{4}-\d{2}-\d{2} [\d:,]+ - (?P<name>\S+) - (?P<level>[A-Z]+) - '
+                      r'(?:\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2} - )?(?P<message>.*)$')
+
+LogDigest = namedtuple('LogDigest', ['runs', 'lines', 'levels', 'distinct', 'dropped', 'text'])
+
+
+def build_log_digest(chunks, max_distinct=500):
+    """
+    stream run logs and count repeated lines without their timestamps
+    at most max_distinct different lines are kept, so memory does not grow with the number of runs
+    """
+    counts = Counter()
+    levels = Counter()
+    runs = lines = dropped = 0
+    for chunk in chunks:
+        runs += 1
+        for line in chunk.splitlines():
+            match = _LINE_RE.match(line)
+            if match:
+                level = match.group('level')
+                key = (level, match.group('name'), match.group('message'))
+            elif line.strip():
+                # continuation lines such as tracebacks
+                level = None
+                key = ('', '', line.rstrip())
+            else:
+                continue
+            lines += 1
+            if level in LOG_LEVELS:
+                levels[level] += 1
+            if key in counts or len(counts) < max_distinct:
+                counts[key] += 1
+            else:
+                dropped += 1
+
+    summary = [f"runs: {runs}, log lines: {lines}, distinct lines: {len(counts)}"]
+    summary.append(', '.join(f"{level}: {levels[level]}" for level in LOG_LEVELS if levels[level]))
+    if dropped:
+        summary.append(f"{dropped} lines not shown, more than {max_distinct} distinct lines")
+    body = [f"[x{count}] {level} - {name} - {message}" if level else f"[x{count}] {message}"
+            for (level, name, message), count in counts.items()]
+    return LogDigest(runs, lines, dict(levels), len(counts), dropped, '\n'.join(summary + [''] + body) + '\n')
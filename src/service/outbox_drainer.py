@@ -0,0 +1,60 @@
+import logging
+import random
+import time
+from util import get_timestamp, traced
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxDrainer:
+    """
+    deliver queued new file events in batches of batch_size files, every batch is one notification
+    delivery is recorded per recipient, an event whose send failed for some recipients is retried for those only,
+    with capped exponential backoff and jitter, events are never dropped
+    """
+
+    def __init__(self, outbox, send_files, batch_size=1000, retry_base=60, retry_max=3600):
+        self.outbox = outbox
+        # send_files(files, delivered) sends the files to the recipients not in delivered, a set per file,
+        # and returns {recipient: sent} per file
+        self.send_files = send_files
+        self.batch_size = batch_size
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+
+    @traced('outbox_drain')
+    def drain(self):
+        """deliver every due event, return the number delivered"""
+        events = self.outbox.pending()
+        delivered = 0
+        for i in range(0, len(events), self.batch_size):
+            batch = events[i:i + self.batch_size]
+            done, failed = self._send(batch)
+            if done:
+                self.outbox.mark_delivered(done)
+                delivered += len(done)
+            if failed:
+                # the failed events and the batches after them wait for their next attempt
+                self.outbox.mark_failed(failed + events[i + self.batch_size:], self._next_attempt_at)
+                logger.error(f"{get_timestamp()} - {len(failed) + len(events[i + self.batch_size:])} new file "
+                             f"notifications failed, retrying later")
+                break
+        return delivered
+
+    def _send(self, events):
+        """return (events sent to every recipient, failed events with the recipients they did reach)"""
+        try:
+            results = self.send_files([event.file for event in events], [event.delivered for event in events])
+        except Exception as e:
+            logger.error(f"{get_timestamp()} - error sending new file notifications: {str(e)}")
+            return [], list(events)
+        done, failed = [], []
+        for event, sent in zip(events, results):
+            event = event._replace(delivered=event.delivered.union(
+                recipient for recipient, success in sent.items() if success))
+            (done if all(sent.values()) else failed).append(event)
+        return done, failed
+
+    def _next_attempt_at(self, event):
+        delay = min(self.retry_max, self.retry_base * 2 ** event.attempts) * random.uniform(0.5, 1)
+        return time.time() + delay
@@ -0,0 +1,50 @@
+from collections import Counter
+from datetime import datetime, timedelta
+import random
+
+
+def learn_hot_hours(timestamps, count=3, min_samples=2):
+    """The hours of the day in which the file list changed most often, an hour needs min_samples changes"""
+    hours = Counter(timestamp.hour for timestamp in timestamps)
+    return frozenset(hour for hour, samples in hours.most_common(count) if samples >= min_samples)
+
+
+class AdaptiveSchedule:
+    """
+    polling interval of one page, multiplied by backoff after every unchanged check up to max_interval
+    and reset to min_interval after a change, hot hours are always polled at min_interval
+    """
+
+    def __init__(self, min_interval=300, max_interval=10800, backoff=1.5, jitter=0.1, hot_hours=()):
+        self.min_interval = min_interval
+        self.max_interval = max(max_interval, min_interval)
+        self.backoff = backoff
+        self.jitter = jitter
+        self.hot_hours = frozenset(hot_hours)
+        self.interval = min_interval
+
+    def record(self, changed):
+        if changed:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.backoff, self.max_interval)
+
+    def next_delay(self, now=None):
+        """seconds until the next check, with jitter so pages and instances do not poll in lockstep"""
+        now = now or datetime.now()
+        delay = self.interval
+        if now.hour in self.hot_hours:
+            delay = self.min_interval
+        else:
+            # wake up when the next hot hour starts instead of sleeping through it
+            until_hot_hour = self._seconds_until_hot_hour(now)
+            if until_hot_hour is not None:
+                delay = min(delay, until_hot_hour)
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def _seconds_until_hot_hour(self, now):
+        start_of_hour = now.replace(minute=0, second=0, microsecond=0)
+        for hours_ahead in range(1, 25):
+            if (now.hour + hours_ahead) % 24 in self.hot_hours:
+                return (start_of_hour + timedelta(hours=hours_ahead) - now).total_seconds()
+        return None
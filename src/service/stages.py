@@ -0,0 +1,52 @@
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+# func is called with the results of the stages named in after, once they have all finished
+Stage = namedtuple('Stage', ['name', 'func', 'after'], defaults=[()])
+
+
+def run_stages(stages, max_workers=0):
+    """
+    run every stage once the stages it comes after have finished, independent stages overlap
+    so a run takes as long as its slowest chain of stages instead of the sum of all of them
+    max_workers 0 or 1 runs the stages one after the other in list order, exactly as plain calls would
+    return {name: result}; when a stage raises, the stages after it are skipped and its error is raised
+    once the stages already running have finished
+    """
+    if max_workers <= 1:
+        results = {}
+        for stage in stages:
+            results[stage.name] = stage.func(*(results[name] for name in stage.after))
+        return results
+
+    pending = {stage.name: stage for stage in stages}
+    results, failed, running = {}, set(), {}
+    error = None
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while pending or running:
+            scheduled = True
+            while scheduled:
+                scheduled = False
+                for name, stage in list(pending.items()):
+                    if failed.intersection(stage.after):
+                        del pending[name]
+                        failed.add(name)
+                        scheduled = True
+                    elif all(after in results for after in stage.after):
+                        del pending[name]
+                        running[executor.submit(stage.func, *(results[after] for after in stage.after))] = name
+            if not running:
+                if pending:
+                    raise ValueError(f"stages {sorted(pending)} come after stages that do not exist")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    failed.add(name)
+                    error = error or e
+    if error is not None:
+        raise error
+    return results
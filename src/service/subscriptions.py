@@ -0,0 +1,43 @@
+from scraper import parse_filenames
+
+
+class SubscriptionIndex:
+    """
+    subscriber filter rules compiled into inverted indexes by module and by filename prefix
+    matching a file costs one lookup per distinct prefix length plus its matches, not one check per rule
+    """
+
+    def __init__(self, subscriptions):
+        # module / prefix -> [(email, excluded substrings)]
+        self.modules = {}
+        self.prefixes = {}
+        for subscription in subscriptions:
+            for rule in subscription.rules:
+                entry = (subscription.email, tuple(rule.get('exclude', ())))
+                if 'module' in rule:
+                    self.modules.setdefault(rule['module'], []).append(entry)
+                if 'prefix' in rule:
+                    self.prefixes.setdefault(rule['prefix'], []).append(entry)
+        self.prefix_lengths = sorted({len(prefix) for prefix in self.prefixes})
+
+    def __len__(self):
+        return len({email for entries in (*self.modules.values(), *self.prefixes.values()) for email, _ in entries})
+
+    def match(self, files):
+        """{email: [files]} of the subscribers with at least one matching file, files keep their order"""
+        files_by_subscriber = {}
+        if not self.modules and not self.prefixes:
+            return files_by_subscriber
+        for file, meta in zip(files, parse_filenames([file['filename'] for file in files])):
+            filename = file['filename']
+            entries = list(self.modules.get(meta.module, ()))
+            for length in self.prefix_lengths:
+                if length > len(filename):
+                    break
+                entries.extend(self.prefixes.get(filename[:length], ()))
+            matched = set()
+            for email, excluded in entries:
+                if email not in matched and not any(text in filename for text in excluded):
+                    matched.add(email)
+                    files_by_subscriber.setdefault(email, []).append(file)
+        return files_by_subscriber
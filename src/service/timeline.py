@@ -0,0 +1,37 @@
+import logging
+from scraper import parse_filenames
+from util import get_timestamp
+
+logger = logging.getLogger(__name__)
+
+
+def with_modules(files):
+    """copies of the files with the module parsed from the filename, '' if the filename has no date"""
+    return [
+        {**file, 'module': meta.module if meta.version else ''}
+        for file, meta in zip(files, parse_filenames([file['filename'] for file in files]))
+    ]
+
+
+def backfill_timeline(db_handler, timeline, source=None, page_size=5):
+    """
+    build the release timeline of a page from its stored snapshots, return the number of snapshots read
+    snapshots are streamed oldest first and only the previous one is kept, running it again rewrites the same items
+    """
+    previous = {}
+    seen = set()
+    snapshots = 0
+    for scan_date, files in db_handler.iter_scraper_results(source, page_size):
+        current = {file['filename']: file for file in with_modules(files)}
+        added = [file for filename, file in current.items() if filename not in previous]
+        removed = [file for filename, file in previous.items() if filename not in current]
+        # the first add of a file in the backfill is its earliest, later adds are reappearances
+        timeline.record([file for file in added if file['filename'] not in seen], [], source, scan_date,
+                        first_add_is_earliest=True)
+        timeline.record([file for file in added if file['filename'] in seen], removed, source, scan_date)
+        seen.update(current)
+        previous = current
+        snapshots += 1
+    logger.info(f"{get_timestamp()} - release timeline of {source or 'the first page'} "
+                f"built from {snapshots} snapshots")
+    return snapshots
@@ -1,45 +1,311 @@
+from datetime import datetime, timedelta
+from functools import partial
+from itertools import chain
 import logging
+import time
 
-from util import ScraperError, get_timestamp
+from data import RUN_LOG_RECORD_TYPE, STORAGE_MODE_INDEX
+from util import ScraperError, file_list_digest, get_log_content, get_timestamp, span_summary, traced
+from .diff import diff_files, newest_per_module
+from .log_digest import build_log_digest
+from .outbox_drainer import OutboxDrainer
+from .stages import Stage, run_stages
+from .subscriptions import SubscriptionIndex
+from .timeline import with_modules
 
 
 logger = logging.getLogger(__name__)
 
+LOG_DIGEST_DAYS = 7
+SUBSCRIPTION_INDEX_TTL = 300  # seconds a compiled subscription index is reused
+# outbox delivery is recorded per recipient key, a subscriber's digest is a different email than the configured one
+NEW_FILE_RECIPIENT = 'new files:'
+SUBSCRIBER = 'subscription:'
+
 
 class UpdateService:
-    def __init__(self, scraper, db_handler, email_sender):
+    def __init__(self, scraper, db_handler, email_sender, log_store=None, notify_newest_per_module=None,
+                 subscription_store=None, outbox=None, outbox_options=None, timeline=None, stage_workers=0):
         self.scraper = scraper
         self.db_handler = db_handler
         self.email_sender = email_sender
+        # run logs are saved here and sent as a weekly digest, None only sends the current run's log
+        self.log_store = log_store
+        # when a backlog of files appears at once only the newest ones of every module are emailed, None emails all
+        self.notify_newest_per_module = notify_newest_per_module
+        # subscribers with their own filters get one email with their matching files, None only emails the config
+        self.subscription_store = subscription_store
+        self._subscription_index = None
+        self._subscription_index_loaded_at = 0.0
+        # new file events are queued here before the snapshot is saved and emailed by drain_outbox,
+        # None emails them right away
+        self.outbox = outbox
+        self.outbox_drainer = OutboxDrainer(outbox, self._deliver, **(outbox_options or {})) if outbox else None
+        # first seen / last seen index of every file, None keeps no history besides the snapshots
+        self.timeline = timeline
+        # threads that read the scan state and last snapshot while the pages are fetched, 0 reads them in turn
+        self.stage_workers = stage_workers
+
+    def check_all_sources_and_send_email(self):
+        """Fetch every watched page concurrently, then check each page's files separately"""
+        if self.stage_workers > 1:
+            fetched, prefetched = self._fetch_while_reading_state()
+        else:
+            fetched, prefetched = self.scraper.fetch_all(self.db_handler.get_http_validators()), {}
+        for scraper, files in fetched:
+            if files is None:
+                logger.info(f"{get_timestamp()} - {scraper.url} not modified, skip checking")
+                continue
+            self.check_new_files_and_send_email(scraper, files, prefetched.get(scraper.source))
+
+    def _fetch_while_reading_state(self):
+        """
+        fetch the pages while the scan state and, in snapshot mode, the last snapshot of every page are read
+        the snapshot is read even if the digest turns out unchanged, one query traded for not waiting on it later
+        return ([(scraper, files)], {source: {'scan_state': .., 'last_files': ..}})
+        """
+        # check the table once before the reads share it
+        self.db_handler.ensure_table()
+        stages = [Stage('validators', self.db_handler.get_http_validators),
+                  Stage('fetch', self.scraper.fetch_all, ('validators',))]
+        for i, scraper in enumerate(self.scraper.scrapers):
+            stages.append(Stage(f'scan_state#{i}', partial(self.db_handler.get_scan_state, scraper.source)))
+            if self.db_handler.storage_mode != STORAGE_MODE_INDEX:
+                stages.append(Stage(f'last_files#{i}',
+                                    partial(self.db_handler.get_last_scraper_result, scraper.source)))
+        results = run_stages(stages, self.stage_workers)
 
-    def check_new_files_and_send_email(self):
+        prefetched = {}
+        for i, scraper in enumerate(self.scraper.scrapers):
+            prefetched[scraper.source] = {key: results[f'{key}#{i}'] for key in ('scan_state', 'last_files')
+                                          if f'{key}#{i}' in results}
+        return results['fetch'], prefetched
+
+    def check_new_files_and_send_email(self, scraper=None, files_from_crawler=None, prefetched=None):
+        """
+        Check one page for new files and email them, return the new files, None if the page was not modified
+        prefetched: scan_state and last_files of the page already read while it was fetched
+        """
+        scraper = scraper or self.scraper
+        if not hasattr(scraper, 'source'):
+            # a MultiSourceScraper has no single source, check its pages one after the other
+            return self._check_each_page(scraper)
+        source = scraper.source
+        prefetched = prefetched or {}
         try:
-            last_files_in_db = self.db_handler.get_last_scraper_result()
-            
-            files_from_crawler = self.scraper.get_file_list()
+            if files_from_crawler is None:
+                files_from_crawler = scraper.get_file_list(self.db_handler.get_http_validators().get(scraper.url))
+                if files_from_crawler is None:
+                    logger.info(f"{get_timestamp()} - {scraper.url} not modified, skip checking")
+                    return None
             if not files_from_crawler:
-                raise ScraperError(f"{get_timestamp()} - get 0 files from URL, check URL {self.scraper.url}")
-            self.db_handler.save_scraper_result(files_from_crawler)
+                raise ScraperError(f"{get_timestamp()} - get 0 files from URL, check URL {scraper.url}")
+
+            digest = file_list_digest(files_from_crawler)
+            scan_state = prefetched['scan_state'] if 'scan_state' in prefetched \
+                else self.db_handler.get_scan_state(source)
+            if scan_state.get('digest') == digest:
+                # same list as last time, only write the heartbeat
+                self.db_handler.touch_scan_state(source)
+                self.db_handler.save_http_validators(scraper.url, scraper.validators)
+                logger.info(f"{get_timestamp()} - file list unchanged, no new files, do not send email")
+                return []
+
+            if self.db_handler.storage_mode == STORAGE_MODE_INDEX:
+                # the index only grows, so removed files are not known in this mode
+                indexed = self._diff_against_file_index(files_from_crawler, source)
+                if indexed is None:
+                    logger.error(f"{get_timestamp()} - could not read the file index, skip checking {scraper.url}")
+                    return []
+                new_files, files_to_index = indexed
+                added, removed = new_files, []
+            else:
+                last_files_in_db = prefetched['last_files'] if 'last_files' in prefetched \
+                    else self.db_handler.get_last_scraper_result(source)
+                diff = self._diff(files_from_crawler, last_files_in_db)
+                new_files = diff.added + diff.changed_url
+                added, removed = diff.added, diff.removed
+            if new_files and self.outbox is not None and not self.outbox.enqueue(new_files, source):
+                # the files stay unseen so the next run finds them again
+                logger.error(f"{get_timestamp()} - could not queue {len(new_files)} new files, result not saved")
+                return new_files
+
+            # the snapshot's scan date is also the timeline date, so a later backfill finds the same events
+            scanned_at = datetime.now().replace(microsecond=0)
+            if self.db_handler.storage_mode == STORAGE_MODE_INDEX:
+                saved = self.db_handler.save_to_file_index(files_to_index, source) if files_to_index else True
+            else:
+                saved = self.db_handler.save_scraper_result(files_from_crawler, source, digest=digest,
+                                                            scanned_at=scanned_at)
+            if saved:
+                # only trust the validators and digest once the result they describe is stored
+                self.db_handler.save_scan_state(digest, source)
+                self.db_handler.save_http_validators(scraper.url, scraper.validators)
+                if self.timeline is not None and (added or removed):
+                    # a page without a saved digest was never recorded, its file items can be written in batches
+                    self.timeline.record(with_modules(added), with_modules(removed), source, scanned_at,
+                                         first_record=not scan_state.get('digest'))
 
-            new_files = self._compare_files_to_get_new(files_from_crawler, last_files_in_db)
-            if new_files:
+            if new_files and self.outbox is not None:
+                logger.info(f"{get_timestamp()} - found {len(new_files)} new files, queued for the email")
+            elif new_files:
                 logger.info(f"{get_timestamp()} - found {len(new_files)} new files, prepare to send email")
-                self._send_notification_email(new_files)
+                self._notify(new_files)
             else:
                 logger.info(f"{get_timestamp()} - no new files, do not send email")
+            return new_files
         except Exception as e:
             logger.error(f"{get_timestamp()} - Service error: {str(e)}")
+            return []
+
+    def _check_each_page(self, multi_scraper):
+        """new files of every page, None if no page was modified"""
+        results = [self.check_new_files_and_send_email(scraper) for scraper in multi_scraper.scrapers]
+        if all(new_files is None for new_files in results):
+            return None
+        return [file for new_files in results if new_files for file in new_files]
+
+    def drain_outbox(self):
+        """email the queued new files, including earlier failed ones that are due again"""
+        if self.outbox_drainer is None:
+            return 0
+        return self.outbox_drainer.drain()
 
     def send_log_email(self):
-        self.email_sender.send_log_email()
+        if not self.email_sender.is_log_email_day():
+            logger.info(f"{get_timestamp()} - Not Saturday, skipping log email")
+            return True
+        if self.log_store is None:
+            return self.email_sender.send_log_email(self._with_span_summary(get_log_content()))
+        # the saved runs of the last week plus this run, which is only saved at the end of the run
+        since = datetime.now() - timedelta(days=LOG_DIGEST_DAYS)
+        digest = build_log_digest(chain(self.log_store.iter_chunks(since), [get_log_content()]))
+        return self.email_sender.send_log_email(self._with_span_summary(digest.text),
+                                                title="Crawler from AWS Lambda weekly log digest")
+
+    def _with_span_summary(self, log_content):
+        summary = span_summary()
+        return f"{log_content}\nthis run's timings:\n{summary}" if summary else log_content
+
+    def save_run_log(self):
+        if self.log_store is not None:
+            self.log_store.append(get_log_content())
 
     def deleteOldDbData(self):
-        self.db_handler.deleteOldDbData()
+        record_types = [RUN_LOG_RECORD_TYPE] if self.log_store is not None else []
+        if self.outbox is not None:
+            record_types.extend(self.outbox.record_types)
+        return self.db_handler.deleteOldDbData([scraper.source for scraper in self.scraper.scrapers], record_types)
+
+    def _diff_against_file_index(self, current_files, source):
+        """
+        Compare files with the known filename index, return (new files, files to write to the index)
+        return None if the index could not be read
+        """
+        known_filenames = self.db_handler.get_known_filenames(source)
+        if known_filenames is None:
+            return None
+        files_to_save = None
+        if not known_filenames:
+            # first run with the index, seed it from the last snapshot so old files are not reported as new
+            known_filenames = self.db_handler.get_last_scraper_result(source)
+            files_to_save = current_files
+
+        new_files = self._compare_files_to_get_new(current_files, known_filenames)
+        if files_to_save is None:
+            files_to_save = new_files
+        return new_files, files_to_save
 
     def _compare_files_to_get_new(self, current_files, old_files):
-        """Compare files by filename and return new"""
-        old_filenames = {f['filename'] for f in old_files}  # Convert to set for O(1) lookup
-        return [f for f in current_files if f['filename'] not in old_filenames]
+        """
+        Files that are new or have a new download link, newest first
+        old_files is a snapshot or a set of known filenames, files are matched on module and version
+        """
+        diff = self._diff(current_files, old_files)
+        return diff.added + diff.changed_url
+
+    @traced('diff')
+    def _diff(self, current_files, old_files):
+        if isinstance(old_files, (set, frozenset)):
+            old_files = [{'filename': filename} for filename in old_files]
+        diff = diff_files(current_files, old_files)
+        if diff.removed or diff.changed_url or diff.superseded:
+            logger.info(f"{get_timestamp()} - {len(diff.removed)} files removed, {len(diff.changed_url)} download "
+                        f"links changed, {len(diff.superseded)} files superseded by a newer version")
+        return diff
+
+    def _notify(self, new_files):
+        """email the new files, return True if every email was sent"""
+        return self._send_notification_email(self._files_to_notify(new_files))
+
+    def _files_to_notify(self, new_files):
+        if not self.notify_newest_per_module:
+            return new_files
+        notify_files = newest_per_module(new_files, self.notify_newest_per_module)
+        if len(notify_files) < len(new_files):
+            logger.info(f"{get_timestamp()} - only emailing the {len(notify_files)} newest per module")
+        return notify_files
+
+    def _deliver(self, files, delivered):
+        """
+        email queued files to the recipients that did not get them yet, the send function of the outbox drainer
+        delivered: per file, the recipient keys it was already sent to
+        return format: per file {recipient key: sent}, recipients skipped as not verified in SES are left out
+        """
+        results = [{} for _ in files]
+        # files left out by notify_newest_per_module have no recipients and count as delivered
+        position = {id(file): i for i, file in enumerate(files)}
+        notify = [position[id(file)] for file in self._files_to_notify(files)]
+
+        # configured recipients missing the same files share one message
+        groups = {}
+        for recipient in self.email_sender.new_file_recipient_emails:
+            indexes = tuple(i for i in notify if f"{NEW_FILE_RECIPIENT}{recipient}" not in delivered[i])
+            if indexes:
+                groups.setdefault(indexes, []).append(recipient)
+        if groups:
+            sent = self.email_sender.send_new_file_emails(
+                [(recipients, [files[i] for i in indexes]) for indexes, recipients in groups.items()])
+            indexes_by_recipient = {recipient: indexes for indexes, recipients in groups.items()
+                                    for recipient in recipients}
+            self._record_sends(results, NEW_FILE_RECIPIENT, indexes_by_recipient, sent)
+
+        if self.subscription_store is not None:
+            indexes_by_subscriber = {}
+            matches = self._get_subscription_index().match([files[i] for i in notify])
+            for subscriber, matched in matches.items():
+                indexes = [position[id(file)] for file in matched
+                           if f"{SUBSCRIBER}{subscriber}" not in delivered[position[id(file)]]]
+                if indexes:
+                    indexes_by_subscriber[subscriber] = indexes
+            if indexes_by_subscriber:
+                logger.info(f"{get_timestamp()} - {len(indexes_by_subscriber)} subscribers match the new files")
+                sent = self.email_sender.send_subscriber_digests(
+                    {subscriber: [files[i] for i in indexes] for subscriber, indexes in indexes_by_subscriber.items()})
+                self._record_sends(results, SUBSCRIBER, indexes_by_subscriber, sent)
+        return results
+
+    @staticmethod
+    def _record_sends(results, prefix, indexes_by_recipient, dispatch_results):
+        """set {prefix + recipient: sent} on the results of every file a recipient was sent"""
+        for dispatch_result in dispatch_results:
+            for recipient in dispatch_result.recipients:
+                for i in indexes_by_recipient[recipient]:
+                    results[i][f"{prefix}{recipient}"] = dispatch_result.success
 
     def _send_notification_email(self, new_files):
-        self.email_sender.send_new_file_email(new_files)
+        sent = self.email_sender.send_new_file_email(new_files)
+        if self.subscription_store is not None:
+            files_by_subscriber = self._get_subscription_index().match(new_files)
+            if files_by_subscriber:
+                logger.info(f"{get_timestamp()} - {len(files_by_subscriber)} subscribers match the new files")
+                results = self.email_sender.send_subscriber_digests(files_by_subscriber)
+                sent = all(result.success for result in results) and sent
+        return sent
+
+    def _get_subscription_index(self):
+        if self._subscription_index is None or \
+                time.monotonic() - self._subscription_index_loaded_at > SUBSCRIPTION_INDEX_TTL:
+            self._subscription_index = SubscriptionIndex(self.subscription_store.list_subscriptions())
+            self._subscription_index_loaded_at = time.monotonic()
+        return self._subscription_index
@@ -1,5 +1,8 @@
+from .aws import LazyAWS, lazy_client, lazy_resource
 from .config import Config
-from .helper import get_timestamp, emails_string_to_list, ScraperError
-from .logger import setup_logging, get_log_content
+from .helper import get_timestamp, emails_string_to_list, comma_string_to_list, urls_string_to_list, file_list_digest, ScraperError
+from .tracing import configure_tracing, reset_spans, span, span_summary, traced, tracing_enabled
+from .logger import RingBufferHandler, setup_logging, get_log_content, get_last_log_message
 
-__all__ = ['Config', 'get_timestamp', 'setup_logging', 'emails_string_to_list', 'ScraperError', 'get_log_content']
+__all__ = ['LazyAWS', 'lazy_client', 'lazy_resource', 'Config', 'get_timestamp', 'setup_logging', 'emails_string_to_list', 'comma_string_to_list', 'urls_string_to_list', 'file_list_digest', 'ScraperError', 'get_log_content', 'get_last_log_message', 'RingBufferHandler',
+           'configure_tracing', 'reset_spans', 'span', 'span_summary', 'traced', 'tracing_enabled']
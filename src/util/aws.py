@@ -0,0 +1,34 @@
+import threading
+
+
+class LazyAWS:
+    """Stand-in for a boto3 resource or client that is only created on first use"""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._instance = None
+        self._lock = threading.Lock()
+
+    def _get(self):
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = self._factory()
+        return self._instance
+
+    def __getattr__(self, name):
+        return getattr(self._get(), name)
+
+
+def lazy_resource(service_name):
+    def factory():
+        import boto3
+        return boto3.resource(service_name)
+    return LazyAWS(factory)
+
+
+def lazy_client(service_name):
+    def factory():
+        import boto3
+        return boto3.client(service_name)
+    return LazyAWS(factory)
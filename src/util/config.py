@@ -1,8 +1,6 @@
-from dotenv import load_dotenv
 import os
-import boto3
 import logging
-from .helper import get_timestamp
+from .helper import comma_string_to_list, get_timestamp, urls_string_to_list
 
 IS_LOCAL = os.getenv('AWS_LAMBDA_FUNCTION_NAME') is None  # True if running locally
 logger = logging.getLogger(__name__)
@@ -11,6 +9,7 @@ logger = logging.getLogger(__name__)
 class Config:
     def __init__(self):
         if IS_LOCAL:
+            from dotenv import load_dotenv  # only needed, and only imported, in local environment
             load_dotenv()  # Only load .env file in local environment
         self._load_config()
 
@@ -21,8 +20,64 @@ class Config:
         self.SENDER_EMAIL = os.getenv('SENDER_EMAIL')
         self.NEW_FILE_RECIPIENT_EMAILS = os.getenv('NEW_FILE_RECIPIENT_EMAILS')
         self.LOG_RECIPIENT_EMAILS = os.getenv('LOG_RECIPIENT_EMAILS')
+        self.EMAIL_MAX_FILES = int(os.getenv('EMAIL_MAX_FILES', '0'))  # 0 lists every new file
+        # only email the newest N new files of every module, 0 emails every new file
+        self.NOTIFY_NEWEST_PER_MODULE = int(os.getenv('NOTIFY_NEWEST_PER_MODULE', '0'))
+        # where subscribers and their filters are kept: dynamodb, local or none
+        self.SUBSCRIPTION_STORE = os.getenv('SUBSCRIPTION_STORE', 'none')
+        self.SUBSCRIPTION_FILE = os.getenv('SUBSCRIPTION_FILE', 'subscriptions.json')
+        # where new file events wait until their email is sent: dynamodb, sqlite or none to email right away
+        self.OUTBOX = os.getenv('OUTBOX', 'dynamodb')
+        self.OUTBOX_DB = os.getenv('OUTBOX_DB', 'outbox.sqlite3')
+        self.OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '1000'))  # files per email
+        self.OUTBOX_RETRY_BASE = int(os.getenv('OUTBOX_RETRY_BASE', '60'))  # seconds, doubled after every failure
+        self.OUTBOX_RETRY_MAX = int(os.getenv('OUTBOX_RETRY_MAX', '3600'))
+        self.SES_MAX_WORKERS = int(os.getenv('SES_MAX_WORKERS', '4'))
+        self.SES_VERIFICATION_TTL = int(os.getenv('SES_VERIFICATION_TTL', '3600'))
         self.TABLE_NAME = os.getenv('TABLE_NAME')
         self.URL = os.getenv('URL')
+        # seconds a warm container reuses the app and its checks before building it again, 0 means never rebuild
+        self.APP_CACHE_TTL = int(os.getenv('APP_CACHE_TTL', '3600'))
+        # snapshot: whole file list per run, index: one item per known filename
+        self.STORAGE_MODE = os.getenv('STORAGE_MODE', 'snapshot')
+        self.TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'false').lower() == 'true'
+        self.METRICS_NAMESPACE = os.getenv('METRICS_NAMESPACE', 'WebScraper')
+        # where run logs are kept for the weekly digest: dynamodb, local or none
+        # dynamodb writes one item on every run, also when nothing changed
+        self.LOG_STORE = os.getenv('LOG_STORE', 'none')
+        self.LOG_STORE_DIR = os.getenv('LOG_STORE_DIR', 'run_logs')
+        self.RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '30'))
+        self.CLEANUP_DAY = int(os.getenv('CLEANUP_DAY', '1'))  # day of month, 0 means every run
+        self.DELETE_WORKERS = int(os.getenv('DELETE_WORKERS', '4'))
+        self.USE_TTL = os.getenv('USE_TTL', 'false').lower() == 'true'
+        # how snapshots are written: compact (compressed binary) or json, both are always readable
+        self.SNAPSHOT_FORMAT = os.getenv('SNAPSHOT_FORMAT', 'compact')
+        # keep a first seen / last seen index of every file, it is never cleaned by the retention window
+        # off by default, every new or removed file costs extra writes on each run
+        self.TIMELINE_ENABLED = os.getenv('TIMELINE_ENABLED', 'false').lower() == 'true'
+        # optional comma separated list of pages to watch, the first one keeps the legacy SCAN_RESULT records
+        self.URLS = urls_string_to_list(os.getenv('URLS')) or urls_string_to_list(self.URL)
+        self.MAX_CONCURRENT_FETCHES = int(os.getenv('MAX_CONCURRENT_FETCHES', '8'))
+        # threads that overlap the database reads, cleanup and log email with the fetch, 0 runs every stage in turn
+        self.STAGE_WORKERS = int(os.getenv('STAGE_WORKERS', '0'))
+        self.STREAM_PARSE = os.getenv('STREAM_PARSE', 'false').lower() == 'true'
+        self.HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+        self.HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+        self.HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '3'))
+        # comma separated parser backends to try in order, empty means every installed HTML parser fastest first,
+        # regex is only used when listed here
+        self.PARSER_BACKENDS = comma_string_to_list(os.getenv('PARSER_BACKENDS')) or None
+        # daemon mode polls every page between these intervals in seconds, backing off while nothing changes
+        self.DAEMON_MIN_INTERVAL = int(os.getenv('DAEMON_MIN_INTERVAL', '300'))
+        self.DAEMON_MAX_INTERVAL = int(os.getenv('DAEMON_MAX_INTERVAL', '10800'))
+        self.DAEMON_BACKOFF = float(os.getenv('DAEMON_BACKOFF', '1.5'))
+        self.DAEMON_JITTER = float(os.getenv('DAEMON_JITTER', '0.1'))
+        # how many hours of the day with the most past changes are polled at the minimum interval
+        self.DAEMON_HOT_HOURS = int(os.getenv('DAEMON_HOT_HOURS', '3'))
+
+    @property
+    def http_timeout(self):
+        return self.HTTP_CONNECT_TIMEOUT, self.HTTP_READ_TIMEOUT
 
     @property
     def sender_recipient_addresses(self):
@@ -36,6 +91,8 @@ class Config:
     def _get_secret(self, secret_name):
         """Get secret from AWS Secrets Manager"""
         try:
+            import boto3
+
             session = boto3.session.Session()
             client = session.client(
                 service_name='secretsmanager',
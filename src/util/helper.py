@@ -1,4 +1,5 @@
 from datetime import datetime
+import hashlib
 
 
 def get_timestamp():
@@ -10,6 +11,23 @@ def emails_string_to_list(emails_string):
         return [email.strip() for email in emails_string.split(',')]
     return ""
 
+def comma_string_to_list(value):
+    """'a, b,,c' -> ['a', 'b', 'c'], [] if value is not a string"""
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(',') if item.strip()]
+    return []
+
+def urls_string_to_list(urls_string):
+    return comma_string_to_list(urls_string)
+
+def file_list_digest(files):
+    """Stable digest of a file list, the order of the files does not matter"""
+    digest = hashlib.blake2b(digest_size=16)
+    for file in sorted((f['filename'], f['url'], f['date']) for f in files):
+        digest.update('\x1f'.join(file).encode('utf-8'))
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
 class AppError(Exception):
     def __init__(self, message, error_code=None):
         self.message = message
@@ -1,32 +1,102 @@
-from datetime import datetime
-from io import StringIO
+from collections import deque
 import logging
 import sys
 
+LOG_BUFFER_MAX_RECORDS = 2000
+LOG_BUFFER_MAX_BYTES = 512 * 1024
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 
-def setup_logging():
+
+class BufferedRecord:
+    """the parts of a log record needed to format it later"""
+    __slots__ = ('created', 'msecs', 'name', 'levelname', 'levelno', 'message', 'exc_text')
+
+    def __init__(self, record, message, exc_text):
+        self.created = record.created
+        self.msecs = record.msecs
+        self.name = record.name
+        self.levelname = record.levelname
+        self.levelno = record.levelno
+        self.message = message
+        self.exc_text = exc_text
+
+    def to_log_record(self):
+        return logging.makeLogRecord({slot: getattr(self, slot) for slot in self.__slots__} | {'msg': self.message})
+
+
+class RingBufferHandler(logging.Handler):
+    """Keep the last records in a fixed size buffer, they are only formatted when the log is rendered"""
+
+    def __init__(self, max_records=LOG_BUFFER_MAX_RECORDS, max_bytes=LOG_BUFFER_MAX_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self.records = deque(maxlen=max_records)
+        self.size = 0
+        self.dropped = 0
+
+    def emit(self, record):
+        try:
+            message = record.getMessage()
+            exc_text = self.formatter.formatException(record.exc_info) if record.exc_info and self.formatter else None
+            if len(self.records) == self.records.maxlen:
+                self._drop_oldest()
+            self.records.append(BufferedRecord(record, message, exc_text))
+            self.size += len(message)
+            while self.size > self.max_bytes and len(self.records) > 1:
+                self._drop_oldest()
+        except Exception:
+            self.handleError(record)
+
+    def _drop_oldest(self):
+        self.size -= len(self.records.popleft().message)
+        self.dropped += 1
+
+    @property
+    def last_message(self):
+        return self.records[-1].message if self.records else ''
+
+    def render(self):
+        formatter = self.formatter or logging.Formatter(LOG_FORMAT)
+        lines = [f"... {self.dropped} earlier log records dropped"] if self.dropped else []
+        lines.extend(formatter.format(record.to_log_record()) for record in self.records)
+        return '\n'.join(lines) + '\n' if lines else ''
+
+
+def setup_logging(max_records=LOG_BUFFER_MAX_RECORDS, max_bytes=LOG_BUFFER_MAX_BYTES):
     """Initialize logging configuration"""
     root = logging.getLogger()
     root.setLevel(logging.INFO)
     
     # Clear any default handlers created by lambda
     if root.handlers:
-        for handler in root.handlers:
+        for handler in list(root.handlers):
             root.removeHandler(handler)
     
     # Create handlers for both outputs
     handlers = [
-        logging.StreamHandler(StringIO()),   # For email
+        RingBufferHandler(max_records, max_bytes),  # For email
         logging.StreamHandler(sys.stdout),  # For CloudWatch
     ]
     # Create a formatter
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    formatter = logging.Formatter(LOG_FORMAT)
     # Configure all handlers
     for handler in handlers:
         handler.setFormatter(formatter)
         root.addHandler(handler)
 
+
+def _get_buffer_handler():
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, RingBufferHandler):
+            return handler
+    return None
+
+
 def get_log_content():
-    root = logging.getLogger()
-    string_io_handler = root.handlers[0]    # email is the first handler
-    return string_io_handler.stream.getvalue()
+    handler = _get_buffer_handler()
+    return handler.render() if handler else ''
+
+
+def get_last_log_message():
+    handler = _get_buffer_handler()
+    return handler.last_message if handler else ''
@@ -0,0 +1,100 @@
+from contextlib import nullcontext
+from functools import wraps
+import json
+import sys
+import threading
+import time
+
+# a disabled span is a shared no-op context manager, so tracing costs one flag check when it is off
+_NULL_SPAN = nullcontext()
+_state = {'enabled': False, 'namespace': 'WebScraper'}
+_spans = []
+_lock = threading.Lock()
+
+
+def configure_tracing(enabled, namespace='WebScraper'):
+    _state['enabled'] = enabled
+    _state['namespace'] = namespace
+
+
+def tracing_enabled():
+    return _state['enabled']
+
+
+class _Span:
+    __slots__ = ('name', 'properties', 'start')
+
+    def __init__(self, name, properties):
+        self.name = name
+        self.properties = properties
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        milliseconds = (time.perf_counter() - self.start) * 1000
+        with _lock:
+            _spans.append((self.name, milliseconds, exc_type is None))
+        _emit(self.name, milliseconds, exc_type is None, self.properties)
+        return False
+
+
+def span(name, **properties):
+    """time a block, e.g. `with span('fetch', url=url):`, properties are added to the metric line"""
+    if not _state['enabled']:
+        return _NULL_SPAN
+    return _Span(name, properties)
+
+
+def traced(name):
+    """decorator version of span"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _state['enabled']:
+                return func(*args, **kwargs)
+            with _Span(name, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _emit(name, milliseconds, success, properties):
+    """write the span as a CloudWatch Embedded Metric Format line to stdout"""
+    line = {
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': _state['namespace'],
+                'Dimensions': [['Span']],
+                'Metrics': [{'Name': 'Duration', 'Unit': 'Milliseconds'}],
+            }],
+        },
+        'Span': name,
+        'Duration': round(milliseconds, 3),
+        'Success': success,
+        **properties,
+    }
+    sys.stdout.write(json.dumps(line, default=str) + '\n')
+
+
+def reset_spans():
+    with _lock:
+        _spans.clear()
+
+
+def span_summary():
+    """per span count, total and max milliseconds of this run as text, empty when nothing was traced"""
+    with _lock:
+        spans = list(_spans)
+    if not spans:
+        return ''
+    totals = {}
+    for name, milliseconds, success in spans:
+        count, total, longest, failed = totals.get(name, (0, 0.0, 0.0, 0))
+        totals[name] = (count + 1, total + milliseconds, max(longest, milliseconds), failed + (not success))
+    lines = [f"{'span':<14}{'count':>7}{'total ms':>12}{'max ms':>12}{'failed':>8}"]
+    for name, (count, total, longest, failed) in sorted(totals.items(), key=lambda item: -item[1][1]):
+        lines.append(f"{name:<14}{count:>7}{total:>12.1f}{longest:>12.1f}{failed:>8}")
+    return '\n'.join(lines) + '\n'
@@ -17,6 +17,7 @@ def config():
 def scraper_mock(mocker, current_files):
     mock_scraper = mocker.Mock()
     mock_scraper.get_file_list.return_value = current_files
+    mock_scraper.source = None
     return mock_scraper
 
 
@@ -24,7 +25,7 @@ def scraper_mock(mocker, current_files):
 def dynamodb_mock(mocker, old_files):
     # create a mock handler
     mock_handler = mocker.Mock()
-    mock_handler.create_table_if_not_exists.return_value = None
+    mock_handler.ensure_table.return_value = None
     mock_handler.save_scraper_result.return_value = True
     mock_handler.get_last_scraper_result.return_value = old_files
     return mock_handler
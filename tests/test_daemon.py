@@ -0,0 +1,67 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from src import daemon
+from src.service import AdaptiveSchedule, learn_hot_hours
+
+
+@pytest.fixture
+def no_jitter(mocker):
+    mocker.patch('src.service.schedule.random.uniform', side_effect=lambda low, high: (low + high) / 2)
+
+
+def test_schedule_backs_off_until_changed(no_jitter):
+    schedule = AdaptiveSchedule(min_interval=100, max_interval=300, backoff=2)
+    now = datetime(2024, 1, 1, 12, 0)
+
+    schedule.record(changed=False)
+    assert schedule.next_delay(now) == 200
+    schedule.record(changed=False)
+    assert schedule.next_delay(now) == 300
+    schedule.record(changed=True)
+    assert schedule.next_delay(now) == 100
+
+
+def test_schedule_tightens_in_and_before_hot_hours(no_jitter):
+    schedule = AdaptiveSchedule(min_interval=100, max_interval=10000, backoff=100, hot_hours={13})
+    schedule.record(changed=False)
+
+    assert schedule.next_delay(datetime(2024, 1, 1, 13, 30)) == 100
+    assert schedule.next_delay(datetime(2024, 1, 1, 12, 50)) == 600  # wakes up when the hot hour starts
+    assert schedule.next_delay(datetime(2024, 1, 1, 9, 0)) == 10000
+
+
+def test_schedule_jitter_stays_within_bounds():
+    schedule = AdaptiveSchedule(min_interval=100, jitter=0.2)
+    delays = [schedule.next_delay(datetime(2024, 1, 1, 12, 0)) for _ in range(100)]
+    assert all(80 <= delay <= 120 for delay in delays)
+
+
+def test_learn_hot_hours_needs_repeated_changes():
+    scan_dates = [datetime(2024, 1, day, 18, 5) for day in range(1, 5)] + \
+                 [datetime(2024, 1, day, 9, 30) for day in range(1, 3)] + [datetime(2024, 1, 1, 3, 0)]
+    assert learn_hot_hours(scan_dates, count=3) == {18, 9}
+
+
+def test_daemon_checks_pages_until_stopped(mocker, current_files):
+    scraper = mocker.Mock(url='https://example.com/a', source=None)
+    scraper.get_file_list.return_value = current_files
+    service = mocker.Mock()
+    service.scraper.scrapers = [scraper]
+    service.db_handler.get_http_validators.return_value = {}
+    service.db_handler.get_scan_dates.return_value = []
+    service.check_new_files_and_send_email.return_value = current_files
+    polling = daemon.PollingDaemon(service, min_interval=0.01, max_interval=0.05, jitter=0)
+
+    async def run_briefly():
+        asyncio.get_running_loop().call_later(0.2, polling.stop)
+        await polling.run()
+
+    asyncio.run(run_briefly())
+
+    assert service.check_new_files_and_send_email.call_count > 1
+    service.check_new_files_and_send_email.assert_called_with(scraper, current_files)
+    service.save_run_log.assert_called_once()
+    assert polling.schedules[scraper.url].interval == 0.01
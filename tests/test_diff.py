@@ -0,0 +1,66 @@
+from src.service import diff_files, newest_per_module
+
+
+def make_file(filename, url=None):
+    return {'filename': filename, 'url': url or f'https://example.com/{filename}', 'date': ''}
+
+
+def test_diff_reports_every_kind_of_change():
+    previous = [make_file('a_2024.1.1.apk'), make_file('b_2024.1.1.apk'), make_file('c_2024.1.1.apk')]
+    current = [
+        make_file('a_2024.01.01.apk', previous[0]['url']),  # re-uploaded with a padded date
+        make_file('b_2024.1.1.apk', 'https://mirror.example.com/b'),
+        make_file('a_2024.1.2.apk'),
+    ]
+
+    diff = diff_files(current, previous)
+
+    assert diff.added == [current[2]]
+    assert diff.changed_url == [current[1]]
+    assert diff.removed == [previous[2]]
+    assert diff.superseded == [previous[0]]
+
+
+def test_diff_orders_newest_first_and_keeps_extensions_apart():
+    current = [make_file('a_2023.5.1.apk'), make_file('a_2024.1.1.zip'), make_file('a_2024.1.1.apk'),
+               make_file('notes.txt')]
+
+    added = diff_files(current, []).added
+
+    assert [f['filename'] for f in added] == ['a_2024.1.1.zip', 'a_2024.1.1.apk', 'a_2023.5.1.apk', 'notes.txt']
+
+
+def test_known_filenames_without_url_never_change_url():
+    diff = diff_files([make_file('a_2024.1.1.apk')], [{'filename': 'a_2024.1.1.apk'}])
+    assert diff.added == [] and diff.changed_url == []
+
+
+def test_newest_per_module():
+    files = [make_file(f'{module}_2024.1.{day}.apk') for module in 'ab' for day in range(1, 6)]
+
+    newest = newest_per_module(files, 2)
+
+    assert sorted(f['filename'] for f in newest) == ['a_2024.1.4.apk', 'a_2024.1.5.apk',
+                                                    'b_2024.1.4.apk', 'b_2024.1.5.apk']
+
+
+def test_service_only_emails_newest_per_module(update_service, old_files):
+    update_service.notify_newest_per_module = 1
+    update_service.db_handler.get_scan_state.return_value = {}
+    backlog = [make_file(f'file_2024.2.{day}.apk') for day in range(1, 10)]
+
+    new_files = update_service.check_new_files_and_send_email(files_from_crawler=backlog + old_files)
+
+    assert len(new_files) == 9
+    update_service.email_sender.send_new_file_email.assert_called_once_with([backlog[-1]])
+
+
+def test_files_sharing_a_module_and_version_are_all_kept():
+    previous = [make_file('a_2024.1.1.apk')]
+    current = [make_file('a_2024.01.01.apk'), make_file('a_2024.1.1.apk')]
+
+    diff = diff_files(current, previous)
+
+    assert diff.added == [current[0]]
+    assert diff.removed == [] and diff.changed_url == []
+    assert diff_files(previous, current).removed == [current[0]]
@@ -0,0 +1,104 @@
+import pytest
+
+from src.data import DynamoDBHandler
+
+TABLE_NAME = 'test_table'
+
+
+def scan_key(scan_date, record_type='SCAN_RESULT'):
+    return {'record_type': record_type, 'scan_date': scan_date}
+
+
+@pytest.fixture
+def dynamodb_resource(mocker):
+    resource = mocker.Mock()
+    resource.Table.return_value.name = TABLE_NAME
+    resource.meta.client.batch_write_item.return_value = {'UnprocessedItems': {}}
+    resource.meta.client.describe_time_to_live.return_value = {'TimeToLiveDescription': {'TimeToLiveStatus': 'DISABLED'}}
+    return resource
+
+
+@pytest.fixture
+def db_handler(dynamodb_resource):
+    return DynamoDBHandler(dynamodb_resource, TABLE_NAME, cleanup_day=0, delete_workers=1)
+
+
+def test_delete_old_data_follows_pages_and_keeps_latest(db_handler, dynamodb_resource, mocker):
+    mocker.patch('src.data.dynamodb_handler.time.sleep')
+    old_keys = [scan_key(f'2024-01-{day:02d}-00-00-00') for day in range(1, 31)]
+    db_handler.table.query.side_effect = [
+        {'Items': [old_keys[-1]]},  # latest snapshot
+        {'Items': old_keys[:20], 'LastEvaluatedKey': old_keys[19]},
+        {'Items': old_keys[20:]},
+    ]
+    # the first batch is throttled once
+    dynamodb_resource.meta.client.batch_write_item.side_effect = [
+        {'UnprocessedItems': {TABLE_NAME: [{'DeleteRequest': {'Key': old_keys[0]}}]}},
+        {'UnprocessedItems': {}},
+        {'UnprocessedItems': {}},
+    ]
+
+    result = db_handler.deleteOldDbData()
+
+    assert result['deleted'] == 29
+    assert db_handler.table.query.call_args_list[2].kwargs['ExclusiveStartKey'] == old_keys[19]
+    deleted_keys = [request['DeleteRequest']['Key']
+                    for call in dynamodb_resource.meta.client.batch_write_item.call_args_list
+                    for request in call.kwargs['RequestItems'][TABLE_NAME]]
+    assert old_keys[-1] not in deleted_keys
+    assert deleted_keys.count(old_keys[0]) == 2
+
+
+def test_delete_old_data_with_ttl_only_removes_records_without_expiry(dynamodb_resource):
+    handler = DynamoDBHandler(dynamodb_resource, TABLE_NAME, cleanup_day=0, use_ttl=True)
+    handler.table.query.side_effect = [{'Items': [scan_key('2024-01-03-00-00-00')]},
+                                       {'Items': [scan_key('2024-01-01-00-00-00')]}]
+
+    assert handler.deleteOldDbData()['deleted'] == 1
+    assert handler.table.query.call_args.kwargs['FilterExpression'] == 'attribute_not_exists(expires_at)'
+    dynamodb_resource.meta.client.update_time_to_live.assert_called_once()
+
+
+def test_save_with_ttl_expires_previous_snapshot(dynamodb_resource):
+    handler = DynamoDBHandler(dynamodb_resource, TABLE_NAME, use_ttl=True)
+    handler.table.query.return_value = {'Items': [scan_key('2024-01-01-00-00-00')]}
+
+    assert handler.save_scraper_result([{'filename': 'a', 'url': 'u', 'date': 'd'}])
+
+    assert 'expires_at' not in handler.table.put_item.call_args.kwargs['Item']
+    assert handler.table.update_item.call_args.kwargs['Key'] == scan_key('2024-01-01-00-00-00')
+
+
+def test_save_succeeds_when_expiring_previous_snapshot_fails(dynamodb_resource):
+    handler = DynamoDBHandler(dynamodb_resource, TABLE_NAME, use_ttl=True)
+    handler.table.query.return_value = {'Items': [scan_key('2024-01-01-00-00-00')]}
+    handler.table.update_item.side_effect = RuntimeError('throttled')
+
+    assert handler.save_scraper_result([{'filename': 'a', 'url': 'u', 'date': 'd'}])
+    handler.table.put_item.assert_called_once()
+
+
+def test_iter_scraper_results_streams_pages(db_handler):
+    db_handler.table.query.side_effect = [
+        {'Items': [{'scan_date': '2024-01-01-00-00-00', 'files': '[{"filename": "a"}]'}], 'LastEvaluatedKey': {'k': 1}},
+        {'Items': [{'scan_date': '2024-01-02-00-00-00', 'files': '[]'}]},
+    ]
+
+    results = db_handler.iter_scraper_results(page_size=1)
+
+    assert next(results)[1] == [{'filename': 'a'}]
+    assert db_handler.table.query.call_count == 1
+    assert [scan_date.day for scan_date, _ in results] == [2]
+
+
+@pytest.mark.parametrize('snapshot_format, attribute_type', [('compact', bytes), ('json', str)])
+def test_snapshot_formats_read_back(dynamodb_resource, snapshot_format, attribute_type):
+    handler = DynamoDBHandler(dynamodb_resource, TABLE_NAME, snapshot_format=snapshot_format)
+    files = [{'filename': 'a_2024.1.2.apk', 'url': 'https://example.com/a_2024.1.2.apk/download', 'date': '2024.01.02'}]
+
+    assert handler.save_scraper_result(files)
+
+    item = handler.table.put_item.call_args.kwargs['Item']
+    assert isinstance(item['files'], attribute_type)
+    handler.table.query.return_value = {'Items': [item]}
+    assert handler.get_last_scraper_result() == files
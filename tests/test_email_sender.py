@@ -0,0 +1,113 @@
+import pytest
+
+from src.notification import EmailSender, TokenBucket, clear_verification_cache, verification_cache_stats
+from src.notification.templates import render_new_files
+
+ADDRESSES = {
+    'sender_email': 'sender@example.com',
+    'new_file_recipient_emails': 'a@example.com, b@example.com',
+    'log_recipient_emails': 'b@example.com,sender@example.com',
+}
+
+
+@pytest.fixture(autouse=True)
+def empty_verification_cache():
+    clear_verification_cache()
+    yield
+    clear_verification_cache()
+
+
+@pytest.fixture
+def ses_mock(mocker):
+    ses = mocker.Mock()
+
+    def verification_attributes(Identities):
+        return {'VerificationAttributes': {email: {'VerificationStatus': 'Success'} for email in Identities}}
+    ses.get_identity_verification_attributes.side_effect = verification_attributes
+    return ses
+
+
+def test_verification_is_one_deduplicated_call(ses_mock):
+    sender = EmailSender(ses_mock, ADDRESSES)
+
+    assert sender.is_sender_email_verified
+    assert sender.is_new_file_recipient_emails_verified
+    assert sender.is_log_recipient_emails_verified
+
+    ses_mock.get_identity_verification_attributes.assert_called_once_with(
+        Identities=['sender@example.com', 'a@example.com', 'b@example.com'])
+
+
+def test_verification_cache_is_shared_until_ttl(ses_mock, mocker):
+    monotonic = mocker.patch('src.notification.email_sender.time.monotonic', return_value=100.0)
+    assert EmailSender(ses_mock, ADDRESSES, verification_ttl=60).is_sender_email_verified
+    assert EmailSender(ses_mock, ADDRESSES, verification_ttl=60).is_sender_email_verified
+    assert ses_mock.get_identity_verification_attributes.call_count == 1
+    assert verification_cache_stats() == {'hits': 3, 'misses': 3}
+
+    monotonic.return_value = 161.0
+    assert EmailSender(ses_mock, ADDRESSES, verification_ttl=60).is_sender_email_verified
+    assert ses_mock.get_identity_verification_attributes.call_count == 2
+
+
+def test_unverified_recipient(ses_mock):
+    ses_mock.get_identity_verification_attributes.side_effect = None
+    ses_mock.get_identity_verification_attributes.return_value = {'VerificationAttributes': {
+        'sender@example.com': {'VerificationStatus': 'Success'},
+        'a@example.com': {'VerificationStatus': 'Pending'},
+    }}
+    sender = EmailSender(ses_mock, ADDRESSES)
+
+    assert sender.is_sender_email_verified
+    assert not sender.is_new_file_recipient_emails_verified
+
+
+def test_dispatch_splits_recipients_into_ses_chunks(ses_mock, mocker):
+    ses_mock.get_send_quota.return_value = {'MaxSendRate': 1000.0}
+    recipients = ', '.join(f'user{i}@example.com' for i in range(120))
+    sender = EmailSender(ses_mock, {**ADDRESSES, 'new_file_recipient_emails': recipients})
+    send = mocker.patch.object(sender, '_ses_send_email', side_effect=[True, False, True])
+    mocker.patch.object(sender.dispatcher, 'max_workers', 1)
+
+    assert not sender.send_new_file_email([{'filename': 'a.apk', 'url': 'https://example.com/a', 'date': '2024.01.01'}])
+
+    assert [len(call.args[0]) for call in send.call_args_list] == [50, 50, 20]
+    assert [result.success for result in sender.last_dispatch_results] == [True, False, True]
+    ses_mock.get_send_quota.assert_called_once()
+
+
+def test_token_bucket_waits_for_tokens(mocker):
+    clock = [0.0]
+    mocker.patch('src.notification.dispatcher.time.monotonic', side_effect=lambda: clock[0])
+    sleep = mocker.patch('src.notification.dispatcher.time.sleep',
+                         side_effect=lambda seconds: clock.__setitem__(0, clock[0] + seconds))
+    bucket = TokenBucket(rate=10)
+
+    bucket.acquire(10)
+    sleep.assert_not_called()
+    bucket.acquire(5)
+    assert sleep.call_args.args[0] == pytest.approx(0.5)
+
+
+def test_render_new_files_escapes_and_truncates():
+    new_files = [{'filename': f'<b>{i}</b>.apk', 'url': f'https://example.com/{i}?a=1&b=2', 'date': '2024.01.01'}
+                 for i in range(5)]
+
+    body_html, body_text = render_new_files(new_files, '2024-01-01 00:00:00', max_files=2)
+
+    assert '&lt;b&gt;0&lt;/b&gt;.apk' in body_html
+    assert 'href="https://example.com/1?a=1&amp;b=2"' in body_html
+    assert '<b>2</b>.apk' not in body_text
+    assert '... and 3 more files' in body_html and '... and 3 more files' in body_text
+
+
+def test_log_email_escapes_log_and_sends_text_part(ses_mock, mocker):
+    mocker.patch('src.notification.email_sender.get_log_content', return_value='<script>x</script> - done')
+    ses_mock.get_send_quota.return_value = {'MaxSendRate': 1000.0}
+    ses_mock.send_email.return_value = {'MessageId': 'id'}
+
+    assert EmailSender(ses_mock, ADDRESSES).send_log_email()
+
+    body = ses_mock.send_email.call_args.kwargs['Message']['Body']
+    assert '&lt;script&gt;' in body['Html']['Data']
+    assert '<script>x</script>' in body['Text']['Data']
@@ -0,0 +1,39 @@
+import logging
+
+import pytest
+
+from src.scraper import FileMeta, parse_filenames
+from src.scraper.scraper import extract_date
+
+
+@pytest.mark.parametrize('filename, expected', [
+    ('XiaomiEUModule_2024.10.24.apk', FileMeta('XiaomiEUModule', (2024, 10, 24), '2024.10.24')),
+    ('xiaomi.eu_multi_MI9_2024.1.5.zip', FileMeta('xiaomi.eu_multi_MI9', (2024, 1, 5), '2024.01.05')),
+    ('2024.02.29.apk', FileMeta('', (2024, 2, 29), '2024.02.29')),
+    ('Module_2000.2.29.', FileMeta('Module', (2000, 2, 29), '2000.02.29')),
+])
+def test_parse_filenames(filename, expected):
+    assert parse_filenames([filename]) == [expected]
+
+
+@pytest.mark.parametrize('filename', [
+    'Module_2023.2.29.apk', 'Module_1900.2.29.apk', 'Module_2024.4.31.apk', 'Module_2024.13.1.apk',
+    'Module_0000.1.1.apk', 'Module_2024.1.5', 'Module_2024.1.5.tar.gz', 'Module_24.1.5.apk', 'readme.txt',
+])
+def test_invalid_dates_fall_back_to_today(filename, mocker):
+    mocker.patch('src.scraper.filename_meta.datetime').now.return_value.strftime.return_value = '2030.01.01'
+    assert parse_filenames([filename]) == [FileMeta(filename, None, '2030.01.01')]
+
+
+def test_one_warning_per_batch(caplog):
+    filenames = [f'Module_2023.2.{day}.apk' for day in range(29, 32)] + ['Module_2024.10.24.apk']
+    with caplog.at_level(logging.WARNING):
+        metas = parse_filenames(filenames)
+
+    assert [meta.version for meta in metas] == [None, None, None, (2024, 10, 24)]
+    assert len(caplog.records) == 1
+    assert '3 filenames' in caplog.records[0].getMessage()
+
+
+def test_extract_date_keeps_padding():
+    assert extract_date('XiaomiEUModule_2024.1.5.apk') == '2024.01.05'
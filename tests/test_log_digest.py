@@ -0,0 +1,36 @@
+from datetime import datetime, timedelta
+
+from src.data import LocalLogStore
+from src.service.log_digest import build_log_digest
+
+RUN_LOG = """2024-01-06 10:00:00,123 - service.update_service - INFO - 2024-01-06 10:00:00 - no new files, do not send email
+2024-01-06 10:00:01,456 - scraper.scraper - WARNING - 2024-01-06 10:00:01 - Could not extract valid date from filename: a
+"""
+
+
+def test_digest_deduplicates_runs():
+    other_run = RUN_LOG.replace('2024-01-06 10:00', '2024-01-07 10:00')
+    error_run = "2024-01-08 10:00:00,000 - service.update_service - ERROR - 2024-01-08 10:00:00 - Service error: x\n"
+
+    digest = build_log_digest([RUN_LOG, other_run, error_run])
+
+    assert (digest.runs, digest.lines, digest.distinct) == (3, 5, 3)
+    assert digest.levels == {'INFO': 2, 'WARNING': 2, 'ERROR': 1}
+    assert '[x2] INFO - service.update_service - no new files, do not send email' in digest.text
+
+
+def test_digest_memory_is_bounded():
+    chunks = (f"2024-01-06 10:00:00,000 - x - INFO - message {i}\n" for i in range(100))
+
+    digest = build_log_digest(chunks, max_distinct=10)
+
+    assert (digest.runs, digest.distinct, digest.dropped) == (100, 10, 90)
+
+
+def test_local_log_store_round_trip(tmp_path):
+    store = LocalLogStore(str(tmp_path))
+    assert store.append(RUN_LOG)
+    assert store.append("second run\n")
+
+    assert list(store.iter_chunks(datetime.now() - timedelta(days=7))) == [RUN_LOG, "second run\n"]
+    assert list(store.iter_chunks(datetime.now() + timedelta(days=1))) == []
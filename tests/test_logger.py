@@ -0,0 +1,36 @@
+import logging
+
+from src.util import RingBufferHandler
+
+
+def make_logger(handler):
+    handler.setFormatter(logging.Formatter('%(levelname)s - %(message)s'))
+    logger = logging.getLogger(f'test_logger_{id(handler)}')
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    logger.addHandler(handler)
+    return logger
+
+
+def test_ring_buffer_keeps_last_records():
+    handler = RingBufferHandler(max_records=3)
+    logger = make_logger(handler)
+
+    for i in range(5):
+        logger.info("message %s", i)
+
+    assert handler.last_message == 'message 4'
+    assert handler.render() == ('... 2 earlier log records dropped\n'
+                                'INFO - message 2\nINFO - message 3\nINFO - message 4\n')
+
+
+def test_ring_buffer_is_bounded_by_bytes():
+    handler = RingBufferHandler(max_records=100, max_bytes=25)
+    logger = make_logger(handler)
+
+    for i in range(10):
+        logger.warning("0123456789")
+
+    assert len(handler.records) == 2
+    assert handler.size == 20
+    assert handler.render().endswith('WARNING - 0123456789\n')
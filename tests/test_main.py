@@ -0,0 +1,62 @@
+from pathlib import Path
+import subprocess
+import sys
+
+import pytest
+
+from src import main
+from src.util import LazyAWS
+
+
+@pytest.fixture(autouse=True)
+def reset_app_cache(mocker):
+    mocker.patch.object(main, '_app', None)
+    mocker.patch.object(main, '_app_created_at', 0.0)
+    mocker.patch.object(main, '_app_cache_ttl', 0)
+
+
+def test_lambda_handler_reuses_app_on_warm_invocations(mocker):
+    create_app = mocker.patch.object(main, 'create_app')
+    create_app.return_value.stage_workers = 0
+    mocker.patch.object(main, 'setup_logging')
+
+    main.lambda_handler(None, None)
+    main.lambda_handler(None, None)
+
+    create_app.assert_called_once()
+    assert create_app.return_value.check_all_sources_and_send_email.call_count == 2
+    # the table is checked before the stages share it
+    assert create_app.return_value.db_handler.ensure_table.call_count == 2
+
+
+def test_get_app_rebuilds_after_ttl(mocker, monkeypatch):
+    monkeypatch.setenv('APP_CACHE_TTL', '60')
+    create_app = mocker.patch.object(main, 'create_app', side_effect=[mocker.Mock(), mocker.Mock()])
+    monotonic = mocker.patch.object(main.time, 'monotonic', return_value=1000.0)
+
+    first = main.get_app()
+    monotonic.return_value = 1030.0
+    assert main.get_app() is first
+    monotonic.return_value = 1061.0
+    assert main.get_app() is not first
+    assert create_app.call_count == 2
+
+
+def test_lazy_aws_creates_client_on_first_use(mocker):
+    factory = mocker.Mock()
+    client = LazyAWS(factory)
+    factory.assert_not_called()
+
+    client.send_email()
+    client.send_email()
+
+    factory.assert_called_once()
+    assert factory.return_value.send_email.call_count == 2
+
+
+def test_importing_main_does_not_load_heavy_dependencies():
+    check = "import sys, main; print(sorted({'boto3', 'botocore', 'requests', 'bs4', 'dotenv'} & set(sys.modules)))"
+    src_dir = Path(__file__).resolve().parents[1] / 'src'
+    result = subprocess.run([sys.executable, '-c', check], cwd=src_dir, capture_output=True, text=True, check=True)
+
+    assert result.stdout.strip() == '[]'
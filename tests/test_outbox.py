@@ -0,0 +1,146 @@
+from botocore.exceptions import ClientError
+import pytest
+
+from src.data import DynamoDBOutbox, OutboxEvent, SQLiteOutbox, Subscription, event_key
+from src.notification import EmailDispatcher, EmailSender, clear_verification_cache
+from src.notification.dispatcher import DispatchResult
+from src.service.outbox_drainer import OutboxDrainer
+
+
+def make_file(filename):
+    return {'filename': filename, 'url': f'https://example.com/{filename}', 'date': '2024.01.01'}
+
+
+FILES = [make_file(f'file_2024.1.{day}.apk') for day in range(1, 4)]
+
+
+def test_sqlite_outbox_is_idempotent_and_retries(tmp_path, mocker):
+    outbox = SQLiteOutbox(str(tmp_path / 'outbox.sqlite3'))
+    assert outbox.enqueue(FILES)
+    assert outbox.enqueue(FILES[:1])
+
+    events = outbox.pending()
+    assert [event.file for event in events] == FILES
+    assert events[0] == OutboxEvent(event_key(None, FILES[0]), None, FILES[0], 0)
+
+    outbox.mark_failed(events[:1], lambda event: 2_000_000_000)
+    outbox.mark_delivered(events[1:])
+    assert outbox.pending() == []
+
+    # delivered files are not queued again
+    outbox.enqueue(FILES)
+    assert outbox.pending() == []
+    mocker.patch('src.data.outbox.time.time', return_value=2_000_000_001)
+    assert outbox.pending() == [events[0]._replace(attempts=1)]
+
+
+def test_dynamodb_outbox_skips_queued_and_delivered_keys(mocker):
+    db_handler = mocker.MagicMock()
+    db_handler.table.query.side_effect = [
+        {'Items': [{'scan_date': event_key('src', FILES[0])}]},
+        {'Items': [{'scan_date': f"2024-01-01-00-00-00#{event_key('src', FILES[1])}"}]},
+    ]
+    batch = db_handler.table.batch_writer.return_value.__enter__.return_value
+
+    assert DynamoDBOutbox(db_handler).enqueue(FILES, 'src')
+
+    batch.put_item.assert_called_once()
+    item = batch.put_item.call_args.kwargs['Item']
+    assert item['record_type'] == 'OUTBOX' and item['scan_date'] == event_key('src', FILES[2])
+
+
+def test_drainer_reschedules_the_failed_batch_and_the_rest(mocker):
+    outbox = mocker.Mock()
+    events = [OutboxEvent(str(i), None, file, 0) for i, file in enumerate(FILES)]
+    outbox.pending.return_value = events
+    send_files = mocker.Mock(side_effect=[[{'r': True}, {'r': True}], [{'r': False}]])
+
+    delivered = OutboxDrainer(outbox, send_files, batch_size=2).drain()
+
+    assert delivered == 2
+    outbox.mark_delivered.assert_called_once_with([event._replace(delivered={'r'}) for event in events[:2]])
+    assert outbox.mark_failed.call_args.args[0] == events[2:]
+
+
+def test_drainer_backoff_is_capped(mocker):
+    mocker.patch('src.service.outbox_drainer.time.time', return_value=0)
+    drainer = OutboxDrainer(mocker.Mock(), mocker.Mock(), retry_base=60, retry_max=600)
+    assert 30 <= drainer._next_attempt_at(OutboxEvent('k', None, {}, 0)) <= 60
+    assert 300 <= drainer._next_attempt_at(OutboxEvent('k', None, {}, 10)) <= 600
+
+
+def test_new_files_are_queued_before_the_snapshot(update_service, current_files, old_files, mocker):
+    manager = mocker.Mock()
+    update_service.outbox = manager.outbox
+    update_service.db_handler.save_scraper_result = manager.save_scraper_result
+    update_service.db_handler.get_scan_state.return_value = {}
+
+    update_service.check_new_files_and_send_email(files_from_crawler=current_files)
+
+    assert [call[0] for call in manager.mock_calls] == ['outbox.enqueue', 'save_scraper_result']
+    update_service.email_sender.send_new_file_email.assert_not_called()
+
+
+def test_snapshot_is_not_saved_when_queueing_fails(update_service, current_files):
+    update_service.outbox = update_service.db_handler.outbox
+    update_service.outbox.enqueue.return_value = False
+    update_service.db_handler.get_scan_state.return_value = {}
+
+    update_service.check_new_files_and_send_email(files_from_crawler=current_files)
+
+    update_service.db_handler.save_scraper_result.assert_not_called()
+    update_service.db_handler.save_scan_state.assert_not_called()
+
+
+def test_only_failed_recipients_are_retried(update_service, tmp_path, mocker):
+    outbox = SQLiteOutbox(str(tmp_path / 'outbox.sqlite3'))
+    outbox.enqueue(FILES[:1])
+    update_service.outbox = outbox
+    update_service.outbox_drainer = OutboxDrainer(outbox, update_service._deliver)
+    update_service.subscription_store = mocker.Mock()
+    update_service.subscription_store.list_subscriptions.return_value = [Subscription('a@x.com', [{'prefix': 'file'}])]
+    email_sender = update_service.email_sender
+    email_sender.new_file_recipient_emails = ['r@x.com']
+    email_sender.send_new_file_emails.return_value = [DispatchResult(['r@x.com'], True)]
+    email_sender.send_subscriber_digests.side_effect = [[DispatchResult(['a@x.com'], False)],
+                                                        [DispatchResult(['a@x.com'], True)]]
+
+    assert update_service.drain_outbox() == 0
+    assert outbox.pending() == []
+    mocker.patch('src.data.outbox.time.time', return_value=2_000_000_000)
+    assert outbox.pending()[0].delivered == {'new files:r@x.com'}
+
+    assert update_service.drain_outbox() == 1
+
+    # the configured recipient got the file once, only the subscriber was retried
+    email_sender.send_new_file_emails.assert_called_once_with([(['r@x.com'], FILES[:1])])
+    assert email_sender.send_subscriber_digests.call_count == 2
+    assert outbox.pending() == []
+
+
+THROTTLED = ClientError({'Error': {'Code': 'Throttling', 'Message': 'Rate exceeded'}},
+                        'GetIdentityVerificationAttributes')
+
+
+@pytest.mark.parametrize('verification', [THROTTLED, {'VerificationAttributes': {
+    'r@x.com': {'VerificationStatus': 'Success'}, 'sender@x.com': {'VerificationStatus': 'Pending'}}}],
+    ids=['lookup failed', 'sender not verified'])
+def test_files_stay_queued_when_the_sender_cannot_be_verified(update_service, tmp_path, mocker, verification):
+    clear_verification_cache()
+    ses = mocker.Mock()
+    if isinstance(verification, Exception):
+        ses.get_identity_verification_attributes.side_effect = verification
+    else:
+        ses.get_identity_verification_attributes.return_value = verification
+    addresses = {'sender_email': 'sender@x.com', 'new_file_recipient_emails': 'r@x.com', 'log_recipient_emails': None}
+    update_service.email_sender = EmailSender(ses, addresses, dispatcher=EmailDispatcher(ses, send_rate=1000))
+    outbox = SQLiteOutbox(str(tmp_path / 'outbox.sqlite3'))
+    outbox.enqueue(FILES[:1])
+    update_service.outbox_drainer = OutboxDrainer(outbox, update_service._deliver)
+
+    assert update_service.drain_outbox() == 0
+
+    ses.send_email.assert_not_called()
+    mocker.patch('src.data.outbox.time.time', return_value=2_000_000_000)
+    assert [event.file for event in outbox.pending()] == FILES[:1]
+    clear_verification_cache()
@@ -0,0 +1,43 @@
+import pytest
+
+from src.scraper.parsers import PARSERS, available_parsers, default_parsers, parse_rows, parse_rows_html_parser
+from tests.test_scraper import FILENAME, HTML_CONTENT, MULTI_ROW_HTML
+
+PARSER_NAMES = [name for name, _, _ in PARSERS]
+BACKENDS = {name: backend for name, backend, _ in PARSERS}
+
+
+@pytest.fixture(params=PARSER_NAMES)
+def backend(request):
+    if request.param not in available_parsers():
+        pytest.skip(f"{request.param} is not installed")
+    return BACKENDS[request.param]
+
+
+@pytest.mark.parametrize('html', [HTML_CONTENT, MULTI_ROW_HTML], ids=['single_row', 'multi_row'])
+def test_backend_matches_html_parser(backend, html):
+    assert backend(html) == parse_rows_html_parser(html)
+
+
+def test_backend_single_row(backend):
+    assert backend(HTML_CONTENT) == [(FILENAME, f'/download/{FILENAME}')]
+
+
+def test_backend_without_table(backend):
+    assert backend("<html>Invalid HTML</html>") is None
+
+
+def test_parse_rows_falls_back_when_no_rows(mocker):
+    mocker.patch('src.scraper.parsers.PARSERS', [('regex', lambda html: [], None),
+                                                 ('html.parser', parse_rows_html_parser, 'bs4')])
+
+    assert parse_rows(HTML_CONTENT, ['regex', 'html.parser']) == [(FILENAME, f'/download/{FILENAME}')]
+
+
+def test_parse_rows_without_table():
+    assert parse_rows("<html>Invalid HTML</html>") is None
+
+
+def test_regex_parser_is_opt_in():
+    assert 'regex' not in default_parsers()
+    assert default_parsers()[-1] == 'html.parser' or 'html.parser' not in available_parsers()
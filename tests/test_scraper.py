@@ -2,7 +2,8 @@ import pytest
 import requests
 import requests_mock
 
-from src.scraper import XiaomiEUScraper
+from src.scraper import XiaomiEUScraper, MultiSourceScraper, get_session
+from src.scraper.parsers import parse_rows_html_parser, parse_rows_streaming
 
 DATE = '2024.01.01'
 FILENAME = f'XiaomiEUModule_{DATE}.apk'
@@ -47,3 +48,96 @@ def test_get_file_list_network_error(scraper_real):
         m.get(scraper_real.url, exc=requests.exceptions.ConnectionError)
         files = scraper_real.get_file_list()
         assert len(files) == 0
+
+
+def test_multi_source_fetch_all_keeps_order_and_sources():
+    urls = ["https://example.com/a", "https://example.com/b", "https://example.com/c"]
+    multi_scraper = MultiSourceScraper(urls, max_workers=2)
+    with requests_mock.Mocker() as m:
+        m.get(urls[0], text=HTML_CONTENT)
+        m.get(urls[1], text="<html>Invalid HTML</html>")
+        m.get(urls[2], text=HTML_CONTENT)
+        results = multi_scraper.fetch_all()
+
+    assert [scraper.url for scraper, _ in results] == urls
+    # the first page keeps the legacy records, the others are keyed by url
+    assert [scraper.source for scraper, _ in results] == [None, urls[1], urls[2]]
+    assert [len(files) for _, files in results] == [1, 0, 1]
+
+
+def test_get_file_list_records_validators(scraper_real):
+    with requests_mock.Mocker() as m:
+        m.get(scraper_real.url, text=HTML_CONTENT, headers={'ETag': '"abc"', 'Last-Modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+        files = scraper_real.get_file_list()
+
+        assert len(files) == 1
+        assert scraper_real.validators == {'etag': '"abc"', 'last_modified': 'Mon, 01 Jan 2024 00:00:00 GMT'}
+
+
+def test_get_file_list_not_modified(scraper_real):
+    with requests_mock.Mocker() as m:
+        m.get(scraper_real.url, status_code=304)
+        files = scraper_real.get_file_list({'etag': '"abc"', 'last_modified': 'Mon, 01 Jan 2024 00:00:00 GMT'})
+
+        assert files is None
+        assert m.last_request.headers['If-None-Match'] == '"abc"'
+        assert m.last_request.headers['If-Modified-Since'] == 'Mon, 01 Jan 2024 00:00:00 GMT'
+
+
+MULTI_ROW_HTML = """
+    <table id="files_list">
+        <thead><tr><th>Name</th></tr></thead>
+        <tbody>
+            <tr class="folder"><td>not a file</td></tr>
+            <tr>
+                <th><a href="/download/XiaomiEUModule_2024.10.24.apk"><span class="name">
+                    XiaomiEUModule_2024.10.24.apk</span></a></th>
+                <td><a href="/ignored">ignored</a></td>
+            </tr>
+            <tr>
+                <th><span class="name icon">Module &amp; Tools_2024.2.3.zip</span><a href="/d/2?x=1&amp;y=2"></a></th>
+            </tr>
+            <tr>
+                <th><span class="name"><b>Broken</b>_name.apk</span><a href="/d/3"></a></th>
+            </tr>
+        </tbody>
+    </table>
+    """
+
+
+def test_streaming_rows_match_beautifulsoup():
+    chunks = [MULTI_ROW_HTML[i:i + 7] for i in range(0, len(MULTI_ROW_HTML), 7)]
+    assert parse_rows_streaming(chunks) == parse_rows_html_parser(MULTI_ROW_HTML)
+    assert parse_rows_streaming(["<html>Invalid HTML</html>"]) is None
+
+
+def test_get_file_list_streaming():
+    scraper = XiaomiEUScraper("https://example.com", streaming=True)
+    with requests_mock.Mocker() as m:
+        m.get(scraper.url, text=HTML_CONTENT)
+        files = scraper.get_file_list()
+
+        assert files == [{'filename': FILENAME, 'url': f'/download/{FILENAME}', 'date': DATE}]
+
+
+def test_session_is_shared_and_configured():
+    session = get_session(pool_size=4, max_retries=2)
+    assert get_session() is session
+
+    adapter = session.get_adapter("https://example.com")
+    assert adapter._pool_maxsize == 4
+    assert adapter.max_retries.total == 2
+    assert 429 in adapter.max_retries.status_forcelist
+    assert 'gzip' in session.headers['Accept-Encoding']
+    # changing the options rebuilds the session
+    assert get_session(pool_size=8) is not session
+
+
+def test_get_file_list_records_metrics(scraper_real):
+    with requests_mock.Mocker() as m:
+        m.get(scraper_real.url, text=HTML_CONTENT)
+        scraper_real.get_file_list()
+
+        assert m.last_request.timeout == scraper_real.timeout
+        assert scraper_real.metrics['retries'] == 0
+        assert {'wait_seconds', 'fetch_seconds', 'parse_seconds'} <= set(scraper_real.metrics)
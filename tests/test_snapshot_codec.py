@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from src.data import decode_files, encode_files
+
+BASE = 'https://example.com/projects/xiaomi/files/xiaomi.eu/'
+FILES = [
+    {'filename': 'ModuleA_2024.10.24.apk', 'url': f'{BASE}ModuleA_2024.10.24.apk/download', 'date': '2024.10.24'},
+    {'filename': 'ModuleB_2024.01.05.apk', 'url': f'{BASE}ModuleB_2024.01.05.apk/download', 'date': '2024.01.05'},
+    # the url does not contain the filename and the date is not packable
+    {'filename': 'notes.txt', 'url': 'https://example.com/notes', 'date': 'unknown'},
+    {'filename': '', 'url': '', 'date': '2024.02.29'},
+]
+
+
+class Binary:
+    """stand-in for boto3's Binary attribute wrapper"""
+
+    def __init__(self, value):
+        self.value = value
+
+
+def test_round_trip():
+    encoded = encode_files(FILES)
+
+    assert isinstance(encoded, bytes)
+    assert decode_files(encoded) == FILES
+    assert decode_files(Binary(encoded)) == FILES
+    assert decode_files(encode_files([])) == []
+
+
+def test_compact_is_smaller_than_json():
+    files = [{'filename': f'Module{i}_2024.1.{1 + i % 28}.apk',
+              'url': f'{BASE}Module{i}_2024.1.{1 + i % 28}.apk/download', 'date': f'2024.01.{1 + i % 28:02d}'}
+             for i in range(500)]
+
+    assert len(encode_files(files)) * 5 < len(json.dumps(files))
+
+
+def test_legacy_json_snapshot_is_readable():
+    assert decode_files(json.dumps(FILES)) == FILES
+
+
+def test_other_keys_are_not_encoded():
+    assert encode_files([{'filename': 'a', 'url': 'u', 'date': 'd', 'module': 'a'}]) is None
+
+
+def test_unknown_version_raises():
+    with pytest.raises(ValueError):
+        decode_files(b'\xff' + encode_files(FILES)[1:])
@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+from src.service import Stage, run_stages
+
+
+def test_stages_run_in_turn_without_workers():
+    calls = []
+
+    results = run_stages([
+        Stage('a', lambda: calls.append('a') or 1),
+        Stage('b', lambda a: calls.append('b') or a + 1, ('a',)),
+        Stage('c', lambda: calls.append('c')),
+    ])
+
+    assert calls == ['a', 'b', 'c']
+    assert results == {'a': 1, 'b': 2, 'c': None}
+
+
+def test_independent_stages_overlap():
+    # both stages only finish once the other one has started
+    started = [threading.Event(), threading.Event()]
+
+    def stage(i):
+        started[i].set()
+        return started[1 - i].wait(timeout=5)
+
+    results = run_stages([Stage('a', lambda: stage(0)), Stage('b', lambda: stage(1)),
+                          Stage('c', lambda a, b: a and b, ('a', 'b'))], max_workers=2)
+
+    assert results['c'] is True
+
+
+def test_failed_stage_skips_dependents_and_raises_after_the_others():
+    finished = []
+
+    def fail():
+        raise RuntimeError('fetch failed')
+
+    with pytest.raises(RuntimeError, match='fetch failed'):
+        run_stages([Stage('fetch', fail), Stage('check', lambda _: finished.append('check'), ('fetch',)),
+                    Stage('cleanup', lambda: finished.append('cleanup'))], max_workers=2)
+
+    assert finished == ['cleanup']
+
+
+def test_unknown_dependency_raises():
+    with pytest.raises(ValueError):
+        run_stages([Stage('a', lambda _: None, ('missing',))], max_workers=2)
@@ -0,0 +1,95 @@
+from src.data import DynamoDBSubscriptionStore, LocalSubscriptionStore, Subscription
+from src.notification import EmailDispatcher, EmailSender, clear_verification_cache
+from src.service import SubscriptionIndex
+
+
+def make_file(filename):
+    return {'filename': filename, 'url': f'https://example.com/{filename}', 'date': '2024.01.01'}
+
+
+FILES = [make_file('XiaomiEUModule_2024.1.1.apk'), make_file('xiaomi.eu_multi_MI9_V14.0.1_beta_2024.1.2.zip'),
+         make_file('xiaomi.eu_multi_MI9_V14.0.2_2024.1.3.zip'), make_file('other_2024.1.4.zip')]
+
+
+def test_index_matches_modules_prefixes_and_wildcards():
+    index = SubscriptionIndex([
+        Subscription('module@example.com', [{'module': 'XiaomiEUModule'}]),
+        Subscription('stable@example.com', [{'prefix': 'xiaomi.eu_multi_MI9', 'exclude': ['beta']}]),
+        Subscription('all@example.com', [{'prefix': ''}, {'module': 'other'}]),
+        Subscription('nothing@example.com', [{'module': 'unknown'}]),
+    ])
+
+    matches = index.match(FILES)
+
+    assert matches == {
+        'module@example.com': [FILES[0]],
+        'stable@example.com': [FILES[2]],
+        'all@example.com': FILES,
+    }
+    assert len(index) == 4
+
+
+def test_empty_index_matches_nothing():
+    assert SubscriptionIndex([]).match(FILES) == {}
+
+
+def test_local_store_round_trip(tmp_path):
+    store = LocalSubscriptionStore(str(tmp_path / 'config' / 'subscriptions.json'))
+    assert store.list_subscriptions() == []
+
+    store.save_subscription('a@example.com', [{'module': 'XiaomiEUModule'}])
+    store.save_subscription('b@example.com', [{'prefix': ''}])
+    store.delete_subscription('b@example.com')
+
+    assert store.list_subscriptions() == [Subscription('a@example.com', [{'module': 'XiaomiEUModule'}])]
+
+
+def test_dynamodb_store_follows_pages(mocker):
+    db_handler = mocker.Mock()
+    db_handler.table.query.side_effect = [
+        {'Items': [{'scan_date': 'a@example.com', 'rules': '[{"prefix": ""}]'}], 'LastEvaluatedKey': {'k': 1}},
+        {'Items': [{'scan_date': 'b@example.com', 'rules': '[]'}]},
+    ]
+
+    subscriptions = DynamoDBSubscriptionStore(db_handler).list_subscriptions()
+
+    assert subscriptions == [Subscription('a@example.com', [{'prefix': ''}]), Subscription('b@example.com', [])]
+    assert db_handler.table.query.call_args.kwargs['ExclusiveStartKey'] == {'k': 1}
+
+
+def test_every_verified_subscriber_gets_one_email(mocker):
+    clear_verification_cache()
+    ses = mocker.Mock()
+    ses.get_identity_verification_attributes.return_value = {'VerificationAttributes': {
+        email: {'VerificationStatus': 'Success'} for email in ('sender@example.com', 'a@example.com', 'b@example.com')
+    }}
+    ses.send_email.return_value = {'MessageId': 'id'}
+    addresses = {'sender_email': 'sender@example.com', 'new_file_recipient_emails': None,
+                 'log_recipient_emails': None}
+    sender = EmailSender(ses, addresses, dispatcher=EmailDispatcher(ses, send_rate=1000))
+
+    results = sender.send_subscriber_digests({'a@example.com': FILES[:2], 'b@example.com': FILES[2:],
+                                              'unverified@example.com': FILES})
+
+    # the unverified subscriber is skipped, not reported as a failed send
+    assert sorted((result.recipients, result.success) for result in results) == [
+        (['a@example.com'], True), (['b@example.com'], True)]
+    destinations = sorted(call.kwargs['Destination']['ToAddresses'] for call in ses.send_email.call_args_list)
+    assert destinations == [['a@example.com'], ['b@example.com']]
+    body = next(call.kwargs['Message']['Body']['Text']['Data'] for call in ses.send_email.call_args_list
+                if call.kwargs['Destination']['ToAddresses'] == ['b@example.com'])
+    assert FILES[2]['filename'] in body and FILES[0]['filename'] not in body
+    clear_verification_cache()
+
+
+def test_service_sends_subscriber_digests(update_service, mocker):
+    update_service.subscription_store = mocker.Mock()
+    update_service.subscription_store.list_subscriptions.return_value = [
+        Subscription('a@example.com', [{'module': 'XiaomiEUModule'}])]
+    update_service.email_sender.send_subscriber_digests.return_value = []
+
+    update_service._send_notification_email(FILES)
+    update_service._send_notification_email(FILES)
+
+    update_service.email_sender.send_subscriber_digests.assert_called_with({'a@example.com': FILES[:1]})
+    update_service.subscription_store.list_subscriptions.assert_called_once()
@@ -0,0 +1,120 @@
+from datetime import datetime
+
+from src.data import ReleaseTimeline, TimelineEvent
+from src.service import backfill_timeline
+
+
+def make_file(filename):
+    return {'filename': filename, 'url': f'https://example.com/{filename}', 'date': '2024.01.01'}
+
+
+def test_record_writes_events_and_file_items(mocker):
+    db_handler = mocker.MagicMock()
+    batch = db_handler.table.batch_writer.return_value.__enter__.return_value
+    added = {**make_file('mod_2024.1.2.apk'), 'module': 'mod'}
+    removed = {**make_file('notes.txt'), 'module': ''}
+
+    assert ReleaseTimeline(db_handler).record([added], [removed], when=datetime(2024, 1, 2, 3, 4, 5))
+
+    keys = [(call.kwargs['Item']['record_type'], call.kwargs['Item']['scan_date']) for call in batch.put_item.call_args_list]
+    assert keys == [('TIMELINE', '2024-01-02-03-04-05#added#mod_2024.1.2.apk'),
+                    ('TIMELINE_MODULE#mod', '2024-01-02-03-04-05#added#mod_2024.1.2.apk'),
+                    ('TIMELINE', '2024-01-02-03-04-05#removed#notes.txt')]
+    first, last = db_handler.table.update_item.call_args_list
+    assert first.kwargs['Key'] == {'record_type': 'TIMELINE_FILE', 'scan_date': 'mod_2024.1.2.apk'}
+    assert 'if_not_exists(first_seen, :d)' in first.kwargs['UpdateExpression']
+    assert last.kwargs['ExpressionAttributeValues'] == {':d': '2024-01-02-03-04-05', ':l': False}
+
+
+def test_backfill_only_moves_first_seen_back(mocker):
+    db_handler = mocker.MagicMock()
+    db_handler.dynamodb.meta.client.exceptions.ConditionalCheckFailedException = KeyError
+    db_handler.table.update_item.side_effect = KeyError('first_seen is earlier')
+
+    assert ReleaseTimeline(db_handler).record([make_file('a_2024.1.1.apk')], [], when=datetime(2024, 1, 1),
+                                              first_add_is_earliest=True)
+
+    update = db_handler.table.update_item.call_args.kwargs
+    assert update['ConditionExpression'] == 'attribute_not_exists(first_seen) OR first_seen > :d'
+    assert update['ExpressionAttributeValues'][':d'] == '2024-01-01-00-00-00'
+
+
+def test_events_between_reads_every_page(mocker):
+    db_handler = mocker.Mock()
+    item = {'event': 'added', 'filename': 'mod_2024.1.2.apk', 'url': 'u', 'module': 'mod'}
+    db_handler.table.query.side_effect = [
+        {'Items': [{**item, 'scan_date': '2024-01-02-00-00-00#added#mod_2024.1.2.apk'}], 'LastEvaluatedKey': {'k': 1}},
+        {'Items': [{**item, 'event': 'removed', 'scan_date': '2024-01-05-00-00-00#removed#mod_2024.1.2.apk'}]},
+    ]
+
+    events = ReleaseTimeline(db_handler).released_between(datetime(2024, 1, 1), datetime(2024, 1, 31), module='mod')
+
+    assert events == [TimelineEvent(datetime(2024, 1, 2), 'added', 'mod_2024.1.2.apk', 'u', 'mod')]
+    query = db_handler.table.query.call_args_list[0].kwargs
+    assert query['ExpressionAttributeValues'] == {':rt': 'TIMELINE_MODULE#mod', ':start': '2024-01-01-00-00-00',
+                                                  ':end': '2024-01-31-00-00-00~'}
+
+
+def test_get_file_answers_from_the_index(mocker):
+    db_handler = mocker.Mock()
+    db_handler.table.get_item.return_value = {'Item': {'first_seen': '2024-01-02-00-00-00', 'listed': True,
+                                                       'url': 'u', 'module': 'mod'}}
+
+    file = ReleaseTimeline(db_handler).get_file('mod_2024.1.2.apk')
+
+    assert file['first_seen'] == datetime(2024, 1, 2) and file['last_seen'] is None and file['listed']
+
+
+def test_backfill_streams_snapshots_oldest_first(mocker):
+    a, b, c = make_file('a_2024.1.1.apk'), make_file('b_2024.1.2.apk'), make_file('c_2024.1.3.apk')
+    db_handler = mocker.Mock()
+    db_handler.iter_scraper_results.return_value = iter([
+        (datetime(2024, 1, 1), [a]), (datetime(2024, 1, 2), [a, b]), (datetime(2024, 1, 3), [b]),
+        (datetime(2024, 1, 4), [a, b, c]),
+    ])
+    timeline = mocker.Mock()
+
+    assert backfill_timeline(db_handler, timeline, page_size=2) == 4
+
+    db_handler.iter_scraper_results.assert_called_once_with(None, 2)
+    calls = [(call.args[0], call.args[1], call.args[3], call.kwargs) for call in timeline.record.call_args_list]
+    names = [([f['filename'] for f in added], [f['filename'] for f in removed], when, kwargs)
+             for added, removed, when, kwargs in calls if added or removed]
+    assert names == [
+        (['a_2024.1.1.apk'], [], datetime(2024, 1, 1), {'first_add_is_earliest': True}),
+        (['b_2024.1.2.apk'], [], datetime(2024, 1, 2), {'first_add_is_earliest': True}),
+        ([], ['a_2024.1.1.apk'], datetime(2024, 1, 3), {}),
+        (['c_2024.1.3.apk'], [], datetime(2024, 1, 4), {'first_add_is_earliest': True}),
+        (['a_2024.1.1.apk'], [], datetime(2024, 1, 4), {}),
+    ]
+    assert timeline.record.call_args_list[0].args[0][0]['module'] == 'a'
+
+
+def test_service_records_the_run_in_the_timeline(update_service, current_files, old_files, mocker):
+    update_service.timeline = mocker.Mock()
+    update_service.db_handler.get_scan_state.return_value = {}
+
+    update_service.check_new_files_and_send_email(files_from_crawler=current_files[:1] + old_files[:1])
+
+    added, removed, source, when = update_service.timeline.record.call_args.args
+    # no digest was saved for the page yet
+    assert update_service.timeline.record.call_args.kwargs == {'first_record': True}
+    assert [f['filename'] for f in added] == [current_files[0]['filename']]
+    assert [f['filename'] for f in removed] == [old_files[1]['filename']]
+    assert added[0]['module'] == 'file' and source is None
+    # the events carry the snapshot's scan date, which a backfill of that snapshot would use too
+    assert when == update_service.db_handler.save_scraper_result.call_args.kwargs['scanned_at']
+
+
+def test_first_record_of_a_page_writes_file_items_in_the_batch(mocker):
+    db_handler = mocker.MagicMock()
+    batch = db_handler.table.batch_writer.return_value.__enter__.return_value
+    added = [{**make_file(f'mod_2024.1.{day}.apk'), 'module': 'mod'} for day in range(1, 4)]
+
+    assert ReleaseTimeline(db_handler).record(added, [], when=datetime(2024, 1, 2), first_record=True)
+
+    db_handler.table.update_item.assert_not_called()
+    file_items = [call.kwargs['Item'] for call in batch.put_item.call_args_list
+                  if call.kwargs['Item']['record_type'] == 'TIMELINE_FILE']
+    assert [item['scan_date'] for item in file_items] == [file['filename'] for file in added]
+    assert file_items[0]['first_seen'] == '2024-01-02-00-00-00' and file_items[0]['listed'] is True
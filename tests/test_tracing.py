@@ -0,0 +1,51 @@
+import json
+
+import pytest
+
+from src.util import configure_tracing, reset_spans, span, span_summary, traced
+
+
+@pytest.fixture
+def tracing():
+    configure_tracing(True, 'TestNamespace')
+    reset_spans()
+    yield
+    configure_tracing(False)
+    reset_spans()
+
+
+def test_disabled_span_records_nothing(capsys):
+    reset_spans()
+    with span('fetch', url='https://example.com'):
+        pass
+
+    assert span_summary() == ''
+    assert capsys.readouterr().out == ''
+
+
+def test_span_emits_embedded_metric_line(tracing, capsys):
+    with span('fetch', url='https://example.com'):
+        pass
+
+    line = json.loads(capsys.readouterr().out)
+    assert line['Span'] == 'fetch'
+    assert line['url'] == 'https://example.com'
+    assert line['_aws']['CloudWatchMetrics'][0]['Namespace'] == 'TestNamespace'
+    assert line['_aws']['CloudWatchMetrics'][0]['Metrics'] == [{'Name': 'Duration', 'Unit': 'Milliseconds'}]
+
+
+def test_summary_counts_spans_and_failures(tracing):
+    @traced('db_read')
+    def read(fail=False):
+        if fail:
+            raise ValueError('boom')
+        return 'value'
+
+    assert read() == 'value'
+    with pytest.raises(ValueError):
+        read(fail=True)
+
+    summary = span_summary().splitlines()
+    assert summary[1].split()[0] == 'db_read'
+    assert summary[1].split()[1] == '2'
+    assert summary[1].split()[-1] == '1'
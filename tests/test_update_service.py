@@ -1,3 +1,6 @@
+from src.util import file_list_digest
+
+
 def test_check_new_files_and_send_email(update_service, old_files, mocker):
     # Mock scraper
     mocker.patch.object(
@@ -71,3 +74,132 @@ def test_check_new_files_and_send_email_error(update_service):
     assert update_service.db_handler.save_scraper_result.call_count == 1
 
 
+
+def test_check_all_sources_checks_each_source(update_service, current_files, old_files, mocker):
+    source_a = mocker.Mock(url='https://example.com/a', source=None)
+    source_b = mocker.Mock(url='https://example.com/b', source='https://example.com/b')
+    update_service.scraper.fetch_all.return_value = [(source_a, current_files), (source_b, old_files)]
+
+    update_service.check_all_sources_and_send_email()
+
+    update_service.db_handler.get_last_scraper_result.assert_has_calls(
+        [mocker.call(None), mocker.call('https://example.com/b')])
+    update_service.db_handler.save_scraper_result.assert_has_calls(
+        [mocker.call(current_files, None, digest=mocker.ANY, scanned_at=mocker.ANY),
+         mocker.call(old_files, 'https://example.com/b', digest=mocker.ANY, scanned_at=mocker.ANY)])
+    # only the first source has a file that is not in the db
+    update_service.email_sender.send_new_file_email.assert_called_once()
+
+def test_not_modified_page_skips_db_and_diff(update_service):
+    update_service.scraper.get_file_list.return_value = None
+
+    update_service.check_new_files_and_send_email()
+
+    update_service.db_handler.get_last_scraper_result.assert_not_called()
+    update_service.db_handler.save_scraper_result.assert_not_called()
+    update_service.email_sender.send_new_file_email.assert_not_called()
+
+def test_index_mode_writes_only_new_files(update_service, current_files, old_files):
+    update_service.db_handler.storage_mode = 'index'
+    update_service.db_handler.get_known_filenames.return_value = {f['filename'] for f in old_files}
+
+    update_service.check_new_files_and_send_email()
+
+    update_service.db_handler.save_scraper_result.assert_not_called()
+    update_service.db_handler.save_to_file_index.assert_called_once_with(current_files[:1], None)
+    update_service.email_sender.send_new_file_email.assert_called_once_with(current_files[:1])
+
+def test_index_mode_seeds_empty_index_from_snapshot(update_service, current_files):
+    update_service.db_handler.storage_mode = 'index'
+    update_service.db_handler.get_known_filenames.return_value = set()
+
+    update_service.check_new_files_and_send_email()
+
+    update_service.db_handler.get_last_scraper_result.assert_called_once_with(None)
+    update_service.db_handler.save_to_file_index.assert_called_once_with(current_files, None)
+    update_service.email_sender.send_new_file_email.assert_called_once_with(current_files[:1])
+
+def test_index_mode_skips_the_run_when_the_index_cannot_be_read(update_service):
+    update_service.db_handler.storage_mode = 'index'
+    update_service.db_handler.get_known_filenames.return_value = None
+
+    assert update_service.check_new_files_and_send_email() == []
+
+    update_service.db_handler.get_last_scraper_result.assert_not_called()
+    update_service.db_handler.save_to_file_index.assert_not_called()
+    update_service.db_handler.save_scan_state.assert_not_called()
+    update_service.email_sender.send_new_file_email.assert_not_called()
+
+def test_unchanged_digest_only_writes_heartbeat(update_service, current_files):
+    update_service.db_handler.get_scan_state.return_value = {'digest': file_list_digest(list(reversed(current_files)))}
+
+    update_service.check_new_files_and_send_email()
+
+    update_service.db_handler.touch_scan_state.assert_called_once_with(None)
+    update_service.db_handler.get_last_scraper_result.assert_not_called()
+    update_service.db_handler.save_scraper_result.assert_not_called()
+    update_service.db_handler.save_scan_state.assert_not_called()
+    update_service.email_sender.send_new_file_email.assert_not_called()
+
+def test_changed_digest_is_saved(update_service, current_files):
+    update_service.db_handler.get_scan_state.return_value = {'digest': 'old'}
+
+    update_service.check_new_files_and_send_email()
+
+    update_service.db_handler.save_scan_state.assert_called_once_with(file_list_digest(current_files), None)
+    update_service.email_sender.send_new_file_email.assert_called_once()
+
+def test_weekly_digest_includes_saved_runs(update_service, mocker):
+    update_service.log_store = mocker.Mock()
+    update_service.log_store.iter_chunks.return_value = iter(["2024-01-06 10:00:00,000 - x - INFO - saved run\n"])
+    update_service.email_sender.is_log_email_day.return_value = True
+    mocker.patch('src.service.update_service.get_log_content',
+                 return_value="2024-01-07 10:00:00,000 - x - ERROR - this run\n")
+
+    update_service.send_log_email()
+
+    digest_text = update_service.email_sender.send_log_email.call_args.args[0]
+    assert 'runs: 2' in digest_text
+    assert '[x1] ERROR - x - this run' in digest_text
+
+
+def test_check_returns_new_files(update_service, current_files, old_files):
+    update_service.db_handler.get_scan_state.return_value = {}
+    update_service.db_handler.get_last_scraper_result.return_value = old_files
+
+    new_files = update_service.check_new_files_and_send_email(files_from_crawler=current_files)
+
+    assert new_files == update_service._compare_files_to_get_new(current_files, old_files)
+
+
+def test_stage_workers_read_state_while_fetching(update_service, current_files, old_files, mocker):
+    source = mocker.Mock(url='https://example.com/a', source=None)
+    update_service.scraper.scrapers = [source]
+    update_service.scraper.fetch_all.return_value = [(source, current_files)]
+    update_service.db_handler.storage_mode = 'snapshot'
+    update_service.db_handler.get_scan_state.return_value = {}
+    update_service.stage_workers = 4
+
+    update_service.check_all_sources_and_send_email()
+
+    update_service.scraper.fetch_all.assert_called_once_with(update_service.db_handler.get_http_validators.return_value)
+    update_service.db_handler.ensure_table.assert_called_once()
+    # each read happens once, before the check and not again inside it
+    update_service.db_handler.get_scan_state.assert_called_once_with(None)
+    update_service.db_handler.get_last_scraper_result.assert_called_once_with(None)
+    sent_files = update_service.email_sender.send_new_file_email.call_args[0][0]
+    assert [file['filename'] for file in sent_files] == [current_files[0]['filename']]
+
+
+def test_check_without_scraper_checks_every_page_of_a_multi_source_scraper(update_service, current_files, mocker):
+    pages = [mocker.Mock(url=f'https://example.com/{i}', source=source) for i, source in enumerate([None, 'b'])]
+    pages[0].get_file_list.return_value = None
+    pages[1].get_file_list.return_value = current_files
+    update_service.scraper = mocker.Mock(spec=['scrapers', 'url'], scrapers=pages)
+    update_service.db_handler.get_scan_state.return_value = {}
+
+    new_files = update_service.check_new_files_and_send_email()
+
+    assert [file['filename'] for file in new_files] == [current_files[0]['filename']]
+    update_service.db_handler.save_scraper_result.assert_called_once_with(current_files, 'b', digest=mocker.ANY,
+                                                                          scanned_at=mocker.ANY)